@@ -0,0 +1,382 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+# Prometheus-style upper bounds of the latency histogram, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+INSTRUMENTED_REQUEST_METHODS = ('execute', 'next_chunk')
+# Return values of service methods that are neither requests nor resources
+PLAIN_VALUE_TYPES = (str, bytes, int, float, bool, dict, list, tuple)
+
+
+class ApiMetrics:
+    """
+    Thread-safe per-method counters for Google API calls.
+
+    Records the call count, a latency histogram, response bytes and error
+    codes of every method, e.g. files.list or messages.get, and exports
+    them as a JSON summary or a Prometheus text exposition.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._methods: dict[str, dict[str, Any]] = {}
+
+    @classmethod
+    def from_env(cls) -> 'ApiMetrics | None':
+        """
+        Build metrics dumped at exit when API_METRICS_PATH (JSON) or
+        API_METRICS_PROMETHEUS_PATH is set, otherwise return None so
+        instrument() leaves services untouched.
+        """
+        json_path = os.environ.get('API_METRICS_PATH')
+        prometheus_path = os.environ.get('API_METRICS_PROMETHEUS_PATH')
+        if not json_path and not prometheus_path:
+            return None
+        metrics = cls()
+        metrics.dump_at_exit(json_path, prometheus_path)
+        return metrics
+
+    def record(
+        self,
+        method: str,
+        latency: float | None,
+        response_bytes: int = 0,
+        error_code: int | None = None,
+    ) -> None:
+        """
+        Record one call.
+
+        Args:
+            method: API method name, e.g. 'files.list'.
+            latency: Seconds spent waiting, None for batch sub-requests
+                whose latency is the envelope's.
+            response_bytes: Size of the response body.
+            error_code: HTTP status of a failed call.
+        """
+        with self._lock:
+            stats = self._methods.get(method)
+            if stats is None:
+                stats = self._methods[method] = {
+                    'count': 0,
+                    'latency_count': 0,
+                    'latency_sum': 0.0,
+                    'latency_max': 0.0,
+                    'buckets': [0] * len(LATENCY_BUCKETS),
+                    'response_bytes': 0,
+                    'errors': {},
+                }
+            stats['count'] += 1
+            stats['response_bytes'] += response_bytes
+            if error_code is not None:
+                stats['errors'][error_code] = (
+                    stats['errors'].get(error_code, 0) + 1)
+            if latency is not None:
+                stats['latency_count'] += 1
+                stats['latency_sum'] += latency
+                stats['latency_max'] = max(stats['latency_max'], latency)
+                for index, bound in enumerate(LATENCY_BUCKETS):
+                    if latency <= bound:
+                        stats['buckets'][index] += 1
+                        break
+
+    def summary(self) -> dict[str, Any]:
+        """Return the metrics of every method as a JSON-ready dict."""
+        with self._lock:
+            methods = json.loads(json.dumps(self._methods))
+
+        summary = {}
+        for method, stats in sorted(methods.items()):
+            latency_count = stats['latency_count']
+            summary[method] = {
+                'count': stats['count'],
+                'response_bytes': stats['response_bytes'],
+                'errors': stats['errors'],
+                'latency_s': {
+                    'total': round(stats['latency_sum'], 6),
+                    'mean': round(stats['latency_sum'] / latency_count, 6)
+                    if latency_count else None,
+                    'max': round(stats['latency_max'], 6),
+                    'histogram': dict(zip(
+                        [str(bound) for bound in LATENCY_BUCKETS],
+                        stats['buckets'])),
+                },
+            }
+        return {
+            'total_calls': sum(m['count'] for m in summary.values()),
+            'methods': summary,
+        }
+
+    def to_prometheus(self, prefix: str = 'google_api') -> str:
+        """Render the metrics in the Prometheus text exposition format."""
+        with self._lock:
+            methods = json.loads(json.dumps(self._methods))
+
+        lines = [
+            f'# HELP {prefix}_requests_total API calls per method.',
+            f'# TYPE {prefix}_requests_total counter',
+        ]
+        for method, stats in sorted(methods.items()):
+            lines.append(
+                f'{prefix}_requests_total{{method="{method}"}} '
+                f"{stats['count']}")
+
+        lines += [
+            f'# HELP {prefix}_request_duration_seconds API call latency.',
+            f'# TYPE {prefix}_request_duration_seconds histogram',
+        ]
+        for method, stats in sorted(methods.items()):
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, stats['buckets']):
+                cumulative += count
+                lines.append(
+                    f'{prefix}_request_duration_seconds_bucket'
+                    f'{{method="{method}",le="{bound}"}} {cumulative}')
+            lines.append(
+                f'{prefix}_request_duration_seconds_bucket'
+                f'{{method="{method}",le="+Inf"}} {stats["latency_count"]}')
+            lines.append(
+                f'{prefix}_request_duration_seconds_sum{{method="{method}"}} '
+                f"{stats['latency_sum']}")
+            lines.append(
+                f'{prefix}_request_duration_seconds_count'
+                f'{{method="{method}"}} {stats["latency_count"]}')
+
+        lines += [
+            f'# HELP {prefix}_response_bytes_total Response body bytes.',
+            f'# TYPE {prefix}_response_bytes_total counter',
+        ]
+        for method, stats in sorted(methods.items()):
+            lines.append(
+                f'{prefix}_response_bytes_total{{method="{method}"}} '
+                f"{stats['response_bytes']}")
+
+        lines += [
+            f'# HELP {prefix}_errors_total Failed calls per HTTP status.',
+            f'# TYPE {prefix}_errors_total counter',
+        ]
+        for method, stats in sorted(methods.items()):
+            for code, count in sorted(stats['errors'].items()):
+                lines.append(
+                    f'{prefix}_errors_total'
+                    f'{{method="{method}",code="{code}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def write(
+        self,
+        json_path: str | None = None,
+        prometheus_path: str | None = None,
+    ) -> None:
+        """Write the JSON summary and/or the Prometheus exposition."""
+        if json_path:
+            with open(json_path, 'w', encoding='utf-8') as json_file:
+                json.dump(self.summary(), json_file, indent=2)
+            logging.info(f'API metrics written to {json_path}')
+        if prometheus_path:
+            with open(prometheus_path, 'w', encoding='utf-8') as prom_file:
+                prom_file.write(self.to_prometheus())
+            logging.info(f'API metrics written to {prometheus_path}')
+
+    def dump_at_exit(
+        self,
+        json_path: str | None = None,
+        prometheus_path: str | None = None,
+    ) -> None:
+        """Write the metrics when the interpreter exits."""
+        atexit.register(self.write, json_path, prometheus_path)
+
+
+def _method_name(path: list[str]) -> str:
+    # users().messages().get() -> messages.get, files().list() -> files.list
+    return '.'.join(path[-2:])
+
+
+def _response_size(response: Any) -> int:
+    if isinstance(response, (bytes, bytearray)):
+        return len(response)
+    if response is None:
+        return 0
+    try:
+        return len(json.dumps(response, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _error_code(error: Exception) -> int | None:
+    status = getattr(getattr(error, 'resp', None), 'status', None)
+    return int(status) if status is not None else None
+
+
+class _InstrumentedHttp:
+    """Times the raw HTTP calls MediaIoBaseDownload makes per chunk."""
+
+    def __init__(self, http: Any, metrics: ApiMetrics, method: str) -> None:
+        self._http = http
+        self._metrics = metrics
+        self._method = method
+
+    def request(self, *args: Any, **kwargs: Any) -> Any:
+        start_time = time.perf_counter()
+        resp, content = self._http.request(*args, **kwargs)
+        status = getattr(resp, 'status', 200)
+        self._metrics.record(
+            self._method,
+            time.perf_counter() - start_time,
+            len(content or b''),
+            int(status) if int(status) >= 400 else None,
+        )
+        return resp, content
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._http, name)
+
+
+class _InstrumentedRequest:
+    """Wraps an HttpRequest, timing execute() and next_chunk()."""
+
+    def __init__(self, request: Any, metrics: ApiMetrics, method: str) -> None:
+        self._request = request
+        self._metrics = metrics
+        self._method = method
+
+    def _timed(self, function: Callable[..., Any]) -> Callable[..., Any]:
+        def timed(*args: Any, **kwargs: Any) -> Any:
+            start_time = time.perf_counter()
+            try:
+                response = function(*args, **kwargs)
+            except Exception as error:
+                self._metrics.record(
+                    self._method, time.perf_counter() - start_time,
+                    error_code=_error_code(error))
+                raise
+            self._metrics.record(
+                self._method, time.perf_counter() - start_time,
+                _response_size(response))
+            return response
+        return timed
+
+    @property
+    def http(self) -> Any:
+        return _InstrumentedHttp(self._request.http, self._metrics, self._method)
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self._request, name)
+        if name in INSTRUMENTED_REQUEST_METHODS:
+            return self._timed(attribute)
+        return attribute
+
+
+class _InstrumentedBatch:
+    """Wraps a BatchHttpRequest, recording the envelope and each sub-request."""
+
+    def __init__(self, batch: Any, metrics: ApiMetrics,
+                 callback: Callable[..., Any] | None) -> None:
+        self._batch = batch
+        self._metrics = metrics
+        self._callback = callback
+        self._methods: dict[str, str] = {}
+        self._last_id = 0
+
+    def _record_callback(self, callback: Callable[..., Any] | None
+                         ) -> Callable[..., Any]:
+        def record(request_id: str, response: Any, exception: Any) -> Any:
+            method = self._methods.get(request_id, 'batch.unknown')
+            if exception is not None:
+                self._metrics.record(
+                    method, None, error_code=_error_code(exception))
+            else:
+                self._metrics.record(method, None, _response_size(response))
+            if callback is not None:
+                return callback(request_id, response, exception)
+            return None
+        return record
+
+    def add(self, request: Any, callback: Callable[..., Any] | None = None,
+            request_id: str | None = None) -> None:
+        method = 'batch.unknown'
+        if isinstance(request, _InstrumentedRequest):
+            method = request._method
+            request = request._request
+        if request_id is None:
+            # Same ids BatchHttpRequest would assign, so callers see no change
+            self._last_id += 1
+            request_id = str(self._last_id)
+        self._methods[request_id] = method
+        self._batch.add(
+            request,
+            callback=self._record_callback(callback or self._callback),
+            request_id=request_id,
+        )
+
+    def execute(self, *args: Any, **kwargs: Any) -> Any:
+        start_time = time.perf_counter()
+        try:
+            response = self._batch.execute(*args, **kwargs)
+        except Exception as error:
+            self._metrics.record(
+                'batch', time.perf_counter() - start_time,
+                error_code=_error_code(error))
+            raise
+        self._metrics.record('batch', time.perf_counter() - start_time)
+        return response
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._batch, name)
+
+
+class _InstrumentedResource:
+    """Wraps a discovery Resource, instrumenting the requests it builds."""
+
+    def __init__(self, resource: Any, metrics: ApiMetrics,
+                 path: list[str]) -> None:
+        self._resource = resource
+        self._metrics = metrics
+        self._path = path
+
+    def new_batch_http_request(
+        self, callback: Callable[..., Any] | None = None, **kwargs: Any,
+    ) -> _InstrumentedBatch:
+        return _InstrumentedBatch(
+            self._resource.new_batch_http_request(**kwargs),
+            self._metrics,
+            callback,
+        )
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self._resource, name)
+        if not callable(attribute):
+            return attribute
+
+        def build(*args: Any, **kwargs: Any) -> Any:
+            result = attribute(*args, **kwargs)
+            if hasattr(result, 'execute'):
+                return _InstrumentedRequest(
+                    result, self._metrics, _method_name(self._path + [name]))
+            if result is None or isinstance(result, PLAIN_VALUE_TYPES):
+                return result
+            return _InstrumentedResource(
+                result, self._metrics, self._path + [name])
+        return build
+
+
+def instrument(service: Any, metrics: ApiMetrics | None) -> Any:
+    """
+    Wrap a service built with googleapiclient.discovery.build so every
+    call is recorded in metrics.
+
+    Args:
+        service: Drive or Gmail service instance.
+        metrics: Metrics to record into, None to disable instrumentation.
+
+    Returns:
+        The wrapped service, or the service itself when metrics is None,
+        so disabled instrumentation costs nothing per call.
+    """
+    if metrics is None:
+        return service
+    return _InstrumentedResource(service, metrics, [])
@@ -0,0 +1,739 @@
+"""In-process fake Drive and Gmail services for benchmarks.
+
+The fakes mimic the slice of the googleapiclient surface the scripts use:
+resource methods return request objects with execute(), new_batch_http_request
+groups sub-requests into one round-trip, and files().get_media returns a
+request that MediaIoBaseDownload can stream. Every round-trip sleeps for the
+configured latency and is counted per API method.
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+MAX_PAGE_SIZE = 1000
+BATCH_LIMIT = 100
+# users.history.list historyTypes and the record key each one fills
+HISTORY_KEYS = {
+    'messageAdded': 'messagesAdded',
+    'messageDeleted': 'messagesDeleted',
+    'labelAdded': 'labelsAdded',
+    'labelRemoved': 'labelsRemoved',
+}
+
+FIRST_NAMES = [
+    'John', 'Maria', 'Wei', 'Aisha', 'Carlos', 'Olga', 'Kenji', 'Fatima',
+    'Liam', 'Sofia', 'Ahmed', 'Chloe', 'Mateo', 'Ines', 'Noah', 'Yuki',
+    'Pedro', 'Amara', 'Lucas', 'Elena', 'Ravi', 'Hana', 'Omar', 'Zoe',
+]
+LAST_NAMES = [
+    'Doe', 'Garcia', 'Zhang', 'Khan', 'Silva', 'Ivanova', 'Tanaka', 'Haddad',
+    'Smith', 'Rossi', 'Nguyen', 'Martin', 'Lopez', 'Costa', 'Brown', 'Sato',
+    'Alves', 'Okafor', 'Muller', 'Petrova', 'Patel', 'Kim', 'Farah', 'Dubois',
+]
+
+
+class FakeHttpError(Exception):
+    """Raised by fake requests when googleapiclient is not importable."""
+
+
+def _http_error(status: int, reason: str,
+                location: str | None = None) -> Exception:
+    error: dict[str, Any] = {'reason': reason}
+    if location is not None:
+        error.update(locationType='parameter', location=location)
+    content = json.dumps(
+        {'error': {'code': status, 'errors': [error]}},
+    ).encode('utf-8')
+    try:
+        from googleapiclient.errors import HttpError
+    except ImportError:
+        return FakeHttpError(status, reason)
+    return HttpError(
+        FakeResponse({'status': str(status), 'reason': reason}), content)
+
+
+class FakeResponse(dict):
+    """httplib2-style response: a header dict with status and reason attributes."""
+
+    @property
+    def status(self) -> int:
+        return int(self.get('status', 200))
+
+    @property
+    def reason(self) -> str:
+        return str(self.get('reason', ''))
+
+
+class FakeRequest:
+    """A single API call, executed lazily like googleapiclient.HttpRequest."""
+
+    def __init__(self, backend: 'FakeBackend', method_id: str, handler: Any):
+        self.backend = backend
+        self.methodId = method_id
+        self.uri = f'https://fake.googleapis.com/{method_id}'
+        self.headers: dict[str, str] = {}
+        self._handler = handler
+
+    def execute(self, num_retries: int = 0) -> Any:
+        self.backend.round_trip()
+        return self.run()
+
+    def run(self) -> Any:
+        self.backend.count(self.methodId)
+        return self._handler()
+
+
+class FakeMediaHttp:
+    """Serves byte ranges of one file to MediaIoBaseDownload."""
+
+    def __init__(self, backend: 'FakeBackend', method_id: str, content: bytes):
+        self.backend = backend
+        self.method_id = method_id
+        self.content = content
+
+    def request(self, uri: str, method: str = 'GET', headers: Any = None,
+                **kwargs: Any) -> tuple[FakeResponse, bytes]:
+        self.backend.round_trip()
+        self.backend.count(self.method_id)
+        start, end = 0, len(self.content) - 1
+        match = re.match(r'bytes=(\d+)-(\d+)', (headers or {}).get('range', ''))
+        if match:
+            start, end = int(match.group(1)), int(match.group(2))
+        chunk = self.content[start:end + 1]
+        self.backend.add_bytes(len(chunk))
+        return FakeResponse({
+            'status': '206',
+            'content-range': f'bytes {start}-{start + len(chunk) - 1}/'
+                             f'{len(self.content)}',
+            'content-length': str(len(chunk)),
+        }), chunk
+
+
+class FakeMediaRequest(FakeRequest):
+    """files().get_media request, downloadable with MediaIoBaseDownload."""
+
+    def __init__(self, backend: 'FakeBackend', method_id: str, content: bytes):
+        super().__init__(backend, method_id, lambda: content)
+        self.http = FakeMediaHttp(backend, method_id, content)
+
+
+class FakeUploadProgress:
+    """Status returned by next_chunk while an upload is in progress."""
+
+    def __init__(self, resumable_progress: int, total_size: int):
+        self.resumable_progress = resumable_progress
+        self.total_size = total_size
+
+    def progress(self) -> float:
+        return self.resumable_progress / self.total_size if self.total_size else 0.0
+
+
+class FakeUploadRequest(FakeRequest):
+    """files().create/update with a media body, sent chunk by chunk."""
+
+    def __init__(self, backend: 'FakeBackend', method_id: str,
+                 media_body: Any, finish: Any):
+        super().__init__(
+            backend, method_id,
+            lambda: finish(media_body.getbytes(0, media_body.size())))
+        self.media_body = media_body
+        self.resumable_progress = 0
+        self._received = bytearray()
+        self._finish = finish
+
+    def next_chunk(self, http: Any = None,
+                   num_retries: int = 0) -> tuple[Any, Any]:
+        self.backend.round_trip()
+        total_size = self.media_body.size()
+        chunk = self.media_body.getbytes(
+            self.resumable_progress, self.media_body.chunksize())
+        self._received += chunk
+        self.resumable_progress += len(chunk)
+        if self.resumable_progress < total_size:
+            return FakeUploadProgress(self.resumable_progress, total_size), None
+        self.backend.count(self.methodId)
+        return None, self._finish(bytes(self._received))
+
+
+class FakeBatch:
+    """new_batch_http_request: every sub-request shares one round-trip."""
+
+    def __init__(self, backend: 'FakeBackend', callback: Any = None):
+        self.backend = backend
+        self.callback = callback
+        self.requests: list[tuple[str, FakeRequest, Any]] = []
+
+    def add(self, request: FakeRequest, callback: Any = None,
+            request_id: str | None = None) -> None:
+        if len(self.requests) >= BATCH_LIMIT:
+            raise ValueError('Exceeded the maximum calls in a single batch.')
+        if request_id is None:
+            request_id = str(len(self.requests) + 1)
+        self.requests.append((request_id, request, callback))
+
+    def execute(self, http: Any = None) -> None:
+        self.backend.round_trip()
+        self.backend.count('batch')
+        for request_id, request, callback in self.requests:
+            callback = callback or self.callback
+            try:
+                response = request.run()
+            except Exception as error:
+                if callback is not None:
+                    callback(request_id, None, error)
+            else:
+                if callback is not None:
+                    callback(request_id, response, None)
+
+
+class FakeBackend:
+    """Latency, failure injection and per-method counters shared by fakes."""
+
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0,
+                 seed: int = 0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.calls: Counter[str] = Counter()
+        # Errors the next calls of a method raise, see fail
+        self.scheduled_failures: dict[str, list[tuple[int, str]]] = {}
+        self.round_trips = 0
+        self.response_bytes = 0
+        self._lock = threading.Lock()
+
+    def round_trip(self) -> None:
+        with self._lock:
+            self.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def count(self, method_id: str) -> None:
+        with self._lock:
+            self.calls[method_id] += 1
+            scheduled = self.scheduled_failures.get(method_id)
+            failure = scheduled.pop(0) if scheduled else None
+            if failure is None and self.failure_rate \
+                    and self.random.random() < self.failure_rate:
+                failure = (429, 'rateLimitExceeded')
+        if failure is not None:
+            raise _http_error(*failure)
+
+    def fail(self, method_id: str, times: int = 1, status: int = 429,
+             reason: str = 'rateLimitExceeded') -> None:
+        """Make the next `times` calls of a method fail with status."""
+        with self._lock:
+            self.scheduled_failures.setdefault(method_id, []).extend(
+                [(status, reason)] * times)
+
+    def add_bytes(self, size: int) -> None:
+        with self._lock:
+            self.response_bytes += size
+
+    def reset(self) -> None:
+        with self._lock:
+            self.calls.clear()
+            self.round_trips = 0
+            self.response_bytes = 0
+
+    def report(self) -> dict[str, Any]:
+        return {
+            'api_calls': dict(sorted(self.calls.items())),
+            'total_api_calls': sum(
+                n for method, n in self.calls.items() if method != 'batch'),
+            'http_round_trips': self.round_trips,
+            'response_bytes': self.response_bytes,
+        }
+
+
+def _json_size(value: Any) -> int:
+    return len(json.dumps(value, default=str))
+
+
+class FakeDriveFiles:
+    def __init__(self, drive: 'FakeDriveService'):
+        self.drive = drive
+
+    def list(self, q: str = '', fields: str | None = None,
+             pageToken: str | None = None, pageSize: int = 100,
+             **kwargs: Any) -> FakeRequest:
+        def handler() -> dict[str, Any]:
+            matches = self.drive.query(q)
+            start = int(pageToken or 0)
+            end = start + min(pageSize or 100, MAX_PAGE_SIZE)
+            response: dict[str, Any] = {
+                'files': [dict(self.drive.metadata[f]) for f in matches[start:end]],
+            }
+            if end < len(matches):
+                response['nextPageToken'] = str(end)
+            self.drive.backend.add_bytes(_json_size(response))
+            return response
+        return FakeRequest(self.drive.backend, 'drive.files.list', handler)
+
+    def get(self, fileId: str, fields: str | None = None,
+            **kwargs: Any) -> FakeRequest:
+        def handler() -> dict[str, Any]:
+            if fileId not in self.drive.metadata:
+                raise _http_error(404, 'notFound')
+            response = dict(self.drive.metadata[fileId])
+            self.drive.backend.add_bytes(_json_size(response))
+            return response
+        return FakeRequest(self.drive.backend, 'drive.files.get', handler)
+
+    def get_media(self, fileId: str, **kwargs: Any) -> FakeMediaRequest:
+        return FakeMediaRequest(
+            self.drive.backend, 'drive.files.get_media',
+            self.drive.media.get(fileId, b''))
+
+    def create(self, body: dict[str, Any], media_body: Any = None,
+               fields: str | None = None, **kwargs: Any) -> FakeRequest:
+        parents = body.get('parents') or [None]
+
+        def finish(content: bytes | None) -> dict[str, Any]:
+            file_id = self.drive.add_file(
+                body['name'], parents[0],
+                body.get('mimeType', 'application/pdf'), content=content)
+            return dict(self.drive.metadata[file_id])
+
+        if media_body is None:
+            return FakeRequest(
+                self.drive.backend, 'drive.files.create', lambda: finish(None))
+        return FakeUploadRequest(
+            self.drive.backend, 'drive.files.create', media_body, finish)
+
+    def update(self, fileId: str, body: dict[str, Any] | None = None,
+               media_body: Any = None, fields: str | None = None,
+               **kwargs: Any) -> FakeRequest:
+        def finish(content: bytes | None) -> dict[str, Any]:
+            if fileId not in self.drive.metadata:
+                raise _http_error(404, 'notFound')
+            self.drive.update_file(fileId, body or {}, content)
+            return dict(self.drive.metadata[fileId])
+
+        if media_body is None:
+            return FakeRequest(
+                self.drive.backend, 'drive.files.update', lambda: finish(None))
+        return FakeUploadRequest(
+            self.drive.backend, 'drive.files.update', media_body, finish)
+
+
+class FakeDriveChanges:
+    def __init__(self, drive: 'FakeDriveService'):
+        self.drive = drive
+
+    def getStartPageToken(self, **kwargs: Any) -> FakeRequest:
+        return FakeRequest(
+            self.drive.backend, 'drive.changes.getStartPageToken',
+            lambda: {'startPageToken': str(len(self.drive.change_log))})
+
+    def list(self, pageToken: str, pageSize: int = 100,
+             **kwargs: Any) -> FakeRequest:
+        def handler() -> dict[str, Any]:
+            # Drive answers malformed parameters with a 400 naming them
+            if pageSize > MAX_PAGE_SIZE:
+                raise _http_error(400, 'invalid', 'pageSize')
+            if not pageToken.isdigit():
+                raise _http_error(400, 'invalid', 'pageToken')
+            start = int(pageToken)
+            if start < self.drive.change_floor:
+                raise _http_error(404, 'notFound')
+            end = min(start + pageSize, len(self.drive.change_log))
+            changes = []
+            for file_id in self.drive.change_log[start:end]:
+                file = self.drive.metadata.get(file_id)
+                changes.append({
+                    'fileId': file_id,
+                    'removed': file is None,
+                    'file': dict(file) if file else None,
+                })
+            response: dict[str, Any] = {'changes': changes}
+            if end < len(self.drive.change_log):
+                response['nextPageToken'] = str(end)
+            else:
+                response['newStartPageToken'] = str(end)
+            return response
+        return FakeRequest(self.drive.backend, 'drive.changes.list', handler)
+
+
+class FakeDriveService:
+    """Fake Drive v3 service holding an in-memory file tree."""
+
+    def __init__(self, backend: FakeBackend | None = None):
+        self.backend = backend or FakeBackend()
+        self.metadata: dict[str, dict[str, Any]] = {}
+        self.children: dict[str, list[str]] = {}
+        self.media: dict[str, bytes] = {}
+        self.change_log: list[str] = []
+        # Oldest page token changes.list still accepts
+        self.change_floor = 0
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def files(self) -> FakeDriveFiles:
+        return FakeDriveFiles(self)
+
+    def changes(self) -> FakeDriveChanges:
+        return FakeDriveChanges(self)
+
+    def new_batch_http_request(self, callback: Any = None) -> FakeBatch:
+        return FakeBatch(self.backend, callback)
+
+    def add_file(self, name: str, parent: str | None,
+                 mime_type: str = 'application/pdf',
+                 created_time: datetime | None = None,
+                 content: bytes | None = None,
+                 file_id: str | None = None) -> str:
+        """Add a file or folder and record it in the change log."""
+        if file_id is None:
+            with self._lock:
+                self._next_id += 1
+                file_id = f'fake{self._next_id:08d}'
+        timestamp = (created_time or datetime(2024, 1, 1)).strftime(
+            '%Y-%m-%dT%H:%M:%S.000Z')
+        metadata: dict[str, Any] = {
+            'id': file_id,
+            'name': name,
+            'mimeType': mime_type,
+            'parents': [parent] if parent else [],
+            'createdTime': timestamp,
+            'modifiedTime': timestamp,
+            'trashed': False,
+        }
+        if content is not None:
+            self.media[file_id] = content
+            metadata['md5Checksum'] = hashlib.md5(content).hexdigest()
+            metadata['size'] = str(len(content))
+        self.metadata[file_id] = metadata
+        if parent:
+            self.children.setdefault(parent, []).append(file_id)
+        self.change_log.append(file_id)
+        return file_id
+
+    def update_file(self, file_id: str, changes: dict[str, Any],
+                    content: bytes | None = None) -> None:
+        """Update metadata and optionally content, recording the change."""
+        metadata = self.metadata[file_id]
+        metadata.update(changes)
+        if content is not None:
+            self.media[file_id] = content
+            metadata['md5Checksum'] = hashlib.md5(content).hexdigest()
+            metadata['size'] = str(len(content))
+        metadata['modifiedTime'] = datetime.now().strftime(
+            '%Y-%m-%dT%H:%M:%S.000Z')
+        self.change_log.append(file_id)
+
+    def move_file(self, file_id: str, new_parent: str) -> None:
+        """Move a file to another folder and record the change."""
+        metadata = self.metadata[file_id]
+        for parent in metadata['parents']:
+            self.children[parent].remove(file_id)
+        metadata['parents'] = [new_parent]
+        self.children.setdefault(new_parent, []).append(file_id)
+        self.change_log.append(file_id)
+
+    def add_parent(self, file_id: str, parent: str) -> None:
+        """Add a file to a second folder and record the change."""
+        self.metadata[file_id]['parents'].append(parent)
+        self.children.setdefault(parent, []).append(file_id)
+        self.change_log.append(file_id)
+
+    def trash_file(self, file_id: str) -> None:
+        """Trash a file and record the change."""
+        self.metadata[file_id]['trashed'] = True
+        self.change_log.append(file_id)
+
+    def delete_file(self, file_id: str) -> None:
+        """Delete a file for good and record the change."""
+        metadata = self.metadata.pop(file_id)
+        for parent in metadata['parents']:
+            self.children[parent].remove(file_id)
+        self.media.pop(file_id, None)
+        self.change_log.append(file_id)
+
+    def expire_changes(self) -> None:
+        """Reject the page tokens handed out so far, as Drive does for old ones."""
+        self.change_floor = len(self.change_log) + 1
+
+    def query(self, q: str) -> list[str]:
+        """Evaluate the subset of the Drive query language the scripts use."""
+        parents = re.findall(r"'([^']+)' in parents", q)
+        mime_equals = re.findall(r"mimeType\s*=\s*'([^']+)'", q)
+        mime_differs = re.findall(r"mimeType\s*!=\s*'([^']+)'", q)
+        names = re.findall(r"name\s*=\s*'([^']+)'", q)
+        skip_trashed = re.search(r'trashed\s*=\s*false', q) is not None
+
+        if parents:
+            candidates = [
+                file_id for parent in dict.fromkeys(parents)
+                for file_id in self.children.get(parent, [])
+            ]
+        else:
+            candidates = list(self.metadata)
+
+        matches = []
+        for file_id in dict.fromkeys(candidates):
+            metadata = self.metadata[file_id]
+            if skip_trashed and metadata['trashed']:
+                continue
+            if mime_equals and metadata['mimeType'] not in mime_equals:
+                continue
+            if mime_differs and metadata['mimeType'] in mime_differs:
+                continue
+            if names and metadata['name'] not in names:
+                continue
+            matches.append(file_id)
+        return matches
+
+
+def customer_names(count: int, seed: int = 0) -> list[str]:
+    """Generate count distinct synthetic customer names."""
+    rng = random.Random(seed)
+    names: list[str] = []
+    seen = set()
+    while len(names) < count:
+        name = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+        if name in seen:
+            name = f'{name} {len(names)}'
+        seen.add(name)
+        names.append(name)
+    return names
+
+
+def build_status_tree(
+    drive: FakeDriveService,
+    stages: int = 3,
+    batches: int = 500,
+    pdfs: int = 200,
+    seed: int = 0,
+) -> tuple[list[str], dict[str, str]]:
+    """
+    Generate stage folders holding dated batch folders of customer PDFs.
+
+    Customers are drawn from a pool half the size of the PDF count, so
+    most appear in several batches and stages, as they move along.
+
+    Returns:
+        The stage folder IDs, and a mapping of status to stage folder ID.
+    """
+    rng = random.Random(seed)
+    pool = customer_names(max(1, stages * batches * pdfs // 2), seed)
+    statuses = ['received', 'processing', 'processed']
+    statuses += [f'stage{index}' for index in range(len(statuses), stages)]
+    start = datetime(2020, 1, 1)
+
+    stage_ids = []
+    folder_ids = {}
+    for status in statuses[:stages]:
+        stage_id = drive.add_file(
+            f'Application {status}', 'root', FOLDER_MIME_TYPE)
+        stage_ids.append(stage_id)
+        folder_ids[status] = stage_id
+        for _ in range(batches):
+            created = start + timedelta(
+                days=rng.randrange(2000), seconds=rng.randrange(86400))
+            batch_id = drive.add_file(
+                f'{created:%Y-%m-%d} batch', stage_id, FOLDER_MIME_TYPE,
+                created_time=created)
+            for name in rng.sample(pool, min(pdfs, len(pool))):
+                drive.add_file(f'{name}.pdf', batch_id, created_time=created)
+    return stage_ids, folder_ids
+
+
+class FakeGmailMessages:
+    def __init__(self, gmail: 'FakeGmailService'):
+        self.gmail = gmail
+
+    def get(self, userId: str = 'me', id: str = '', format: str = 'full',
+            metadataHeaders: list[str] | None = None,
+            **kwargs: Any) -> FakeRequest:
+        def handler() -> dict[str, Any]:
+            if id not in self.gmail.messages:
+                raise _http_error(404, 'notFound')
+            message = json.loads(json.dumps(self.gmail.messages[id]))
+            if format == 'metadata':
+                message.pop('body', None)
+                headers = message['payload']['headers']
+                if metadataHeaders:
+                    headers = [h for h in headers
+                               if h['name'] in metadataHeaders]
+                message['payload'] = {'headers': headers}
+            else:
+                message['payload']['body'] = {'data': message.pop('body')}
+            self.gmail.backend.add_bytes(_json_size(message))
+            return message
+        return FakeRequest(self.gmail.backend, 'gmail.users.messages.get',
+                           handler)
+
+    def list(self, userId: str = 'me', q: str = '', maxResults: int = 100,
+             pageToken: str | None = None, **kwargs: Any) -> FakeRequest:
+        def handler() -> dict[str, Any]:
+            ids = self.gmail.search(q)
+            start = int(pageToken or 0)
+            end = start + min(maxResults or 100, 500)
+            response: dict[str, Any] = {
+                'messages': [
+                    {'id': message_id,
+                     'threadId': self.gmail.messages[message_id]['threadId']}
+                    for message_id in ids[start:end]
+                ],
+                'resultSizeEstimate': len(ids),
+            }
+            if end < len(ids):
+                response['nextPageToken'] = str(end)
+            self.gmail.backend.add_bytes(_json_size(response))
+            return response
+        return FakeRequest(self.gmail.backend, 'gmail.users.messages.list',
+                           handler)
+
+
+class FakeGmailHistory:
+    def __init__(self, gmail: 'FakeGmailService'):
+        self.gmail = gmail
+
+    def list(self, userId: str = 'me', startHistoryId: str = '',
+             historyTypes: list[str] | None = None, maxResults: int = 100,
+             pageToken: str | None = None, **kwargs: Any) -> FakeRequest:
+        def handler() -> dict[str, Any]:
+            # Gmail keeps about a week of history, older cursors are a 404
+            if int(startHistoryId) < self.gmail.history_floor:
+                raise _http_error(404, 'notFound')
+            records = [
+                record for record in self.gmail.history
+                if int(record['id']) > int(startHistoryId)
+                and (not historyTypes or any(
+                    HISTORY_KEYS[change] in record for change in historyTypes))
+            ]
+            start = int(pageToken or 0)
+            end = start + min(maxResults or 100, 500)
+            response: dict[str, Any] = {
+                'historyId': str(self.gmail.history_id)}
+            if records[start:end]:
+                response['history'] = records[start:end]
+            if end < len(records):
+                response['nextPageToken'] = str(end)
+            self.gmail.backend.add_bytes(_json_size(response))
+            return response
+        return FakeRequest(self.gmail.backend, 'gmail.users.history.list',
+                           handler)
+
+
+class FakeGmailUsers:
+    def __init__(self, gmail: 'FakeGmailService'):
+        self.gmail = gmail
+
+    def messages(self) -> FakeGmailMessages:
+        return FakeGmailMessages(self.gmail)
+
+    def history(self) -> FakeGmailHistory:
+        return FakeGmailHistory(self.gmail)
+
+    def getProfile(self, userId: str = 'me', **kwargs: Any) -> FakeRequest:
+        return FakeRequest(
+            self.gmail.backend, 'gmail.users.getProfile',
+            lambda: {'emailAddress': 'me@example.com',
+                     'messagesTotal': len(self.gmail.messages),
+                     'historyId': str(self.gmail.history_id)})
+
+
+class FakeGmailService:
+    """Fake Gmail v1 service holding an in-memory mailbox."""
+
+    def __init__(self, backend: FakeBackend | None = None):
+        self.backend = backend or FakeBackend()
+        self.messages: dict[str, dict[str, Any]] = {}
+        # Message IDs are never reused, even after deletions
+        self.message_count = 0
+        self.history_id = 1
+        # users.history.list records, and the oldest usable start ID
+        self.history: list[dict[str, Any]] = []
+        self.history_floor = 0
+
+    def users(self) -> FakeGmailUsers:
+        return FakeGmailUsers(self)
+
+    def new_batch_http_request(self, callback: Any = None) -> FakeBatch:
+        return FakeBatch(self.backend, callback)
+
+    def add_message(self, sender: str, subject: str, date: datetime,
+                    body_size: int = 4000) -> str:
+        """Add a message with a body of body_size characters."""
+        self.history_id += 1
+        self.message_count += 1
+        message_id = f'{self.message_count:016x}'
+        self.messages[message_id] = {
+            'id': message_id,
+            'threadId': message_id,
+            'historyId': str(self.history_id),
+            'internalDate': str(int(date.timestamp() * 1000)),
+            'snippet': subject[:100],
+            'payload': {'headers': [
+                {'name': 'From', 'value': sender},
+                {'name': 'To', 'value': 'me@example.com'},
+                {'name': 'Subject', 'value': subject},
+                {'name': 'Date', 'value': date.strftime(
+                    '%a, %d %b %Y %H:%M:%S +0000')},
+                {'name': 'Message-ID', 'value': f'<{message_id}@example.com>'},
+            ]},
+            'body': 'x' * body_size,
+        }
+        self.history.append({
+            'id': str(self.history_id),
+            'messagesAdded': [{'message': {
+                'id': message_id, 'threadId': message_id,
+                'labelIds': ['INBOX']}}],
+        })
+        return message_id
+
+    def delete_message(self, message_id: str) -> None:
+        """Delete a message for good, recording it in the history."""
+        del self.messages[message_id]
+        self.history_id += 1
+        self.history.append({
+            'id': str(self.history_id),
+            'messagesDeleted': [{'message': {
+                'id': message_id, 'threadId': message_id}}],
+        })
+
+    def expire_history(self) -> None:
+        """Drop the history, so older start IDs are rejected with a 404."""
+        self.history = []
+        self.history_floor = self.history_id
+
+    def search(self, q: str) -> list[str]:
+        """Evaluate from:, after: and before: terms, newest message first like Gmail."""
+        senders = re.findall(r'from:([^\s)]+)', q)
+        # after: and before: take a date or, as here, seconds since the epoch
+        after = [int(seconds) * 1000 for seconds in re.findall(r'after:(\d+)', q)]
+        before = [int(seconds) * 1000 for seconds in re.findall(r'before:(\d+)', q)]
+        ids = [
+            message_id for message_id, message in self.messages.items()
+            if (not senders or any(
+                sender in message['payload']['headers'][0]['value']
+                for sender in senders))
+            and all(int(message['internalDate']) > ms for ms in after)
+            and all(int(message['internalDate']) < ms for ms in before)
+        ]
+        return sorted(
+            ids, key=lambda message_id: (
+                int(self.messages[message_id]['internalDate']), message_id),
+            reverse=True)
+
+
+def build_mailbox(gmail: FakeGmailService, messages: int = 5000,
+                  seed: int = 0) -> None:
+    """Fill the mailbox with messages from a handful of senders."""
+    rng = random.Random(seed)
+    senders = ['alerts@idealista.com', 'news@example.com', 'bank@example.com']
+    start = datetime(2024, 1, 1)
+    for index in range(messages):
+        gmail.add_message(
+            rng.choice(senders),
+            f'Message {index} about {rng.choice(LAST_NAMES)}',
+            start + timedelta(minutes=index),
+        )
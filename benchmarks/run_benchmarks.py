@@ -0,0 +1,682 @@
+"""Benchmark the scripts against the in-process fake Google services.
+
+Run from the repository root:
+
+    python -m benchmarks.run_benchmarks --latency 0.02 --output bench_results.json
+    python -m benchmarks.run_benchmarks --only trackers --compare old.json
+
+Each scenario records wall time, API calls per method, HTTP round-trips,
+peak traced memory and throughput, and the whole run is written as JSON so
+results can be compared between versions.
+"""
+import argparse
+import functools
+import importlib.util
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from types import ModuleType
+from typing import Any, Iterator
+
+from benchmarks.fake_google import (
+    FOLDER_MIME_TYPE,
+    FakeBackend,
+    FakeDriveService,
+    FakeGmailService,
+    build_mailbox,
+    build_status_tree,
+    customer_names,
+)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Wall time ratio above which --compare reports a regression
+REGRESSION_THRESHOLD = 1.10
+# Scripts whose cold import time the startup scenario measures
+STARTUP_SCRIPTS = [
+    'closing-termination-forms.py',
+    'convert_xlsx_to_pdf_pass.py',
+    'list_gmail_messages.py',
+    'parse_customer_information.py',
+    'track_drive_folder_statuses.py',
+    'track_drive_folder_statuses_batch_request.py',
+]
+IMPORT_SNIPPET = (
+    'import importlib.util, sys; sys.path.insert(0, {root!r}); '
+    'spec = importlib.util.spec_from_file_location("script", {path!r}); '
+    'spec.loader.exec_module(importlib.util.module_from_spec(spec))'
+)
+
+
+def load_script(file_name: str) -> ModuleType:
+    """Import a top-level script, including ones with dashes in the name."""
+    module_name = os.path.splitext(file_name)[0].replace('-', '_')
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(
+        module_name, os.path.join(REPO_ROOT, file_name))
+    if spec is None or spec.loader is None:
+        raise ImportError(f'Cannot load {file_name}')
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def disable_rate_limits() -> None:
+    """The fakes have no quota, so only keep the retry policy."""
+    from request_executor import RequestExecutor, set_executor
+    for api in ('drive', 'gmail'):
+        set_executor(api, RequestExecutor(limiter=None))
+
+
+@contextmanager
+def working_directory(path: str) -> Iterator[None]:
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def measure(
+    name: str,
+    run: Callable[[], int],
+    unit: str,
+    backend: FakeBackend | None,
+    trace_memory: bool,
+) -> dict[str, Any]:
+    """
+    Run one scenario and collect its metrics.
+
+    Args:
+        name: Scenario name.
+        run: Function running the scenario and returning the item count.
+        unit: What an item is, e.g. 'customers' or 'rows'.
+        backend: Fake backend whose counters are reported.
+        trace_memory: Whether to track peak memory with tracemalloc.
+    """
+    if backend is not None:
+        backend.reset()
+    if trace_memory:
+        tracemalloc.start()
+    start_time = time.perf_counter()
+    items = run()
+    wall_time = time.perf_counter() - start_time
+    peak_memory = None
+    if trace_memory:
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    result: dict[str, Any] = {
+        'name': name,
+        'wall_time_s': round(wall_time, 4),
+        'items': items,
+        'unit': unit,
+        'throughput_per_s': round(items / wall_time, 2) if wall_time else None,
+        'peak_memory_bytes': peak_memory,
+    }
+    if backend is not None:
+        result.update(backend.report())
+    print(
+        f'{name:<55} {wall_time:>9.3f}s {items:>9} {unit:<10}'
+        f" {result.get('http_round_trips', '-'):>7} round-trips")
+    return result
+
+
+def tracker_scenarios(args: argparse.Namespace) -> list[dict[str, Any]]:
+    tracker = load_script('track_drive_folder_statuses.py')
+    batch_tracker = load_script('track_drive_folder_statuses_batch_request.py')
+
+    backend = FakeBackend(latency=args.latency)
+    drive = FakeDriveService(backend)
+    stage_ids, folder_ids = build_status_tree(
+        drive, args.stages, args.batches, args.pdfs, args.seed)
+
+    return [
+        measure(
+            'track_drive_folder_statuses.sequential',
+            lambda: len(tracker.get_application_statuses(drive, stage_ids)),
+            'customers', backend, args.trace_memory),
+        measure(
+            f'track_drive_folder_statuses.concurrent_{args.workers}',
+            lambda: len(tracker.get_application_statuses_concurrent(
+                lambda: drive, stage_ids, args.workers)),
+            'customers', backend, args.trace_memory),
+        measure(
+            'track_drive_folder_statuses_batch_request.sequential',
+            lambda: len(batch_tracker.get_application_statuses(
+                drive, folder_ids)),
+            'customers', backend, args.trace_memory),
+        measure(
+            'track_drive_folder_statuses_batch_request.batched',
+            lambda: len(batch_tracker.get_application_statuses_batched(
+                drive, folder_ids)),
+            'customers', backend, args.trace_memory),
+    ]
+
+
+def _write_template(path: str, title: str, pages: int) -> None:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    c = canvas.Canvas(path, pagesize=A4)
+    for page in range(pages):
+        c.setFont('Helvetica-Bold', 16)
+        c.drawString(72, A4[1] - 72, f'{title} - page {page + 1}')
+        c.setFont('Helvetica', 9)
+        for line in range(40):
+            c.drawString(72, A4[1] - 110 - line * 16, f'Field {line} ' + '_' * 60)
+        c.showPage()
+    c.save()
+
+
+def _synthetic_photo(width: int, height: int, seed: int) -> bytes:
+    """A noisy JPEG compresses like a camera picture, unlike a flat one."""
+    from PIL import Image
+
+    image = Image.effect_noise((width, height), 64 + seed % 32).convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=92)
+    return buffer.getvalue()
+
+
+def sample_customer(index: int) -> dict[str, str]:
+    return {
+        'account_name': f'Customer Number {index}',
+        'account_type': 'Saving',
+        'account_number': f'012-3456-{index:02d}-12345678',
+        'balance': '0.00 USD',
+        'check_number': '',
+        'unused_check_from': '',
+        'unused_check_to': '',
+        'pass_book_returned': '',
+        'cardholder_name': f'Customer Number {index}',
+        'current_address': f'{index} Example Street, City, State 000000',
+        'passport_number': f'AA{index:06d}',
+        'date_of_issuance': '01 01 2020',
+        'contact_number': '+0000000000',
+        'card_number': '0000 0000 0000 0000',
+        'email_address': f'customer{index}@example.com',
+    }
+
+
+def forms_scenario(args: argparse.Namespace) -> list[dict[str, Any]]:
+    from drive_uploads import UploadManager
+
+    forms = load_script('closing-termination-forms.py')
+
+    backend = FakeBackend(latency=args.latency)
+    drive = FakeDriveService(backend)
+    selfie_id = drive.add_file(
+        'selfie.jpg', 'root', 'image/jpeg',
+        content=_synthetic_photo(3000, 4000, 1))
+    passport_id = drive.add_file(
+        'passport.jpg', 'root', 'image/jpeg',
+        content=_synthetic_photo(4000, 3000, 2))
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        templates = os.path.join(
+            work_dir, 'automate-cancellation-form', 'templates')
+        os.makedirs(templates)
+        _write_template(
+            os.path.join(templates, 'Closing-Bank-Account.pdf'),
+            'Closing Bank Account', 1)
+        _write_template(
+            os.path.join(templates, 'Card-Termination-Form.pdf'),
+            'Card Termination Form', 3)
+
+        def run() -> int:
+            # The forms folder is listed once for the whole batch
+            folder_id = drive.add_file('forms', 'root', FOLDER_MIME_TYPE)
+            with UploadManager(lambda: drive) as uploads:
+                existing = uploads.list_folder(folder_id)
+                for index in range(args.customers):
+                    forms.process_final_output(
+                        drive, sample_customer(index), selfie_id, passport_id,
+                        uploads=uploads, upload_folder_id=folder_id,
+                        existing_uploads=existing)
+            return args.customers
+
+        with working_directory(work_dir):
+            return [measure(
+                'closing-termination-forms.process_final_output',
+                run, 'customers', backend, args.trace_memory)]
+
+
+def export_rows(rows: int) -> Iterator[list[Any]]:
+    """Yield the header and rows of a spreadsheet shaped like our exports."""
+    yield [
+        'Account', 'Customer', 'Currency', 'Balance', 'Opened',
+        'Branch', 'Status', 'Notes',
+    ]
+    for index in range(rows):
+        yield [
+            f'012-{index:08d}', f'Customer {index}', 'USD',
+            round(index * 1.37, 2), f'2020-01-{index % 28 + 1:02d}',
+            f'Branch {index % 40}', 'withdrawn' if index % 3 else 'cancelled',
+            'n/a',
+        ]
+
+
+def write_workbook(path: str, rows: int) -> None:
+    """Write a single-sheet workbook shaped like our exports."""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Export')
+    for row in export_rows(rows):
+        sheet.append(row)
+    workbook.save(path)
+
+
+def xlsx_scenario(args: argparse.Namespace) -> list[dict[str, Any]]:
+    converter = load_script('convert_xlsx_to_pdf_pass.py')
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        input_path = os.path.join(work_dir, 'export.xlsx')
+        output_path = os.path.join(work_dir, 'export.pdf')
+        write_workbook(input_path, args.rows)
+
+        def run() -> int:
+            df = converter.load_excel_data(input_path)
+            converter.dataframe_to_paginated_pdf(df, output_path)
+            return args.rows
+
+        def run_streaming() -> int:
+            converter.excel_to_paginated_pdf(input_path, output_path)
+            return args.rows
+
+        def run_sharded() -> int:
+            converter.convert_sheets_parallel(
+                [(input_path, None, output_path)], max_workers=args.workers)
+            return args.rows
+
+        return [
+            measure(
+                'convert_xlsx_to_pdf_pass.dataframe_to_paginated_pdf',
+                run, 'rows', None, args.trace_memory),
+            measure(
+                'convert_xlsx_to_pdf_pass.excel_to_paginated_pdf',
+                run_streaming, 'rows', None, args.trace_memory),
+            measure(
+                'convert_xlsx_to_pdf_pass.convert_sheets_parallel',
+                run_sharded, 'rows', None, args.trace_memory),
+        ]
+
+
+def grid_scenario(args: argparse.Namespace) -> list[dict[str, Any]]:
+    converter = load_script('convert_xlsx_to_pdf_pass.py')
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        output_path = os.path.join(work_dir, 'export.pdf')
+        for renderer in converter.PAGE_DRAWERS:
+            def run(renderer: str = renderer) -> int:
+                pages: int = converter.rows_to_paginated_pdf(
+                    export_rows(args.rows), output_path, renderer=renderer)
+                return pages
+
+            results.append(measure(
+                f'convert_xlsx_to_pdf_pass.rows_to_paginated_pdf[{renderer}]',
+                run, 'pages', None, args.trace_memory))
+    return results
+
+
+def customer_workbook(rows: int) -> bytes:
+    """Return a workbook shaped like the customer exports."""
+    from openpyxl import Workbook
+
+    from parse_customer_information import EXPECTED_COLUMNS
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Customers')
+    sheet.append(['Customer export'])
+    sheet.append(EXPECTED_COLUMNS)
+    for index in range(rows):
+        sheet.append([
+            index + 1, f'CIF{index:08d}', f'Customer Number {index}',
+            f'AA{index:06d}', f'CUSTOMER {index}', f'012{index:09d}',
+            f'4111{index:012d}', datetime(2020, 1, index % 28 + 1),
+        ])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def workbooks_scenario(args: argparse.Namespace) -> list[dict[str, Any]]:
+    from parse_customer_information import load_customer_information
+    from workbook_cache import WorkbookCache
+
+    backend = FakeBackend(latency=args.latency)
+    drive = FakeDriveService(backend)
+    file_id = drive.add_file(
+        'customers.xlsx', 'root',
+        'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        content=customer_workbook(args.workbook_rows))
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        cache = WorkbookCache(work_dir)
+
+        def run(use_cache: bool) -> int:
+            records = load_customer_information(
+                drive, file_id, cache if use_cache else None)
+            return len(records or [])
+
+        results = [
+            measure('parse_customer_information.load_customer_information',
+                    lambda: run(False), 'customers', backend,
+                    args.trace_memory),
+            measure('parse_customer_information.load_customer_information'
+                    '[cold cache]',
+                    lambda: run(True), 'customers', backend,
+                    args.trace_memory),
+            measure('parse_customer_information.load_customer_information'
+                    '[unchanged]',
+                    lambda: run(True), 'customers', backend,
+                    args.trace_memory),
+        ]
+        drive.update_file(
+            file_id, {}, content=customer_workbook(args.workbook_rows + 1))
+        results.append(measure(
+            'parse_customer_information.load_customer_information[changed]',
+            lambda: run(True), 'customers', backend, args.trace_memory))
+    return results
+
+
+def join_scenario(args: argparse.Namespace) -> list[dict[str, Any]]:
+    from status_join import join_customer_statuses
+
+    names = customer_names(args.join_rows + args.join_rows // 10, args.seed)
+    # A tenth of each side has no match on the other one, and the
+    # spreadsheet spells names the way the trackers do not
+    records = [
+        {'Fullname': f'  {name.upper()} ', 'ID_No.': f'AA{index:06d}'}
+        for index, name in enumerate(names[:args.join_rows])
+    ]
+    statuses = [
+        {'customer': name.lower(), 'file_id': f'file{index}',
+         'status': 'processed', 'batch': '2024-01-01 batch'}
+        for index, name in enumerate(names[args.join_rows // 10:])
+    ]
+
+    # Drop a letter from every tenth name, for the fuzzy join to recover
+    typed_records = [
+        dict(record, Fullname=record['Fullname'][:5] + record['Fullname'][6:])
+        if index % 10 == 5 else record
+        for index, record in enumerate(records)
+    ]
+
+    def run() -> int:
+        join_customer_statuses(records, statuses)
+        return len(records)
+
+    def run_fuzzy() -> int:
+        join_customer_statuses(typed_records, statuses, fuzzy=True)
+        return len(records)
+
+    return [
+        measure(
+            'status_join.join_customer_statuses',
+            run, 'rows', None, args.trace_memory),
+        measure(
+            'status_join.join_customer_statuses[fuzzy]',
+            run_fuzzy, 'rows', None, args.trace_memory),
+    ]
+
+
+def uploads_scenario(args: argparse.Namespace) -> list[dict[str, Any]]:
+    from drive_uploads import UploadManager
+
+    backend = FakeBackend(latency=args.latency)
+    drive = FakeDriveService(backend)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        paths = []
+        for index in range(args.uploads):
+            path = os.path.join(work_dir, f'form-{index:05d}.pdf')
+            with open(path, 'wb') as form_file:
+                form_file.write(os.urandom(48 * 1024))
+            paths.append(path)
+
+        def upload(max_workers: int) -> int:
+            folder_id = drive.add_file(
+                f'forms-{max_workers}', 'root', FOLDER_MIME_TYPE)
+            with UploadManager(lambda: drive, max_workers) as uploads:
+                uploads.upload(folder_id, paths, progress=None)
+            return len(paths)
+
+        return [
+            measure(
+                'drive_uploads.sequential', lambda: upload(1),
+                'files', backend, args.trace_memory),
+            measure(
+                f'drive_uploads.concurrent_{args.workers}',
+                lambda: upload(args.workers),
+                'files', backend, args.trace_memory),
+        ]
+
+
+def gmail_scenario(args: argparse.Namespace) -> list[dict[str, Any]]:
+    gmail_script = load_script('list_gmail_messages.py')
+
+    backend = FakeBackend(latency=args.latency)
+    gmail = FakeGmailService(backend)
+    build_mailbox(gmail, args.messages, args.seed)
+    message_ids = gmail.search('')
+
+    def fetch_full() -> int:
+        # One full-format messages.get per message, as list_messages did
+        for message_id in message_ids:
+            gmail_script.message_record(gmail.users().messages().get(
+                userId='me', id=message_id).execute())
+        return len(message_ids)
+
+    def fetch_batched() -> int:
+        return len(gmail_script.get_messages_metadata(gmail, message_ids))
+
+    def export(extension: str) -> int:
+        with tempfile.TemporaryDirectory() as work_dir:
+            return int(gmail_script.export_messages(
+                gmail, '', os.path.join(work_dir, f'messages{extension}')))
+
+    def sync(store_path: str, new_messages: int = 0) -> int:
+        # A day of new mail, a hundredth of the mailbox, arrives between runs
+        received = datetime.now() - timedelta(minutes=new_messages)
+        for index in range(new_messages):
+            gmail.add_message(
+                'alerts@idealista.com', f'New message {index}',
+                received + timedelta(minutes=index))
+        return len(gmail_script.list_messages_incremental(
+            gmail, 'from:idealista', store_path))
+
+    results = [
+        measure(
+            'list_gmail_messages.messages_get[full]', fetch_full,
+            'messages', backend, args.trace_memory),
+        measure(
+            'list_gmail_messages.get_messages_metadata', fetch_batched,
+            'messages', backend, args.trace_memory),
+        measure(
+            'list_gmail_messages.export_messages[csv]', lambda: export('.csv'),
+            'messages', backend, args.trace_memory),
+        measure(
+            'list_gmail_messages.export_messages[jsonl]', lambda: export('.jsonl'),
+            'messages', backend, args.trace_memory),
+    ]
+    with tempfile.TemporaryDirectory() as work_dir:
+        store_path = os.path.join(work_dir, 'messages.json')
+        results.extend([
+            measure(
+                'list_gmail_messages.list_messages_incremental[full]',
+                lambda: sync(store_path), 'messages', backend,
+                args.trace_memory),
+            measure(
+                'list_gmail_messages.list_messages_incremental[history]',
+                lambda: sync(store_path, max(1, args.messages // 100)),
+                'messages', backend, args.trace_memory),
+        ])
+    return results
+
+
+def _run_python(code: str, runs: int) -> int:
+    for _ in range(runs):
+        subprocess.run([sys.executable, '-c', code], cwd=REPO_ROOT, check=True)
+    return runs
+
+
+def startup_scenario(args: argparse.Namespace) -> list[dict[str, Any]]:
+    """Cold import time of each script and client build time."""
+    from google.auth.credentials import AnonymousCredentials
+    from googleapiclient.discovery import build
+
+    from google_clients import build_service
+
+    results = [measure(
+        'startup.interpreter',
+        lambda: _run_python('pass', args.startup_runs),
+        'runs', None, False)]
+    for file_name in STARTUP_SCRIPTS:
+        code = IMPORT_SNIPPET.format(
+            root=REPO_ROOT, path=os.path.join(REPO_ROOT, file_name))
+        results.append(measure(
+            f'startup.import.{file_name}',
+            functools.partial(_run_python, code, args.startup_runs),
+            'runs', None, False))
+
+    credentials = AnonymousCredentials()
+
+    def discovery_build() -> int:
+        for _ in range(args.startup_runs):
+            build('drive', 'v3', credentials=credentials, cache_discovery=False)
+        return args.startup_runs
+
+    def client_factory_build() -> int:
+        for _ in range(args.startup_runs):
+            build_service('drive', 'v3', credentials)
+        return args.startup_runs
+
+    results.append(measure(
+        'startup.build.discovery', discovery_build,
+        'clients', None, args.trace_memory))
+    results.append(measure(
+        'startup.build.google_clients', client_factory_build,
+        'clients', None, args.trace_memory))
+    return results
+
+
+SCENARIOS = {
+    'trackers': tracker_scenarios,
+    'forms': forms_scenario,
+    'xlsx': xlsx_scenario,
+    'grid': grid_scenario,
+    'startup': startup_scenario,
+    'uploads': uploads_scenario,
+    'gmail': gmail_scenario,
+    'workbooks': workbooks_scenario,
+    'join': join_scenario,
+}
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: list[dict[str, Any]], baseline_path: str) -> int:
+    """Print wall time ratios against a previous run, return regressions."""
+    with open(baseline_path, encoding='utf-8') as baseline_file:
+        baseline = {
+            result['name']: result
+            for result in json.load(baseline_file)['results']
+        }
+
+    regressions = 0
+    for result in results:
+        previous = baseline.get(result['name'])
+        if not previous or not previous['wall_time_s']:
+            continue
+        ratio = result['wall_time_s'] / previous['wall_time_s']
+        flag = 'REGRESSION' if ratio > REGRESSION_THRESHOLD else ''
+        regressions += bool(flag)
+        print(f"{result['name']:<55} x{ratio:6.2f} {flag}")
+    return regressions
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--only', choices=sorted(SCENARIOS), action='append',
+                        help='Run only these scenario groups.')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Seconds of latency per HTTP round-trip.')
+    parser.add_argument('--stages', type=int, default=3)
+    parser.add_argument('--batches', type=int, default=500)
+    parser.add_argument('--pdfs', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--customers', type=int, default=20,
+                        help='Customers for the forms scenario.')
+    parser.add_argument('--rows', type=int, default=20_000,
+                        help='Rows for the xlsx and grid scenarios.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workbook-rows', type=int, default=5000,
+                        help='Customers in the workbooks scenario.')
+    parser.add_argument('--join-rows', type=int, default=50_000,
+                        help='Rows on each side of the join scenario.')
+    parser.add_argument('--messages', type=int, default=5000,
+                        help='Messages in the gmail scenario mailbox.')
+    parser.add_argument('--uploads', type=int, default=500,
+                        help='Files for the uploads scenario.')
+    parser.add_argument('--startup-runs', type=int, default=5,
+                        help='Repetitions of each startup measurement.')
+    parser.add_argument('--no-trace-memory', dest='trace_memory',
+                        action='store_false',
+                        help='Skip tracemalloc, which slows the scenarios.')
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', help='Previous results to compare to.')
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    sys.path.insert(0, REPO_ROOT)
+    disable_rate_limits()
+
+    results = []
+    for name in args.only or SCENARIOS:
+        results.extend(SCENARIOS[name](args))
+
+    report = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'parameters': {
+            key: value for key, value in vars(args).items()
+            if key not in ('output', 'compare')
+        },
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f'Results written to {args.output}')
+
+    if args.compare:
+        return 1 if compare(results, args.compare) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
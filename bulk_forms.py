@@ -0,0 +1,245 @@
+"""Fill the closing and card termination forms of a whole customer spreadsheet.
+
+    python bulk_forms.py customers.xlsx forms.zip
+    python bulk_forms.py customers.xlsx forms/ --workers 8
+    python bulk_forms.py customers.xlsx forms/ --upload-folder <folder id>
+"""
+import argparse
+import io
+import itertools
+import logging
+import os
+import traceback
+import zipfile
+from collections.abc import Iterable, Iterator, Mapping
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from datetime import date, datetime
+from typing import Any
+
+from form_templates import (
+    TEMPLATE_DIR,
+    TEMPLATE_NAMES,
+    form_file_name,
+    load_template,
+    template_path,
+)
+from parallelism import TASKS_PER_WORKER, available_cores
+
+# Customers rendered per task, enough to amortise the inter-process traffic
+DEFAULT_CHUNK_SIZE = 16
+
+
+def _format_value(value: Any) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, (datetime, date)):
+        return value.strftime('%d %m %Y')
+    return str(value)
+
+
+def customer_form_data(record: Mapping[str, Any]) -> dict[str, str]:
+    """
+    Map a row of parse_customer_information.iter_customer_information
+    to the fields of the forms.
+    """
+    return {
+        'account_name': _format_value(record.get('Fullname')),
+        'account_number': _format_value(record.get('CASA_Account_No')),
+        'cardholder_name': _format_value(
+            record.get('Emboss_Name') or record.get('Fullname')),
+        'passport_number': _format_value(record.get('ID_No.')),
+        'date_of_issuance': _format_value(record.get('ISS_DATE')),
+        'card_number': _format_value(record.get('CARDNUMBER')),
+    }
+
+
+def render_customer_forms(
+    data: Mapping[str, Any],
+    template_dir: str = TEMPLATE_DIR,
+) -> list[tuple[str, bytes]]:
+    """
+    Fill every form of one customer in memory.
+
+    Returns:
+        (file name, PDF content) of each form.
+    """
+    forms = []
+    for form_type in TEMPLATE_NAMES:
+        buffer = io.BytesIO()
+        load_template(template_path(form_type, template_dir), form_type).fill(
+            data, buffer)
+        forms.append((form_file_name(data, form_type), buffer.getvalue()))
+    return forms
+
+
+def _render_chunk(
+    chunk: list[tuple[int, dict[str, str]]],
+    template_dir: str,
+) -> list[dict[str, Any]]:
+    """Render a chunk of customers in a worker, catching failures per customer."""
+    results: list[dict[str, Any]] = []
+    for index, data in chunk:
+        try:
+            forms = render_customer_forms(data, template_dir)
+        except Exception as error:
+            results.append({
+                'index': index,
+                'customer': data.get('account_name'),
+                'error': f'{type(error).__name__}: {error}',
+                'traceback': traceback.format_exc(),
+            })
+        else:
+            results.append({'index': index, 'forms': forms})
+    return results
+
+
+class _FormSink:
+    """Writes forms into a directory, or a ZIP when the path ends in .zip."""
+
+    def __init__(self, output: str) -> None:
+        self.output = output
+        # Files written into the directory, so callers skip older forms
+        self.paths: list[str] = []
+        self._zip: zipfile.ZipFile | None = None
+        if output.lower().endswith('.zip'):
+            # The PDF streams are already compressed
+            self._zip = zipfile.ZipFile(output, 'w', zipfile.ZIP_STORED)
+        else:
+            os.makedirs(output, exist_ok=True)
+
+    def write(self, name: str, content: bytes) -> None:
+        if self._zip is not None:
+            self._zip.writestr(name, content)
+            return
+        path = os.path.join(self.output, name)
+        with open(path, 'wb') as form_file:
+            form_file.write(content)
+        self.paths.append(path)
+
+    def close(self) -> None:
+        if self._zip is not None:
+            self._zip.close()
+
+
+def _chunks(
+    records: Iterable[Mapping[str, Any]],
+    chunk_size: int,
+) -> Iterator[list[tuple[int, dict[str, str]]]]:
+    numbered = enumerate(customer_form_data(record) for record in records)
+    while chunk := list(itertools.islice(numbered, chunk_size)):
+        yield chunk
+
+
+def generate_forms_bulk(
+    records: Iterable[Mapping[str, Any]],
+    output: str,
+    template_dir: str = TEMPLATE_DIR,
+    max_workers: int | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> dict[str, Any]:
+    """
+    Fill the forms of every customer across a process pool.
+
+    Forms are written as soon as their chunk finishes. A customer whose
+    forms fail to render is logged and reported, the others go on.
+
+    Args:
+        records: Rows yielded by iter_customer_information.
+        output: Output directory, or ZIP file if it ends in .zip.
+        template_dir: Directory of the template PDFs.
+        max_workers: Worker processes, defaults to the available cores.
+        chunk_size: Customers rendered per task.
+
+    Returns:
+        Counts of customers and forms, the paths of the forms written
+        into an output directory, plus the failures with the row index
+        (0-based, in records order), customer name and error.
+    """
+    max_workers = max_workers or available_cores()
+    sink = _FormSink(output)
+    summary: dict[str, Any] = {
+        'output': output,
+        'customers': 0,
+        'forms': 0,
+        'failures': [],
+    }
+    chunks = _chunks(records, chunk_size)
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            pending: set[Future[list[dict[str, Any]]]] = set()
+            exhausted = False
+            while pending or not exhausted:
+                while not exhausted and len(pending) < max_workers * TASKS_PER_WORKER:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        exhausted = True
+                    else:
+                        pending.add(executor.submit(_render_chunk, chunk, template_dir))
+                if not pending:
+                    break
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for result in future.result():
+                        summary['customers'] += 1
+                        if 'error' in result:
+                            logging.error(
+                                f"Forms of row {result['index']} "
+                                f"({result['customer']}) failed: {result['error']}")
+                            summary['failures'].append({
+                                key: result[key]
+                                for key in ('index', 'customer', 'error')
+                            })
+                            continue
+                        for name, content in result['forms']:
+                            sink.write(f"{result['index']:05d}-{name}", content)
+                            summary['forms'] += 1
+    finally:
+        sink.close()
+    summary['paths'] = sink.paths
+    return summary
+
+
+def main(argv: list[str] | None = None) -> int:
+    from parse_customer_information import iter_customer_information
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('spreadsheet', help='Customer spreadsheet (.xlsx).')
+    parser.add_argument('output', help='Output directory or .zip file.')
+    parser.add_argument('--templates', default=TEMPLATE_DIR)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--upload-folder',
+                        help='Drive folder ID to upload the forms to.')
+    args = parser.parse_args(argv)
+    if args.upload_folder and args.output.lower().endswith('.zip'):
+        parser.error('--upload-folder needs an output directory.')
+
+    logging.basicConfig(level=logging.INFO)
+    # Rows are handed to the workers as they are parsed
+    with open(args.spreadsheet, 'rb') as spreadsheet:
+        summary = generate_forms_bulk(
+            iter_customer_information(spreadsheet),
+            args.output, args.templates, args.workers)
+    print(
+        f"Filled {summary['forms']} forms for {summary['customers']} "
+        f"customers into {summary['output']}, "
+        f"{len(summary['failures'])} failed.")
+
+    failed = bool(summary['failures'])
+    if args.upload_folder:
+        from drive_uploads import UploadManager
+        from google_clients import build_service
+
+        # Only this run's forms, not the ones earlier runs left in the directory
+        with UploadManager(lambda: build_service('drive', 'v3')) as uploads:
+            upload_summary = uploads.upload(args.upload_folder, summary['paths'])
+        print(
+            f"Uploaded {upload_summary['uploaded']}, skipped "
+            f"{upload_summary['skipped']} already in Drive, "
+            f"{upload_summary['failed']} failed.")
+        failed = failed or bool(upload_summary['failed'])
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
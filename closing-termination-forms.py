@@ -1,40 +1,28 @@
+import io
 import os
 import tempfile
-
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
-from PIL import Image
-from PyPDF2 import PdfReader, PdfWriter
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas  # type: ignore
-
-
-def adjust_coordinates(
-        x: int,
-        y: int,
-        page_height: float) -> tuple[int, float]:
-    """
-    Adjust Y-coordinate for ReportLab.
-
-    Args:
-        x: X-coordinate.
-        y: Y-coordinate.
-        page_height: Height of the PDF page.
-
-    Returns:
-        Adjusted coordinates as a tuple (x, y).
-    """
-    adjusted_y = page_height - y
-    return x, adjusted_y
+from typing import Any
+
+from api_metrics import ApiMetrics
+from drive_downloads import ContentCache, DownloadManager
+from drive_uploads import UploadManager
+from form_images import DEFAULT_IMAGE_DPI, DEFAULT_JPEG_QUALITY, downsample_image
+from form_templates import (
+    TEMPLATE_NAMES,
+    form_file_name,
+    load_template,
+    stamp_page,
+    template_path,
+)
+from google_clients import build_service, get_credentials
 
 
 def download_images(
         service,
         passport_selfie_id: str,
         passport_id: str,
-        temp_dir: str,
-) -> tuple[str, str]:
+        downloads: DownloadManager | None = None,
+) -> tuple[bytes, bytes]:
     """
     Download the passport selfie and passport image from Google Drive.
 
@@ -42,44 +30,29 @@ def download_images(
         service: Google Drive API service instance.
         passport_selfie_id: File ID of the passport selfie.
         passport_id: File ID of the passport.
-        temp_dir: Path to the temporary directory.
+        downloads: Download manager fetching both images at once, None to
+            download them one after the other with service.
 
     Returns:
-        Tuple containing the file paths of the downloaded
+        Tuple containing the content of the downloaded
         passport selfie and passport image.
     """
+    if downloads is None:
+        downloads = DownloadManager(lambda: service, max_workers=1)
 
-    file_ids = {
-        'passport_selfie': passport_selfie_id,
-        'passport': passport_id,
-    }
-
-    downloaded_paths = {}
-
-    for file_name, file_id in file_ids.items():
-        file_path = os.path.join(temp_dir, f'{file_name}.jpg')
-
-        try:
-            request = service.files().get_media(fileId=file_id)
+    try:
+        contents = downloads.download([passport_selfie_id, passport_id])
+    except Exception as e:
+        raise RuntimeError(
+            f'Failed to download file IDs {passport_selfie_id}, '
+            f'{passport_id}') from e
 
-            with open(file_path, 'wb') as img_file:
-                downloader = MediaIoBaseDownload(img_file, request)
-                done = False
-                while not done:
-                    _, done = downloader.next_chunk()
+    for file_id, content in contents.items():
+        if not content:
+            raise RuntimeError(
+                f'Failed to download file ID {file_id}: File is empty.')
 
-            if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
-                downloaded_paths[file_name] = file_path
-            else:
-                raise ValueError(
-                    f'Failed to download file ID {file_id}: '
-                    'File is missing or empty.',
-                )
-
-        except Exception as e:
-            raise RuntimeError(f'Failed to download file ID {file_id}') from e
-
-    return downloaded_paths['passport_selfie'], downloaded_paths['passport']
+    return contents[passport_selfie_id], contents[passport_id]
 
 
 def fill_application_form(
@@ -98,85 +71,7 @@ def fill_application_form(
         output_pdf: Path to save the filled PDF.
         form_type: Type of form ("closing_account" or "card_termination").
     """
-    with tempfile.TemporaryDirectory() as temp_dir:
-        overlay_pdf_path = os.path.join(temp_dir, 'temp_overlay.pdf')
-        template_reader = PdfReader(template_pdf)
-        page_height = float(template_reader.pages[0].mediabox[3])
-
-        c = canvas.Canvas(overlay_pdf_path)
-        c.setFont('Helvetica', 9)
-
-        if form_type == 'closing_account':
-            c.drawString(
-                *adjust_coordinates(149, 210, page_height),
-                data.get('account_name', '').upper())
-            c.drawString(
-                *adjust_coordinates(192, 295, page_height),
-                data.get('account_number', '').upper())
-            c.drawString(
-                *adjust_coordinates(192, 318, page_height),
-                data.get('account_name', '').upper())
-            c.drawString(
-                *adjust_coordinates(273, 346, page_height),
-                data.get('balance', '').upper())
-            c.drawString(
-                *adjust_coordinates(164, 386, page_height),
-                data.get('check_number', '').upper())
-            c.drawString(
-                *adjust_coordinates(409, 404, page_height),
-                data.get('unused_check_from', '').upper())
-            c.drawString(
-                *adjust_coordinates(486, 404, page_height),
-                data.get('unused_check_to', '').upper())
-            c.drawString(
-                *adjust_coordinates(116, 424, page_height),
-                data.get('balance', '').upper())
-            c.drawString(
-                *adjust_coordinates(392, 538, page_height),
-                data.get('account_name', '').upper())
-
-        elif form_type == 'card_termination':
-            c.drawString(
-                *adjust_coordinates(267, 260, page_height),
-                data.get('cardholder_name', '').upper())
-            c.drawString(
-                *adjust_coordinates(211, 274, page_height),
-                data.get('current_address', '').upper())
-            c.drawString(
-                *adjust_coordinates(307, 290, page_height),
-                data.get('passport_number', '').upper())
-            c.drawString(
-                *adjust_coordinates(479, 290, page_height),
-                data.get('date_of_issuance', '').upper())
-            c.drawString(
-                *adjust_coordinates(206, 306, page_height),
-                data.get('contact_number', '').upper())
-            c.drawString(
-                *adjust_coordinates(172, 324, page_height),
-                data.get('card_number', '').upper())
-            c.drawString(
-                *adjust_coordinates(188, 418, page_height),
-                data.get('account_number', '').upper())
-            c.drawString(
-                *adjust_coordinates(404, 492, page_height),
-                data.get('email_address', ''))
-
-        c.save()
-
-        overlay_reader = PdfReader(overlay_pdf_path)
-        writer = PdfWriter()
-
-        template_page = template_reader.pages[0]
-        overlay_page = overlay_reader.pages[0]
-
-        template_page.merge_page(overlay_page)
-        writer.add_page(template_page)
-
-        for page_num in range(1, len(template_reader.pages)):
-            writer.add_page(template_reader.pages[page_num])
-
-        with open(output_pdf, 'wb') as output_file:
-            writer.write(output_file)
+    load_template(template_pdf, form_type).fill(data, output_pdf)
 
 
 def generate_forms(
@@ -189,65 +84,54 @@ def generate_forms(
     Args:
         data: Dictionary containing customer data.
     """
-    account_owner = data.get('account_name', '').upper().replace(' ', '_')
-
-    # Define template names and paths
-    closing_account_template_name = 'Closing-Bank-Account'
-    card_termination_template_name = 'Card-Termination-Form'
-
-    closing_account_template = (
-        f'./automate-cancellation-form/templates/'
-        f'{closing_account_template_name}.pdf')
-    card_termination_template = (
-        f'./automate-cancellation-form/templates/'
-        f'{card_termination_template_name}.pdf')
-
-    closing_account_output = os.path.join(
-        temp_dir, f'{account_owner}-Closing-Bank-Account.pdf',
-    )
-    card_termination_output = os.path.join(
-        temp_dir, f'{account_owner}-Card-Termination-Form.pdf',
-    )
-
-    fill_application_form(
-        data,
-        closing_account_template,
-        closing_account_output,
-        form_type='closing_account',
-    )
-
-    fill_application_form(
-        data,
-        card_termination_template,
-        card_termination_output,
-        form_type='card_termination',
-    )
+    generated_forms = {}
+    for form_type in TEMPLATE_NAMES:
+        output_path = os.path.join(temp_dir, form_file_name(data, form_type))
+        fill_application_form(
+            data,
+            template_path(form_type),
+            output_path,
+            form_type=form_type,
+        )
+        generated_forms[f'{form_type}_form'] = output_path
 
-    return {
-        'closing_account_form': closing_account_output,
-        'card_termination_form': card_termination_output,
-    }
+    return generated_forms
 
 
 def add_images_to_pdf(
         pdf_paths: str,
-        passport_selfie_img: str,
-        passport_img: str,
+        passport_selfie_img: str | bytes,
+        passport_img: str | bytes,
+        dpi: int = DEFAULT_IMAGE_DPI,
+        quality: int = DEFAULT_JPEG_QUALITY,
 ) -> str:
     """
     Add images to specific pages in the existing termination form PDF
 
+    Images are downsampled to dpi at the width of the page and embedded as
+    JPEG, so the form does not carry the full camera resolution.
+
     Args:
         pdf_paths: Path termination form to modify
-        images: List of images path to add (in order)
-        output_pdf: Path to save the modified PDF.
+        passport_selfie_img: Path or content of the image drawn on the
+            second page.
+        passport_img: Path or content of the image drawn on the third page.
+        dpi: Resolution of the embedded images.
+        quality: JPEG quality of the embedded images.
 
     Raises:
         ValueError: If images are not compatible with required img format.
     """
+    from PyPDF2 import PdfReader, PdfWriter
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfgen import canvas  # type: ignore
+
     valid_extensions = {'.png', '.jpg', '.bmp'}
 
     for image_path in [passport_selfie_img, passport_img]:
+        if isinstance(image_path, bytes):
+            continue
         if not os.path.isfile(image_path):
             raise FileNotFoundError(f'Image file not found: {image_path}')
         _, ext = os.path.splitext(image_path.lower())
@@ -259,42 +143,31 @@ def add_images_to_pdf(
 
     reader = PdfReader(pdf_paths)
     writer = PdfWriter()
-    image_paths = [passport_selfie_img, passport_img]
-
-    for page_num, page in enumerate(reader.pages):
-        if page_num in [1, 2]:
-            image_index = page_num - 1
-            image_path = image_paths[image_index]
-
-            with tempfile.NamedTemporaryFile(
-                suffix='.pdf',
-                delete=False,
-            ) as temp_pdf:
-                c = canvas.Canvas(temp_pdf.name, pagesize=A4)
-
-                with Image.open(image_path) as img:
-                    img_width, img_height = img.size
-
-                    # Resize the image to fit the width of the A4
-                    scale = A4[0] / img_width
-                    img = img.resize(
-                        (int(img_width * scale), int(img_height * scale)),
-                        Image.Resampling.LANCZOS,
-                    )
-
-                    c.drawImage(
-                        image_path,
-                        0,
-                        A4[1] - img.height,
-                        width=img.width,
-                        height=img.height,
-                    )
-                    c.save()
-
-                temp_reader = PdfReader(temp_pdf.name)
-                page.merge_page(temp_reader.pages[0])
-
-        writer.add_page(page)
+    image_pages = {1: passport_selfie_img, 2: passport_img}
+
+    for page_num, template_page in enumerate(reader.pages):
+        page = writer.add_page(template_page)
+        image = image_pages.get(page_num)
+        if image is None:
+            continue
+
+        jpeg, img_width, img_height = downsample_image(
+            image, A4[0], dpi, quality)
+        # Fit the image to the width of the A4
+        height = A4[0] * img_height / img_width
+
+        # reportlab embeds JPEG data as is, without decoding it again
+        overlay = io.BytesIO()
+        c = canvas.Canvas(overlay, pagesize=A4)
+        c.drawImage(
+            ImageReader(io.BytesIO(jpeg)),
+            0,
+            A4[1] - height,
+            width=A4[0],
+            height=height,
+        )
+        c.save()
+        stamp_page(writer, page, PdfReader(overlay).pages[0], A4)
 
     with open(pdf_paths, 'wb') as output_file:
         writer.write(output_file)
@@ -311,6 +184,10 @@ def process_final_output(
     customer_data: dict[str, str],
     passport_selfie_id: str,
     passport_id: str,
+    downloads: DownloadManager | None = None,
+    uploads: UploadManager | None = None,
+    upload_folder_id: str | None = None,
+    existing_uploads: dict[str, dict[str, Any]] | None = None,
 ) -> str:
     """
     Generate the final PDF with the
@@ -320,9 +197,19 @@ def process_final_output(
         customer_data: Dictionary containing customer data.
         image_folder: Folder containing the passport images.
         final_pdf_path: Path to save the final combined PDF.
+        downloads: Download manager for the passport images.
+        uploads: Upload manager delivering the forms to upload_folder_id
+            before the temporary directory is removed.
+        upload_folder_id: Drive folder receiving the forms.
+        existing_uploads: Files of upload_folder_id from
+            UploadManager.list_folder, shared between calls so the folder
+            is listed once per batch instead of once per customer.
 
     Returns:
         Path to the temporary file containgin the final form.
+
+    Raises:
+        RuntimeError: If a form could not be uploaded.
     """
 
     if not passport_selfie_id or not passport_id:
@@ -333,21 +220,27 @@ def process_final_output(
         generated_forms = generate_forms(customer_data, temp_dir)
         termination_form_path = generated_forms['card_termination_form']
 
-        # Downdload images
-        passport_selfie_path, passport_path = download_images(
-            service, passport_selfie_id, passport_id, temp_dir,
+        # Download images into memory
+        passport_selfie, passport = download_images(
+            service, passport_selfie_id, passport_id, downloads,
         )
 
         add_images_to_pdf(
             termination_form_path,
-            passport_selfie_img=passport_selfie_path,
-            passport_img=passport_path,
+            passport_selfie_img=passport_selfie,
+            passport_img=passport,
         )
 
-        # Clean up downloaded images
-        for image_path in [passport_selfie_path, passport_path]:
-            if os.path.exists(image_path):
-                os.remove(image_path)
+        if uploads is not None and upload_folder_id:
+            summary = uploads.upload(
+                upload_folder_id, generated_forms.values(),
+                existing=existing_uploads,
+            )
+            if summary['failures']:
+                failed = ', '.join(
+                    os.path.basename(failure['path'])
+                    for failure in summary['failures'])
+                raise RuntimeError(f'Upload of {failed} failed.')
 
         print(f'\n Final PDFs saved in: {temp_dir}')
         print(f'Contents of final temp directory ({temp_dir}):')
@@ -359,9 +252,16 @@ def process_final_output(
 
 if __name__ == '__main__':
     credentials_path = './automate-cancellation-form/credentials.json'
-    creds = Credentials.from_service_account_file(
-        credentials_path, scopes=['https://www.googleapis.com/auth/drive'])
-    service = build('drive', 'v3', credentials=creds)
+    creds = get_credentials(
+        ['https://www.googleapis.com/auth/drive'], credentials_path)
+    metrics = ApiMetrics.from_env()
+    service = build_service('drive', 'v3', creds, metrics)
+    # Set IMAGE_CACHE_DIR to keep downloaded images between runs
+    image_cache_dir = os.environ.get('IMAGE_CACHE_DIR')
+    downloads = DownloadManager(
+        lambda: build_service('drive', 'v3', creds, metrics),
+        cache=ContentCache(image_cache_dir) if image_cache_dir else None,
+    )
 
     customer_data = {
         'account_name': 'Example Name',
@@ -390,9 +290,17 @@ if __name__ == '__main__':
     passport_selfie_img = drive_file_ids[0]
     passport_img = drive_file_ids[1]
 
+    uploads = UploadManager(lambda: build_service('drive', 'v3', creds, metrics))
     final_pdf_path = process_final_output(
         service,
         customer_data,
         passport_selfie_img,
         passport_img,
+        downloads,
+        uploads,
+        # Set FORMS_FOLDER_ID to upload the forms to that Drive folder
+        os.environ.get('FORMS_FOLDER_ID'),
     )
+    uploads.close()
+    downloads.log_stats()
+    downloads.close()
@@ -1,57 +1,374 @@
-import pandas as pd
-from openpyxl import load_workbook
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.units import inch
-from reportlab.pdfgen import canvas
-from reportlab.platypus import Table, TableStyle
+"""Convert spreadsheets into paginated A4 PDFs.
+
+    python convert_xlsx_to_pdf_pass.py export.xlsx --output export.pdf
+    python convert_xlsx_to_pdf_pass.py jan.xlsx feb.xlsx --all-sheets --output-dir pdfs/
+"""
+import argparse
+import itertools
+import os
+
+# reportlab.lib.units.inch, kept here so importing the module stays cheap
+INCH = 72.0
+# Pages rendered per task by convert_sheets_parallel
+DEFAULT_PAGES_PER_SHARD = 25
+DEFAULT_INPUT = (
+    'conversion_xlsx_to_pdf/test-template/'
+    'account-cancel-withdraw-2.xlsx'
+)
+DEFAULT_OUTPUT = 'conversion_xlsx_to_pdf/account-cancel-withdraw-2.pdf'
+
+
+def iter_excel_rows(path, sheet_name=None):
+    """Yield the rows of a sheet as tuples, header first, without loading the workbook."""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = wb[sheet_name] if sheet_name else wb.active
+        yield from sheet.iter_rows(values_only=True)
+    finally:
+        wb.close()
 
 
 def load_excel_data(path):
     """Load Excel sheet into a pandas DataFrame."""
-    wb = load_workbook(path, data_only=True)
-    sheet = wb.active
-    data = sheet.values
+    import pandas as pd
+
+    data = iter_excel_rows(path)
     columns = next(data)
     return pd.DataFrame(data, columns=columns)
 
 
-def dataframe_to_paginated_pdf(
-        df,
+def _platypus_page_drawer(style, widths, row_height):
+    """Return a function drawing a page of rows as a platypus Table."""
+    from reportlab.lib import colors
+    from reportlab.platypus import Table, TableStyle
+
+    commands = [
+        ('GRID', (0, 0), (-1, -1), style.line_width,
+         colors.Color(*style.line_color)),
+        ('FONT', (0, 0), (-1, -1), style.font, style.font_size, style.leading),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ]
+    if style.header_background is not None:
+        commands.insert(0, ('BACKGROUND', (0, 0), (-1, 0),
+                            colors.Color(*style.header_background)))
+    table_style = TableStyle(commands)
+
+    def draw(c, page_data, x, top):
+        table = Table(page_data, colWidths=widths, rowHeights=row_height)
+        table.setStyle(table_style)
+        _, table_height = table.wrapOn(c, sum(widths), top)
+        table.drawOn(c, x, top - table_height)
+
+    return draw
+
+
+def _grid_page_drawer(style, widths, row_height):
+    """Return a function drawing a page of rows with pdf_grid.GridRenderer."""
+    from pdf_grid import GridRenderer
+
+    renderer = GridRenderer(widths, row_height, style)
+
+    def draw(c, page_data, x, top):
+        renderer.draw(c, page_data, x, top)
+
+    return draw
+
+
+PAGE_DRAWERS = {
+    'grid': _grid_page_drawer,
+    'platypus': _platypus_page_drawer,
+}
+
+
+def page_rows(margin=0.5 * INCH, row_height=12):
+    """Return the number of rows on an A4 page."""
+    from reportlab.lib.pagesizes import A4
+
+    return int((A4[1] - 2 * margin) / row_height)
+
+
+def page_column_widths(page_data, margin=0.5 * INCH):
+    """Return column widths fitting the A4 width, sized after page_data."""
+    from reportlab.lib.pagesizes import A4
+
+    from pdf_grid import GridStyle, column_widths
+
+    return column_widths(page_data, A4[0] - 2 * margin, GridStyle())
+
+
+def rows_to_paginated_pdf(
+        rows,
         output_path,
-        margin=0.5 * inch,
+        margin=0.5 * INCH,
         row_height=12,
+        renderer='grid',
+        widths=None,
 ):
-    """Render a DataFrame into a paginated PDF formatted to A4 width."""
+    """
+    Render rows, header first, into a paginated PDF formatted to A4 width.
+
+    Each page is drawn as soon as its rows have been read, so only one
+    page of rows is held in memory at a time. Unless given, column widths
+    follow the content of the first page and are kept for the whole
+    document.
+
+    Args:
+        rows: Iterable of row sequences, header first.
+        output_path: Path of the PDF.
+        margin: Page margin in points.
+        row_height: Height of each row in points.
+        renderer: 'grid' to draw the cells straight onto the canvas, or
+            'platypus' to lay out a Table per page. Both draw the same grid.
+        widths: Column widths in points, see page_column_widths.
+
+    Returns:
+        Number of pages.
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    from pdf_grid import GridStyle
+
+    if renderer not in PAGE_DRAWERS:
+        raise ValueError(
+            f'Unknown renderer {renderer!r}, expected one of '
+            f'{", ".join(PAGE_DRAWERS)}.')
+
     c = canvas.Canvas(output_path, pagesize=A4)
-    width, height = A4
-    table_width = width - 2 * margin
-    data = [df.columns.tolist()] + df.values.tolist()
-    rows_per_page = int((height - 2 * margin) / row_height)
-
-    for page_start in range(0, len(data), rows_per_page):
-        page_data = data[page_start:page_start + rows_per_page]
-        table = Table(page_data)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-            ('GRID', (0, 0), (-1, -1), 0.25, colors.black),
-            ('FONT', (0, 0), (-1, -1), 'Helvetica', 8),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ]))
-        table._argW = [table_width / len(df.columns)] * len(df.columns)
-        table.wrapOn(c, width, height)
-        table.drawOn(c, margin, height - margin - row_height * len(page_data))
+    height = A4[1]
+    rows_per_page = page_rows(margin, row_height)
+    style = GridStyle()
+
+    rows = iter(rows)
+    draw_page = None
+    pages = 0
+    while page_data := [list(row) for row in itertools.islice(rows, rows_per_page)]:
+        if draw_page is None:
+            if widths is None:
+                widths = page_column_widths(page_data, margin)
+            draw_page = PAGE_DRAWERS[renderer](style, widths, row_height)
+        draw_page(c, page_data, margin, height - margin)
         c.showPage()
+        pages += 1
 
     c.save()
+    return pages
+
+
+def dataframe_to_paginated_pdf(
+        df,
+        output_path,
+        margin=0.5 * INCH,
+        row_height=12,
+        renderer='grid',
+):
+    """Render a DataFrame into a paginated PDF formatted to A4 width."""
+    rows = itertools.chain(
+        [df.columns.tolist()], df.itertuples(index=False, name=None))
+    rows_to_paginated_pdf(rows, output_path, margin, row_height, renderer)
+
+
+def excel_to_paginated_pdf(
+        input_path,
+        output_path,
+        sheet_name=None,
+        margin=0.5 * INCH,
+        row_height=12,
+        renderer='grid',
+):
+    """
+    Stream a sheet into a paginated PDF with memory independent of its size.
+
+    Returns:
+        Number of pages.
+    """
+    return rows_to_paginated_pdf(
+        iter_excel_rows(input_path, sheet_name), output_path, margin, row_height,
+        renderer)
+
+
+def sheet_names(path):
+    """Return the names of the sheets of a workbook."""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True)
+    try:
+        return list(wb.sheetnames)
+    finally:
+        wb.close()
+
+
+def _render_shard(rows, shard_path, widths, margin, row_height, renderer):
+    """Render a page-aligned shard of rows in a worker process."""
+    return rows_to_paginated_pdf(
+        rows, shard_path, margin, row_height, renderer, widths)
+
+
+def _concatenate_pdfs(paths, output_path):
+    """Write the pages of paths, in order, into output_path."""
+    from PyPDF2 import PdfWriter
+
+    writer = PdfWriter()
+    for path in paths:
+        writer.append(path)
+    with open(output_path, 'wb') as output_file:
+        writer.write(output_file)
+    return len(writer.pages)
+
+
+def convert_sheets_parallel(
+        jobs,
+        margin=0.5 * INCH,
+        row_height=12,
+        renderer='grid',
+        max_workers=None,
+        pages_per_shard=DEFAULT_PAGES_PER_SHARD,
+):
+    """
+    Convert sheets to PDF, rendering shards of pages across a process pool.
+
+    The rows of each sheet are read in this process and cut into shards
+    of pages_per_shard whole pages, so each shard paginates exactly as
+    the sheet would. Shards of every sheet share the pool, and column
+    widths are fixed from the first page of their sheet. Once all shards
+    are rendered, they are concatenated in order into one PDF per sheet.
+
+    With at least as many sheets as workers, each worker converts whole
+    sheets instead, so the sheets are also read in parallel.
+
+    Args:
+        jobs: (input path, sheet name or None for the active sheet,
+            output path) of each sheet.
+        margin: Page margin in points.
+        row_height: Height of each row in points.
+        renderer: See rows_to_paginated_pdf.
+        max_workers: Worker processes, defaults to the available cores.
+        pages_per_shard: Pages rendered per task.
+
+    Returns:
+        Number of pages per output path.
+    """
+    import tempfile
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    from parallelism import TASKS_PER_WORKER, available_cores
+
+    jobs = list(jobs)
+    output_paths = [output_path for _, _, output_path in jobs]
+    if len(set(output_paths)) != len(output_paths):
+        raise ValueError('Each sheet needs its own output path.')
+    if renderer not in PAGE_DRAWERS:
+        raise ValueError(
+            f'Unknown renderer {renderer!r}, expected one of '
+            f'{", ".join(PAGE_DRAWERS)}.')
+
+    max_workers = max_workers or available_cores()
+    if len(jobs) >= max_workers:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                output_path: executor.submit(
+                    excel_to_paginated_pdf, input_path, output_path,
+                    sheet_name, margin, row_height, renderer)
+                for input_path, sheet_name, output_path in jobs
+            }
+            return {path: future.result() for path, future in futures.items()}
+
+    rows_per_page = page_rows(margin, row_height)
+    shard_rows = rows_per_page * pages_per_shard
+    pages = {}
+    with tempfile.TemporaryDirectory() as shard_dir, \
+            ProcessPoolExecutor(max_workers=max_workers) as executor:
+        shards = {}
+        pending = set()
+        for job_num, (input_path, sheet_name, output_path) in enumerate(jobs):
+            shard_paths = shards[output_path] = []
+            rows = iter_excel_rows(input_path, sheet_name)
+            widths = None
+            while shard := [list(row) for row in itertools.islice(rows, shard_rows)]:
+                if widths is None:
+                    widths = page_column_widths(shard[:rows_per_page], margin)
+                shard_path = os.path.join(
+                    shard_dir, f'{job_num:04d}-{len(shard_paths):06d}.pdf')
+                shard_paths.append(shard_path)
+                # Rows are only read as fast as the workers render them
+                while len(pending) >= max_workers * TASKS_PER_WORKER:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                pending.add(executor.submit(
+                    _render_shard, shard, shard_path, widths, margin,
+                    row_height, renderer))
+
+        for future in wait(pending).done:
+            future.result()
+        for output_path, shard_paths in shards.items():
+            if shard_paths:
+                pages[output_path] = _concatenate_pdfs(shard_paths, output_path)
+            else:
+                pages[output_path] = rows_to_paginated_pdf(
+                    [], output_path, margin, row_height, renderer)
+    return pages
+
+
+def sheet_jobs(input_paths, output_dir=None, sheets=None, all_sheets=False):
+    """
+    List the (input path, sheet name, output path) of each sheet to convert.
+
+    Output files are named after their workbook, plus the sheet name when
+    several sheets are converted, in output_dir or next to the workbook.
+    """
+    jobs = []
+    for input_path in input_paths:
+        names = sheet_names(input_path) if all_sheets else (sheets or [None])
+        stem = os.path.splitext(os.path.basename(input_path))[0]
+        directory = output_dir or os.path.dirname(input_path)
+        for name in names:
+            file_name = f'{stem}-{name}.pdf' if len(names) > 1 else f'{stem}.pdf'
+            jobs.append((input_path, name, os.path.join(directory, file_name)))
+    return jobs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0])
+    parser.add_argument('inputs', nargs='*', help='Workbooks (.xlsx).')
+    parser.add_argument('--output', help='Output PDF, when converting one sheet.')
+    parser.add_argument('--output-dir',
+                        help='Output directory, defaults to next to each workbook.')
+    parser.add_argument('--sheet', action='append', dest='sheets',
+                        help='Sheet to convert, the active one by default.')
+    parser.add_argument('--all-sheets', action='store_true')
+    parser.add_argument('--renderer', choices=sorted(PAGE_DRAWERS), default='grid')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Worker processes, 1 to render in this process.')
+    args = parser.parse_args(argv)
+
+    if args.inputs:
+        jobs = sheet_jobs(
+            args.inputs, args.output_dir, args.sheets, args.all_sheets)
+    else:
+        jobs = [(DEFAULT_INPUT, None, DEFAULT_OUTPUT)]
+    if args.output:
+        if len(jobs) != 1:
+            parser.error('--output needs a single sheet, use --output-dir.')
+        jobs = [(jobs[0][0], jobs[0][1], args.output)]
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    if args.workers == 1:
+        for input_path, sheet_name, output_path in jobs:
+            pages = excel_to_paginated_pdf(
+                input_path, output_path, sheet_name, renderer=args.renderer)
+            print(f'{output_path}: {pages} pages')
+    else:
+        pages = convert_sheets_parallel(
+            jobs, renderer=args.renderer, max_workers=args.workers)
+        for output_path, count in pages.items():
+            print(f'{output_path}: {count} pages')
+    return 0
 
 
 if __name__ == '__main__':
-    input_excel = (
-        'conversion_xlsx_to_pdf/test-template/'
-        'account-cancel-withdraw-2.xlsx'
-    )
-    output_pdf = 'conversion_xlsx_to_pdf/account-cancel-withdraw-2.pdf'
-
-    df = load_excel_data(input_excel)
-    dataframe_to_paginated_pdf(df, output_pdf)
+    raise SystemExit(main())
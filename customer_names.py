@@ -0,0 +1,35 @@
+import re
+import unicodedata
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_name(name: str) -> str:
+    """
+    Return the key customer names are compared by.
+
+    Unicode compatibility forms are folded (NFKC), case is folded and runs
+    of whitespace become single spaces, so 'John  Doe' from a file name
+    and 'JOHN DOE' from a spreadsheet give the same key.
+    """
+    return _WHITESPACE.sub(' ', unicodedata.normalize('NFKC', name)).strip().casefold()
+
+
+def fuzzy_key(name: str) -> str:
+    """
+    Return normalize_name without accents, punctuation or word order, for
+    matching names that were typed differently.
+    """
+    decomposed = unicodedata.normalize('NFKD', normalize_name(name))
+    letters = ''.join(
+        char if char.isalnum() else ' '
+        for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(sorted(letters.split()))
+
+
+def name_ngrams(key: str, size: int = 3) -> frozenset[str]:
+    """Return the character n-grams of a key, padded so word edges count."""
+    padded = f' {key} '
+    return frozenset(
+        padded[start:start + size]
+        for start in range(max(1, len(padded) - size + 1)))
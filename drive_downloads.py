@@ -0,0 +1,235 @@
+import hashlib
+import io
+import logging
+import os
+import threading
+from collections.abc import Callable, Iterable, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from request_executor import get_executor
+
+DEFAULT_CHUNK_SIZE = 16 * 1024 * 1024
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_CACHE_BYTES = 512 * 1024 * 1024
+
+
+class ContentCache:
+    """
+    Directory of downloaded files named by their md5 checksum.
+
+    Drive reports the md5Checksum of every binary file, so an entry is
+    valid for as long as a file reports the same checksum, whatever its
+    ID or name. The least recently used entries are deleted once the
+    directory grows beyond max_bytes.
+    """
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_CACHE_BYTES) -> None:
+        """
+        Args:
+            path: Cache directory, created if missing.
+            max_bytes: Maximum total size of the cached files.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        os.makedirs(path, exist_ok=True)
+        self._sizes = {
+            entry.name: entry.stat().st_size
+            for entry in os.scandir(path)
+            if entry.is_file() and not entry.name.endswith('.tmp')
+        }
+
+    def _entry_path(self, md5: str) -> str:
+        return os.path.join(self.path, md5)
+
+    def get(self, md5: str) -> bytes | None:
+        """Return the cached content with this checksum, if any."""
+        with self._lock:
+            if md5 not in self._sizes:
+                self._stats['misses'] += 1
+                return None
+            path = self._entry_path(md5)
+            try:
+                with open(path, 'rb') as cached_file:
+                    content = cached_file.read()
+                # The modification time orders entries for eviction
+                os.utime(path)
+            except OSError:
+                self._sizes.pop(md5, None)
+                self._stats['misses'] += 1
+                return None
+            self._stats['hits'] += 1
+            return content
+
+    def put(self, md5: str, content: bytes) -> None:
+        """Store content under its checksum, then evict beyond max_bytes."""
+        if len(content) > self.max_bytes:
+            return
+        path = self._entry_path(md5)
+        temp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as cached_file:
+            cached_file.write(content)
+        os.replace(temp_path, path)
+        with self._lock:
+            self._sizes[md5] = len(content)
+            self._evict()
+
+    def _evict(self) -> None:
+        total = sum(self._sizes.values())
+        if total <= self.max_bytes:
+            return
+        entries = []
+        for md5 in self._sizes:
+            try:
+                entries.append((os.path.getmtime(self._entry_path(md5)), md5))
+            except OSError:
+                entries.append((0.0, md5))
+        for _, md5 in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            total -= self._sizes.pop(md5)
+            self._stats['evictions'] += 1
+            try:
+                os.remove(self._entry_path(md5))
+            except OSError:
+                pass
+
+    def stats(self) -> dict[str, Any]:
+        """Return hit, miss and eviction counts plus the cached bytes."""
+        with self._lock:
+            return dict(
+                self._stats,
+                entries=len(self._sizes),
+                bytes=sum(self._sizes.values()),
+            )
+
+
+class DownloadManager:
+    """
+    Downloads Drive files into memory, several at a time.
+
+    Each worker thread uses its own client from service_factory, since
+    googleapiclient clients are not thread-safe. With a cache, files whose
+    md5Checksum is already cached are not downloaded again.
+    """
+
+    def __init__(
+        self,
+        service_factory: Callable[[], Any],
+        cache: ContentCache | None = None,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> None:
+        """
+        Args:
+            service_factory: Function building a Drive service.
+            cache: Content cache, None to always download.
+            max_workers: Maximum number of downloads in flight.
+            chunk_size: Bytes requested per round-trip.
+        """
+        self.service_factory = service_factory
+        self.cache = cache
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self._local = threading.local()
+        self._executor: ThreadPoolExecutor | None = None
+        self._executor_lock = threading.Lock()
+
+    def _service(self) -> Any:
+        if not hasattr(self._local, 'service'):
+            self._local.service = self.service_factory()
+        return self._local.service
+
+    def download_file(self, file_id: str, md5: str | None = None) -> bytes:
+        """
+        Download one file into memory.
+
+        Args:
+            file_id: ID of the Drive file.
+            md5: Known md5Checksum of the file, fetched when None and the
+                manager has a cache.
+
+        Raises:
+            ValueError: If the downloaded content does not match its md5.
+        """
+        from googleapiclient.http import MediaIoBaseDownload
+
+        service = self._service()
+        executor = get_executor('drive')
+        if self.cache is not None and md5 is None:
+            metadata = executor.execute(
+                service.files().get(fileId=file_id, fields='md5Checksum'))
+            md5 = metadata.get('md5Checksum')
+        if self.cache is not None and md5:
+            content = self.cache.get(md5)
+            if content is not None:
+                return content
+
+        buffer = io.BytesIO()
+        downloader = MediaIoBaseDownload(
+            buffer,
+            service.files().get_media(fileId=file_id),
+            chunksize=self.chunk_size,
+        )
+        done = False
+        while not done:
+            _, done = executor.call(downloader.next_chunk)
+        content = buffer.getvalue()
+
+        if md5:
+            if hashlib.md5(content).hexdigest() != md5:
+                raise ValueError(f'Checksum mismatch downloading {file_id}.')
+            if self.cache is not None:
+                self.cache.put(md5, content)
+        return content
+
+    def download(
+        self,
+        file_ids: Iterable[str],
+        checksums: Mapping[str, str] | None = None,
+    ) -> dict[str, bytes]:
+        """
+        Download several files concurrently.
+
+        Args:
+            file_ids: IDs of the Drive files.
+            checksums: Known md5Checksum per file ID, e.g. from a listing
+                with fields files(id, md5Checksum), to skip the metadata
+                request.
+
+        Returns:
+            Content per file ID.
+        """
+        file_ids = list(dict.fromkeys(file_ids))
+        checksums = checksums or {}
+        if len(file_ids) <= 1 or self.max_workers <= 1:
+            return {
+                file_id: self.download_file(file_id, checksums.get(file_id))
+                for file_id in file_ids
+            }
+
+        # The pool outlives the call so its threads keep their clients
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix='drive-download')
+        contents = self._executor.map(
+            lambda file_id: self.download_file(file_id, checksums.get(file_id)),
+            file_ids,
+        )
+        return dict(zip(file_ids, contents))
+
+    def close(self) -> None:
+        """Stop the download threads."""
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+    def log_stats(self) -> None:
+        """Log the cache statistics."""
+        if self.cache is not None:
+            logging.info(f'Download cache: {self.cache.stats()}')
@@ -0,0 +1,192 @@
+import logging
+import math
+import threading
+from googleapiclient.errors import HttpError
+from request_executor import get_executor
+
+
+def get_files(service, parent_id, fields="nextPageToken, files(id, name)", cache=None, modified_time=None):
+    """Fetch files in batches from parent folder ID, served from cache while modified_time is unchanged"""
+    if cache is not None:
+        cached_files = cache.get(parent_id, modified_time, fields)
+        if cached_files is not None:
+            return cached_files
+
+    files = []
+    try:
+        page_token = None
+        while True:
+            try:
+                response = get_executor("drive").execute(
+                    service.files()
+                    .list(
+                        q=f"'{parent_id}' in parents and trashed=false",
+                        spaces="drive",
+                        fields=fields,
+                        pageToken=page_token,
+                    )
+                )
+                files.extend(response.get("files", []))
+                page_token = response.get("nextPageToken", None)
+                if page_token is None:
+                    break
+            except HttpError as error:
+                # Retries are exhausted, a partial listing would report wrong statuses
+                logging.error(f"Error fetching files from parent ID {parent_id}: {error}")
+                raise
+    except Exception as e:
+        logging.critical(f"Unexpected error is get_files: {e}", exc_info=True)
+        raise e  
+
+    if cache is not None:
+        cache.put(parent_id, modified_time, files, fields)
+    return files
+
+
+# Drive rejects overly long queries, keep OR-ed parent clauses well below the limit
+MAX_QUERY_LENGTH = 2000
+# files.list accepts at most 1000 results per page
+LIST_PAGE_SIZE = 1000
+
+
+def build_parent_queries(parent_ids, max_query_length=MAX_QUERY_LENGTH, max_parents_per_query=None):
+    """Split parent IDs into OR-ed parent queries that stay under max_query_length"""
+    suffix = " and trashed=false"
+    chunks = []
+    chunk, query_length = [], len("()") + len(suffix)
+    for parent_id in dict.fromkeys(parent_ids):
+        clause = f"'{parent_id}' in parents"
+        clause_length = len(clause) + (len(" or ") if chunk else 0)
+        if chunk and (query_length + clause_length > max_query_length
+                      or len(chunk) == max_parents_per_query):
+            chunks.append(chunk)
+            chunk, query_length = [], len("()") + len(suffix)
+            clause_length = len(clause)
+        chunk.append(parent_id)
+        query_length += clause_length
+
+    if chunk:
+        chunks.append(chunk)
+
+    return [
+        (chunk, "(" + " or ".join(f"'{parent_id}' in parents" for parent_id in chunk) + ")" + suffix)
+        for chunk in chunks
+    ]
+
+
+def _list_parent_query(service, chunk, query, fields):
+    """Fetch every page of one OR-ed parent query and group the files by parent ID"""
+    files_by_parent = {parent_id: [] for parent_id in chunk}
+    page_token = None
+    while True:
+        try:
+            response = get_executor("drive").execute(
+                service.files()
+                .list(
+                    q=query,
+                    spaces="drive",
+                    fields=fields,
+                    pageSize=LIST_PAGE_SIZE,
+                    pageToken=page_token,
+                )
+            )
+            for file in response.get("files", []):
+                for parent_id in file.get("parents", []):
+                    if parent_id in files_by_parent:
+                        files_by_parent[parent_id].append(file)
+            page_token = response.get("nextPageToken", None)
+            if page_token is None:
+                break
+        except HttpError as error:
+            # Retries are exhausted, a partial listing would report wrong statuses
+            logging.error(f"Error fetching files from parent IDs {chunk}: {error}")
+            raise
+    return files_by_parent
+
+
+def _read_cached_listings(cache, files_by_parent, modified_times, fields):
+    """Fill files_by_parent from the cache and return the parent IDs that still need listing"""
+    if cache is None:
+        return list(files_by_parent)
+
+    stale_ids = []
+    for parent_id in files_by_parent:
+        cached_files = cache.get(parent_id, (modified_times or {}).get(parent_id), fields)
+        if cached_files is None:
+            stale_ids.append(parent_id)
+        else:
+            files_by_parent[parent_id] = cached_files
+    # One write for the access times of the whole pass
+    cache.flush()
+    return stale_ids
+
+
+def _store_listings(cache, files_by_parent, parent_ids, modified_times, fields):
+    """Store the freshly listed folders in the cache"""
+    if cache is None:
+        return
+    for parent_id in parent_ids:
+        cache.put(parent_id, (modified_times or {}).get(parent_id), files_by_parent[parent_id], fields)
+
+
+def get_files_multi_parent(service, parent_ids, fields="nextPageToken, files(id, name, parents)",
+                           max_query_length=MAX_QUERY_LENGTH, cache=None, modified_times=None):
+    """Fetch files from many parent folder IDs with OR-ed queries and group them by parent ID
+
+    With a cache, folders whose modifiedTime in modified_times is unchanged are not listed again.
+    """
+    if "parents" not in fields:
+        raise ValueError("The field mask must request 'parents' to group files by parent folder.")
+
+    files_by_parent = {parent_id: [] for parent_id in parent_ids}
+    stale_ids = _read_cached_listings(cache, files_by_parent, modified_times, fields)
+    try:
+        for chunk, query in build_parent_queries(stale_ids, max_query_length):
+            files_by_parent.update(_list_parent_query(service, chunk, query, fields))
+    except Exception as e:
+        logging.critical(f"Unexpected error in get_files_multi_parent: {e}", exc_info=True)
+        raise e
+
+    _store_listings(cache, files_by_parent, stale_ids, modified_times, fields)
+    return files_by_parent
+
+
+# Listing is dominated by network latency, keep this many requests in flight
+DEFAULT_MAX_WORKERS = 16
+
+_thread_state = threading.local()
+
+
+def thread_service(service_factory):
+    """Return this thread's service instance, the client objects are not thread-safe"""
+    services = getattr(_thread_state, "services", None)
+    if services is None:
+        services = _thread_state.services = {}
+    if service_factory not in services:
+        services[service_factory] = service_factory()
+    return services[service_factory]
+
+
+def get_files_multi_parent_concurrent(executor, service_factory, parent_ids, max_workers=DEFAULT_MAX_WORKERS,
+                                      fields="nextPageToken, files(id, name, parents)",
+                                      max_query_length=MAX_QUERY_LENGTH, cache=None, modified_times=None):
+    """Fetch files from many parent folder IDs with OR-ed queries running in parallel on executor"""
+    if "parents" not in fields:
+        raise ValueError("The field mask must request 'parents' to group files by parent folder.")
+
+    files_by_parent = {parent_id: [] for parent_id in parent_ids}
+    stale_ids = _read_cached_listings(cache, files_by_parent, modified_times, fields)
+    # Spread the parents so every worker gets a query, within the query length limit
+    max_parents_per_query = max(1, math.ceil(len(stale_ids) / max_workers))
+    queries = build_parent_queries(stale_ids, max_query_length, max_parents_per_query)
+
+    def list_chunk(chunk_query):
+        chunk, query = chunk_query
+        return _list_parent_query(thread_service(service_factory), chunk, query, fields)
+
+    # map yields in submission order, so the merge does not depend on completion order
+    for chunk_files in executor.map(list_chunk, queries):
+        files_by_parent.update(chunk_files)
+
+    _store_listings(cache, files_by_parent, stale_ids, modified_times, fields)
+    return files_by_parent
@@ -0,0 +1,229 @@
+import hashlib
+import logging
+import os
+import threading
+from collections.abc import Callable, Iterable, MutableMapping
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any
+
+from drive_listing import get_files
+from request_executor import get_executor
+
+# Resumable uploads require chunks in multiples of 256 KiB
+DEFAULT_CHUNK_SIZE = 20 * 256 * 1024
+DEFAULT_MAX_WORKERS = 8
+FOLDER_FIELDS = 'nextPageToken, files(id, name, md5Checksum)'
+
+
+def file_md5(path: str) -> str:
+    """Return the md5 hex digest Drive reports as md5Checksum."""
+    digest = hashlib.md5()
+    with open(path, 'rb') as content_file:
+        for block in iter(lambda: content_file.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _log_progress(progress: dict[str, Any]) -> None:
+    # Every 5% of the files, so thousands of uploads stay readable
+    step = max(1, progress['total'] // 20)
+    if progress['done'] % step and progress['done'] != progress['total']:
+        return
+    logging.info(
+        f"Uploads: {progress['done']}/{progress['total']} done, "
+        f"{progress['uploaded']} uploaded, {progress['skipped']} skipped, "
+        f"{progress['failed']} failed, {progress['bytes']} bytes sent.")
+
+
+class UploadManager:
+    """
+    Uploads local files into a Drive folder, several at a time.
+
+    Files are sent as resumable uploads in chunk_size pieces, so a failed
+    chunk is retried on its own instead of restarting the file. A file
+    whose name already exists in the folder with the same md5Checksum is
+    skipped, and one whose content changed is uploaded as a new version.
+
+    The worker threads, and the Drive client each of them builds, are kept
+    between calls to upload until close.
+    """
+
+    def __init__(
+        self,
+        service_factory: Callable[[], Any],
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> None:
+        """
+        Args:
+            service_factory: Function building a Drive service, called
+                once per worker thread.
+            max_workers: Maximum number of uploads in flight.
+            chunk_size: Bytes sent per request, a multiple of 256 KiB.
+        """
+        if chunk_size % (256 * 1024):
+            raise ValueError('chunk_size must be a multiple of 256 KiB.')
+        self.service_factory = service_factory
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self._local = threading.local()
+        self._pool: ThreadPoolExecutor | None = None
+        self._pool_lock = threading.Lock()
+
+    def _service(self) -> Any:
+        if not hasattr(self._local, 'service'):
+            self._local.service = self.service_factory()
+        return self._local.service
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix='drive-upload',
+                )
+            return self._pool
+
+    def close(self) -> None:
+        """Stop the worker threads."""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
+
+    def __enter__(self) -> 'UploadManager':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def list_folder(self, folder_id: str) -> dict[str, dict[str, Any]]:
+        """Return the files of a folder by name, as upload expects them in existing."""
+        return {
+            file['name']: file
+            for file in get_files(self._service(), folder_id, FOLDER_FIELDS)
+        }
+
+    def upload_file(
+        self,
+        path: str,
+        folder_id: str,
+        existing_id: str | None = None,
+        mime_type: str = 'application/pdf',
+    ) -> dict[str, Any]:
+        """
+        Upload one file.
+
+        Args:
+            path: Local file.
+            folder_id: Target Drive folder.
+            existing_id: Drive file replaced with a new version, None to
+                create a file.
+            mime_type: MIME type of the file.
+
+        Returns:
+            The id, name and md5Checksum of the Drive file.
+        """
+        from googleapiclient.http import MediaFileUpload
+
+        service = self._service()
+        media = MediaFileUpload(
+            path, mimetype=mime_type, chunksize=self.chunk_size, resumable=True)
+        if existing_id is None:
+            request = service.files().create(
+                body={'name': os.path.basename(path), 'parents': [folder_id]},
+                media_body=media,
+                fields='id, name, md5Checksum',
+            )
+        else:
+            request = service.files().update(
+                fileId=existing_id,
+                media_body=media,
+                fields='id, name, md5Checksum',
+            )
+
+        executor = get_executor('drive')
+        response = None
+        while response is None:
+            _, response = executor.call(request.next_chunk)
+        uploaded: dict[str, Any] = response
+        return uploaded
+
+    def upload(
+        self,
+        folder_id: str,
+        paths: Iterable[str],
+        progress: Callable[[dict[str, Any]], None] | None = _log_progress,
+        existing: MutableMapping[str, dict[str, Any]] | None = None,
+    ) -> dict[str, Any]:
+        """
+        Upload files into a folder, skipping the ones already there.
+
+        Args:
+            folder_id: Target Drive folder.
+            paths: Local files, uploaded under their base name.
+            progress: Called with the running counts after every file.
+            existing: Files of the folder from list_folder, updated with
+                the uploaded ones, so that a caller uploading many small
+                sets lists the folder once. By default the folder is
+                listed on every call.
+
+        Returns:
+            The final counts, plus the failures with their path and error.
+
+        Raises:
+            ValueError: If two different paths share a base name, both
+                would miss existing and create two Drive files.
+        """
+        paths = list(dict.fromkeys(paths))
+        names: dict[str, list[str]] = {}
+        for path in paths:
+            names.setdefault(os.path.basename(path), []).append(path)
+        clashes = [same for same in names.values() if len(same) > 1]
+        if clashes:
+            raise ValueError(f'Paths uploaded under the same name: {clashes}')
+        if existing is None:
+            existing = self.list_folder(folder_id)
+        summary: dict[str, Any] = {
+            'total': len(paths),
+            'done': 0,
+            'uploaded': 0,
+            'skipped': 0,
+            'failed': 0,
+            'bytes': 0,
+            'failures': [],
+        }
+        lock = threading.Lock()
+
+        def upload_one(path: str) -> None:
+            current = existing.get(os.path.basename(path))
+            status = 'skipped'
+            if current is None or current.get('md5Checksum') != file_md5(path):
+                uploaded = self.upload_file(
+                    path, folder_id, current['id'] if current else None)
+                status = 'uploaded'
+            with lock:
+                if status == 'uploaded':
+                    existing[uploaded['name']] = uploaded
+                summary[status] += 1
+                if status == 'uploaded':
+                    summary['bytes'] += os.path.getsize(path)
+
+        executor = self._executor()
+        futures = {executor.submit(upload_one, path): path for path in paths}
+        for future in as_completed(futures):
+            error = future.exception()
+            with lock:
+                summary['done'] += 1
+                if error is not None:
+                    logging.error(f'Upload of {futures[future]} failed: {error}')
+                    summary['failed'] += 1
+                    summary['failures'].append(
+                        {'path': futures[future], 'error': str(error)})
+                counts = {
+                    key: value for key, value in summary.items()
+                    if key != 'failures'
+                }
+            if progress is not None:
+                progress(counts)
+        return summary
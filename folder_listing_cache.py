@@ -0,0 +1,211 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+DEFAULT_MAX_ENTRIES = 50_000
+DEFAULT_MAX_AGE_SECONDS = 90 * 24 * 60 * 60
+DEFAULT_EVICT_INTERVAL_SECONDS = 60 * 60
+
+
+class FolderListingCache:
+    """
+    SQLite-backed cache of folder listings validated by modifiedTime.
+
+    A cached listing is served only while the folder still reports the
+    modifiedTime it had when the listing was stored, so old batch folders,
+    which never change, are listed once and then read from disk. Entries
+    older than max_age_seconds are dropped, and the least recently used
+    entries are evicted beyond max_entries, by the first put every
+    evict_interval_seconds and on close.
+
+    Hits only note their access time in memory; flush writes them in one
+    transaction, so callers flush once per listing pass rather than
+    committing once per folder.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_age_seconds: float = DEFAULT_MAX_AGE_SECONDS,
+        evict_interval_seconds: float = DEFAULT_EVICT_INTERVAL_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        """
+        Args:
+            path: Path of the SQLite database, ':memory:' for tests.
+            max_entries: Maximum number of cached listings.
+            max_age_seconds: Maximum age of a cached listing.
+            evict_interval_seconds: Minimum time between two evictions
+                triggered by put.
+            clock: Function returning the current epoch time.
+        """
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.evict_interval_seconds = evict_interval_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stale': 0, 'evictions': 0}
+        # Access times of the hits not written yet, by (folder_id, fields)
+        self._accessed: dict[tuple[str, str], float] = {}
+        self._last_eviction = clock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS listings ('
+            ' folder_id TEXT NOT NULL,'
+            ' fields TEXT NOT NULL,'
+            ' modified_time TEXT NOT NULL,'
+            ' children TEXT NOT NULL,'
+            ' stored_at REAL NOT NULL,'
+            ' accessed_at REAL NOT NULL,'
+            ' PRIMARY KEY (folder_id, fields))',
+        )
+        self._connection.execute(
+            'CREATE INDEX IF NOT EXISTS listings_accessed_at'
+            ' ON listings (accessed_at)',
+        )
+        self._connection.commit()
+
+    def get(
+        self,
+        folder_id: str,
+        modified_time: str | None,
+        fields: str = '',
+    ) -> list[dict[str, Any]] | None:
+        """
+        Return the cached children of a folder if they are still valid.
+
+        Args:
+            folder_id: ID of the listed folder.
+            modified_time: Current modifiedTime of the folder.
+            fields: Field mask the listing was fetched with.
+
+        Returns:
+            The cached children, or None on a miss.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT modified_time, children, stored_at FROM listings'
+                ' WHERE folder_id = ? AND fields = ?',
+                (folder_id, fields),
+            ).fetchone()
+            now = self._clock()
+            if row is None or modified_time is None:
+                self._stats['misses'] += 1
+                return None
+            cached_modified_time, children, stored_at = row
+            if (cached_modified_time != modified_time
+                    or now - stored_at > self.max_age_seconds):
+                self._stats['stale'] += 1
+                self._stats['misses'] += 1
+                return None
+
+            self._accessed[(folder_id, fields)] = now
+            self._stats['hits'] += 1
+            cached_children: list[dict[str, Any]] = json.loads(children)
+            return cached_children
+
+    def put(
+        self,
+        folder_id: str,
+        modified_time: str | None,
+        children: list[dict[str, Any]],
+        fields: str = '',
+    ) -> None:
+        """
+        Store the children of a folder.
+
+        Args:
+            folder_id: ID of the listed folder.
+            modified_time: modifiedTime of the folder when it was listed.
+            children: Children returned by the listing.
+            fields: Field mask the listing was fetched with.
+        """
+        if modified_time is None:
+            return
+        with self._lock:
+            now = self._clock()
+            self._connection.execute(
+                'INSERT OR REPLACE INTO listings'
+                ' (folder_id, fields, modified_time, children,'
+                ' stored_at, accessed_at)'
+                ' VALUES (?, ?, ?, ?, ?, ?)',
+                (folder_id, fields, modified_time,
+                 json.dumps(children), now, now),
+            )
+            self._accessed.pop((folder_id, fields), None)
+            if now - self._last_eviction >= self.evict_interval_seconds:
+                self._evict()
+            self._connection.commit()
+
+    def flush(self) -> None:
+        """Write the access times of the hits since the last flush."""
+        with self._lock:
+            self._write_accessed()
+            self._connection.commit()
+
+    def evict(self) -> int:
+        """
+        Drop expired entries, then the least recently used ones beyond
+        max_entries.
+
+        Returns:
+            Number of evicted entries.
+        """
+        with self._lock:
+            evicted = self._evict()
+            self._connection.commit()
+            return evicted
+
+    def _write_accessed(self) -> None:
+        self._connection.executemany(
+            'UPDATE listings SET accessed_at = ?'
+            ' WHERE folder_id = ? AND fields = ?',
+            [(accessed_at, folder_id, fields)
+             for (folder_id, fields), accessed_at in self._accessed.items()],
+        )
+        self._accessed.clear()
+
+    def _evict(self) -> int:
+        # Least recently used is only accurate with every hit written
+        self._write_accessed()
+        now = self._clock()
+        cursor = self._connection.execute(
+            'DELETE FROM listings WHERE stored_at < ?',
+            (now - self.max_age_seconds,),
+        )
+        evicted = cursor.rowcount
+        cursor = self._connection.execute(
+            'DELETE FROM listings WHERE rowid IN ('
+            ' SELECT rowid FROM listings'
+            ' ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,),
+        )
+        evicted += cursor.rowcount
+        self._last_eviction = now
+        self._stats['evictions'] += evicted
+        return evicted
+
+    def stats(self) -> dict[str, Any]:
+        """Return hit, miss, stale and eviction counts plus the hit rate."""
+        with self._lock:
+            entries = self._connection.execute(
+                'SELECT COUNT(*) FROM listings').fetchone()[0]
+            stats: dict[str, Any] = dict(self._stats, entries=entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+    def log_stats(self) -> None:
+        """Log the cache statistics."""
+        logging.info(f'Folder listing cache: {self.stats()}')
+
+    def close(self) -> None:
+        """Write pending access times, evict old entries and close the database."""
+        self.evict()
+        with self._lock:
+            self._connection.close()
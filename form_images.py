@@ -0,0 +1,49 @@
+import io
+from typing import BinaryIO
+
+# Resolution of images embedded in forms, enough for printing ID documents
+DEFAULT_IMAGE_DPI = 150
+DEFAULT_JPEG_QUALITY = 85
+POINTS_PER_INCH = 72
+
+
+def downsample_image(
+    source: str | bytes | BinaryIO,
+    width_points: float,
+    dpi: int = DEFAULT_IMAGE_DPI,
+    quality: int = DEFAULT_JPEG_QUALITY,
+) -> tuple[bytes, int, int]:
+    """
+    Decode an image at the size it is printed at and re-encode it as JPEG.
+
+    Args:
+        source: Image path, content or binary file.
+        width_points: Width the image is drawn at, in PDF points.
+        dpi: Resolution of the embedded image.
+        quality: JPEG quality, 1 to 95.
+
+    Returns:
+        The JPEG content and its width and height in pixels.
+    """
+    from PIL import Image
+
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    target_width = max(1, round(width_points / POINTS_PER_INCH * dpi))
+
+    with Image.open(source) as img:
+        # JPEG decoders can scale by up to 1/8 while decoding, which is far
+        # cheaper than decoding every pixel of a camera picture
+        img.draft(
+            'RGB', (target_width, target_width * img.height // img.width))
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        if img.width > target_width:
+            img = img.resize(
+                (target_width, max(1, round(img.height * target_width / img.width))),
+                Image.Resampling.LANCZOS,
+            )
+
+        buffer = io.BytesIO()
+        img.save(buffer, format='JPEG', quality=quality, optimize=True)
+        return buffer.getvalue(), img.width, img.height
@@ -0,0 +1,269 @@
+import functools
+import io
+import os
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass
+from typing import Any, BinaryIO
+
+
+@dataclass(frozen=True)
+class FieldSpec:
+    """
+    One value drawn on a form.
+
+    Coordinates are measured from the top-left corner of the page, as
+    they are read off the template.
+    """
+
+    name: str
+    x: float
+    y: float
+    transform: Callable[[str], str] = str.upper
+    font: str = 'Helvetica'
+    font_size: float = 9
+    page: int = 0
+
+
+TEMPLATE_DIR = './automate-cancellation-form/templates'
+# Form type -> template name, which is also the suffix of the filled form
+TEMPLATE_NAMES = {
+    'closing_account': 'Closing-Bank-Account',
+    'card_termination': 'Card-Termination-Form',
+}
+
+FORM_LAYOUTS: dict[str, tuple[FieldSpec, ...]] = {
+    'closing_account': (
+        FieldSpec('account_name', 149, 210),
+        FieldSpec('account_number', 192, 295),
+        FieldSpec('account_name', 192, 318),
+        FieldSpec('balance', 273, 346),
+        FieldSpec('check_number', 164, 386),
+        FieldSpec('unused_check_from', 409, 404),
+        FieldSpec('unused_check_to', 486, 404),
+        FieldSpec('balance', 116, 424),
+        FieldSpec('account_name', 392, 538),
+    ),
+    'card_termination': (
+        FieldSpec('cardholder_name', 267, 260),
+        FieldSpec('current_address', 211, 274),
+        FieldSpec('passport_number', 307, 290),
+        FieldSpec('date_of_issuance', 479, 290),
+        FieldSpec('contact_number', 206, 306),
+        FieldSpec('card_number', 172, 324),
+        FieldSpec('account_number', 188, 418),
+        FieldSpec('email_address', 404, 492, transform=str),
+    ),
+}
+
+
+def adjust_coordinates(
+        x: float,
+        y: float,
+        page_height: float) -> tuple[float, float]:
+    """
+    Adjust Y-coordinate for ReportLab.
+
+    Args:
+        x: X-coordinate.
+        y: Y-coordinate.
+        page_height: Height of the PDF page.
+
+    Returns:
+        Adjusted coordinates as a tuple (x, y).
+    """
+    adjusted_y = page_height - y
+    return x, adjusted_y
+
+
+class CompiledTemplate:
+    """
+    A template PDF parsed once, with its field positions resolved.
+
+    Filling renders the overlay into memory and stamps it onto copies of
+    the template pages, so the parsed template is never modified and can
+    fill any number of forms.
+    """
+
+    def __init__(self, path: str, fields: tuple[FieldSpec, ...]) -> None:
+        """
+        Args:
+            path: Path to the template PDF.
+            fields: Fields drawn on the template.
+        """
+        from PyPDF2 import PdfReader
+
+        with open(path, 'rb') as template_file:
+            self._reader = PdfReader(io.BytesIO(template_file.read()))
+        self.page_sizes = [
+            (float(page.mediabox.width), float(page.mediabox.height))
+            for page in self._reader.pages
+        ]
+        for spec in fields:
+            if spec.page >= len(self.page_sizes):
+                raise ValueError(
+                    f'Field {spec.name} is on page {spec.page + 1} but '
+                    f'{path} has {len(self.page_sizes)} pages.')
+
+        # Page index -> (spec, x, y in PDF space) of the fields drawn on it
+        self._placements: dict[int, list[tuple[FieldSpec, float, float]]] = {}
+        for spec in fields:
+            x, y = adjust_coordinates(
+                spec.x, spec.y, self.page_sizes[spec.page][1])
+            self._placements.setdefault(spec.page, []).append((spec, x, y))
+
+    def render_overlay(self, data: Mapping[str, Any]) -> bytes:
+        """Render the field values as a PDF with one page per template page."""
+        from reportlab.pdfgen import canvas  # type: ignore
+
+        buffer = io.BytesIO()
+        c = canvas.Canvas(buffer, pagesize=self.page_sizes[0])
+        for page_num, page_size in enumerate(self.page_sizes):
+            c.setPageSize(page_size)
+            current_font = None
+            for spec, x, y in self._placements.get(page_num, []):
+                if current_font != (spec.font, spec.font_size):
+                    current_font = (spec.font, spec.font_size)
+                    c.setFont(*current_font)
+                c.drawString(x, y, spec.transform(str(data.get(spec.name) or '')))
+            c.showPage()
+        c.save()
+        return buffer.getvalue()
+
+    def fill(self, data: Mapping[str, Any], output: str | BinaryIO) -> None:
+        """
+        Fill the template with data.
+
+        Args:
+            data: Field values keyed by FieldSpec.name.
+            output: Path or binary file the filled PDF is written to.
+        """
+        from PyPDF2 import PdfReader, PdfWriter
+
+        overlay_reader = PdfReader(io.BytesIO(self.render_overlay(data)))
+        writer = PdfWriter()
+        for page_num, template_page in enumerate(self._reader.pages):
+            # add_page copies the page into the writer, the template is untouched
+            page = writer.add_page(template_page)
+            if page_num in self._placements:
+                stamp_page(writer, page, overlay_reader.pages[page_num],
+                           self.page_sizes[page_num])
+
+        if isinstance(output, str):
+            with open(output, 'wb') as output_file:
+                writer.write(output_file)
+        else:
+            writer.write(output)
+
+
+def _content_bytes(page: Any) -> bytes:
+    contents = page['/Contents'].get_object()
+    if isinstance(contents, list):
+        return b'\n'.join(stream.get_object().get_data() for stream in contents)
+    data: bytes = contents.get_data()
+    return data
+
+
+def stamp_page(
+    writer: Any,
+    page: Any,
+    overlay_page: Any,
+    page_size: tuple[float, float],
+) -> None:
+    """
+    Draw overlay_page over page as a form XObject.
+
+    Unlike PageObject.merge_page, this never parses the content streams,
+    which is most of the cost of filling a form.
+    """
+    from PyPDF2.generic import (
+        ArrayObject,
+        DecodedStreamObject,
+        DictionaryObject,
+        FloatObject,
+        NameObject,
+    )
+
+    # pypdf names it add_object, PyPDF2 3.0 (pinned in requirements.txt)
+    # only has the private _add_object
+    add_object = getattr(writer, 'add_object', None) or writer._add_object
+
+    def add_stream(data: bytes, **entries: Any) -> Any:
+        stream = DecodedStreamObject()
+        stream.set_data(data)
+        stream.update({NameObject(key): value for key, value in entries.items()})
+        return add_object(stream)
+
+    overlay = add_stream(
+        _content_bytes(overlay_page),
+        **{
+            '/Type': NameObject('/XObject'),
+            '/Subtype': NameObject('/Form'),
+            '/BBox': ArrayObject(
+                [FloatObject(0), FloatObject(0),
+                 FloatObject(page_size[0]), FloatObject(page_size[1])]),
+            '/Resources': overlay_page['/Resources'].get_object().clone(writer),
+        },
+    )
+
+    if '/Resources' not in page:
+        page[NameObject('/Resources')] = DictionaryObject()
+    resources = page['/Resources'].get_object()
+    if '/XObject' not in resources:
+        resources[NameObject('/XObject')] = DictionaryObject()
+    xobjects = resources['/XObject'].get_object()
+    name = '/FormFill'
+    while name in xobjects:
+        name += 'X'
+    xobjects[NameObject(name)] = overlay
+
+    # Isolate the template's graphics state so the overlay lands where
+    # it was drawn, whatever the template leaves on the stack
+    original = page.get('/Contents')
+    contents = ArrayObject([add_stream(b'q\n')])
+    if original is not None:
+        # /Contents is a stream or an array of streams, possibly indirect
+        resolved = original.get_object()
+        if isinstance(resolved, list):
+            contents.extend(resolved)
+        else:
+            contents.append(original)
+    contents.append(add_stream(f'\nQ q {name} Do Q\n'.encode()))
+    page[NameObject('/Contents')] = contents
+
+
+@functools.lru_cache(maxsize=32)
+def _compile_template(
+    path: str,
+    form_type: str,
+    modified_time: float,
+) -> CompiledTemplate:
+    return CompiledTemplate(path, FORM_LAYOUTS[form_type])
+
+
+def load_template(path: str, form_type: str) -> CompiledTemplate:
+    """
+    Return the compiled template, parsing the PDF only on first use or
+    after the file changed.
+
+    Args:
+        path: Path to the template PDF.
+        form_type: Key of the layout in FORM_LAYOUTS.
+
+    Raises:
+        KeyError: If form_type has no layout.
+    """
+    if form_type not in FORM_LAYOUTS:
+        raise KeyError(f'Unknown form type {form_type}.')
+    path = os.path.abspath(path)
+    return _compile_template(path, form_type, os.path.getmtime(path))
+
+
+def template_path(form_type: str, template_dir: str = TEMPLATE_DIR) -> str:
+    """Return the path of the template PDF of a form type."""
+    return os.path.join(template_dir, f'{TEMPLATE_NAMES[form_type]}.pdf')
+
+
+def form_file_name(data: Mapping[str, Any], form_type: str) -> str:
+    """Return the file name of a filled form, e.g. JOHN_DOE-Closing-Bank-Account.pdf."""
+    account_owner = str(data.get('account_name') or '').upper().replace(' ', '_')
+    return f'{account_owner}-{TEMPLATE_NAMES[form_type]}.pdf'
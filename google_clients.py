@@ -0,0 +1,170 @@
+import functools
+import json
+import logging
+import os
+import threading
+from collections.abc import Sequence
+from datetime import datetime, timezone
+from typing import Any
+
+from api_metrics import ApiMetrics, instrument
+
+# Optional JSON file where access tokens are kept between runs
+TOKEN_CACHE_ENV = 'GOOGLE_TOKEN_CACHE_PATH'
+# Optional directory of <api>.<version>.json discovery documents
+DISCOVERY_CACHE_ENV = 'GOOGLE_DISCOVERY_CACHE_DIR'
+# Cached tokens this close to expiry are refreshed instead of reused
+TOKEN_EXPIRY_MARGIN_SECONDS = 5 * 60
+
+_credentials_lock = threading.Lock()
+_credentials: dict[str, Any] = {}
+
+
+def _credentials_key(
+    scopes: Sequence[str] | None,
+    service_account_file: str | None,
+) -> str:
+    source = service_account_file or os.environ.get(
+        'GOOGLE_APPLICATION_CREDENTIALS', 'default')
+    return f"{source}|{' '.join(sorted(scopes or []))}"
+
+
+def _read_token_cache(path: str) -> dict[str, Any]:
+    try:
+        with open(path, encoding='utf-8') as token_file:
+            tokens: dict[str, Any] = json.load(token_file)
+            return tokens
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_token_cache(path: str, key: str, credentials: Any) -> None:
+    tokens = _read_token_cache(path)
+    tokens[key] = {
+        'token': credentials.token,
+        'expiry': credentials.expiry.isoformat(),
+    }
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    # Access tokens are secrets, keep them readable by the owner only
+    descriptor = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(descriptor, 'w', encoding='utf-8') as token_file:
+        json.dump(tokens, token_file)
+    os.replace(temp_path, path)
+
+
+def _reuse_or_refresh_token(credentials: Any, key: str, path: str) -> None:
+    """
+    Load a still valid access token from the cache file, or refresh the
+    credentials once and store the new token for the next run.
+    """
+    cached = _read_token_cache(path).get(key)
+    if cached:
+        # google-auth keeps expiry as a naive UTC datetime
+        expiry = datetime.fromisoformat(cached['expiry'])
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        if (expiry - now).total_seconds() > TOKEN_EXPIRY_MARGIN_SECONDS:
+            credentials.token = cached['token']
+            credentials.expiry = expiry
+            return
+
+    from google.auth.transport.requests import Request
+
+    credentials.refresh(Request())
+    if credentials.token and credentials.expiry:
+        try:
+            _write_token_cache(path, key, credentials)
+        except OSError as error:
+            logging.warning(f'Could not write token cache {path}: {error}')
+
+
+def get_credentials(
+    scopes: Sequence[str] | None = None,
+    service_account_file: str | None = None,
+) -> Any:
+    """
+    Return credentials shared by every client of the process.
+
+    Credentials are resolved once per scopes and source. When
+    GOOGLE_TOKEN_CACHE_PATH is set, the access token is also shared
+    between runs until it is about to expire, so cron runs skip the token
+    exchange.
+
+    Args:
+        scopes: OAuth scopes, None for the default ones.
+        service_account_file: Service account key file, None for
+            Application Default Credentials.
+    """
+    key = _credentials_key(scopes, service_account_file)
+    with _credentials_lock:
+        credentials = _credentials.get(key)
+        if credentials is not None:
+            return credentials
+
+        if service_account_file:
+            from google.oauth2.service_account import Credentials
+
+            credentials = Credentials.from_service_account_file(
+                service_account_file, scopes=scopes)
+        else:
+            import google.auth
+
+            credentials, _ = google.auth.default(scopes=scopes)
+
+        token_cache_path = os.environ.get(TOKEN_CACHE_ENV)
+        if token_cache_path:
+            _reuse_or_refresh_token(credentials, key, token_cache_path)
+        _credentials[key] = credentials
+        return credentials
+
+
+@functools.lru_cache(maxsize=None)
+def _discovery_document(api: str, version: str) -> str | None:
+    """
+    Read the discovery document once per process. It is kept as text
+    because build_from_document fills in the parsed document it is given,
+    which is unsafe to share between threads.
+    """
+    cache_dir = os.environ.get(DISCOVERY_CACHE_ENV)
+    if cache_dir:
+        path = os.path.join(cache_dir, f'{api}.{version}.json')
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as document_file:
+                return document_file.read()
+
+    from googleapiclient.discovery_cache import get_static_doc
+
+    document: str | None = get_static_doc(api, version)
+    return document
+
+
+def build_service(
+    api: str,
+    version: str,
+    credentials: Any = None,
+    metrics: ApiMetrics | None = None,
+) -> Any:
+    """
+    Build a Google API client without fetching its discovery document.
+
+    The document comes from GOOGLE_DISCOVERY_CACHE_DIR or the copy bundled
+    with googleapiclient and is read once, so the per-thread clients of
+    the concurrent trackers skip the file lookup. googleapiclient clients
+    are not thread-safe: build one per thread.
+
+    Args:
+        api: API name, e.g. 'drive'.
+        version: API version, e.g. 'v3'.
+        credentials: Credentials, None for get_credentials().
+        metrics: Metrics the client records into, see api_metrics.
+    """
+    from googleapiclient.discovery import build, build_from_document
+
+    if credentials is None:
+        credentials = get_credentials()
+    document = _discovery_document(api, version)
+    if document is None:
+        service = build(
+            api, version, credentials=credentials, cache_discovery=False)
+    else:
+        service = build_from_document(document, credentials=credentials)
+    return instrument(service, metrics)
@@ -0,0 +1,242 @@
+import json
+import logging
+import os
+import time
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+from list_gmail_messages import (
+    get_messages_metadata,
+    iter_message_ids,
+    iter_messages,
+    message_record,
+)
+from request_executor import error_status, get_executor
+
+HISTORY_PAGE_SIZE = 500
+HISTORY_TYPES = ['messageAdded', 'messageDeleted', 'labelAdded', 'labelRemoved']
+# Labels whose messages messages.list leaves out unless asked for
+HIDDEN_LABELS = {'TRASH', 'SPAM'}
+# Seconds before the previous sync from which new messages are checked with
+# a single listing, to allow for internalDate lagging behind delivery
+SYNC_TIME_MARGIN = 24 * 60 * 60
+
+
+class IncrementalMessageSync:
+    """
+    Keep a local store of the metadata of the messages matching a Gmail
+    query up to date with the History API.
+
+    The first sync lists every matching message and stores its record and
+    internalDate together with the mailbox historyId. Later syncs only read the
+    users.history.list records since that ID: deleted, trashed and spammed
+    messages are dropped, and added or restored ones are fetched and kept
+    when they match the query, so their cost scales with new mail rather
+    than with the size of the mailbox: messages received since the
+    previous sync are checked against the query with one listing, and
+    older ones, such as messages restored from the trash, one by one over
+    the second they were received. Gmail keeps a limited history, and
+    a sync whose historyId is no longer available falls back to a full
+    listing. Records are kept sorted by internalDate, newest first, like
+    messages.list returns them, wherever the sync found them.
+
+    The service only needs users().getProfile, users().history().list and
+    the messages() calls of list_gmail_messages, so a fake Gmail service
+    replaying its history can stand in for the real one.
+    """
+
+    def __init__(self, service: Any, query: str, store_path: str) -> None:
+        """
+        Args:
+            service: Gmail API service instance.
+            query: Gmail search query, e.g. "from:idealista".
+            store_path: Path of the JSON file holding the store.
+        """
+        self.service = service
+        self.query = query
+        self.store_path = store_path
+        self.store: dict[str, Any] = {}
+
+    def sync(self) -> dict[str, Any]:
+        """
+        Bring the store up to date and persist it.
+
+        Returns:
+            The synced store.
+        """
+        store = self._load()
+        if store is None or store.get('query') != self.query or 'received' not in store:
+            logging.info('No usable message store found, running a full sync.')
+            store = self._full_sync()
+        elif not self._apply_history(store):
+            logging.info('The stored historyId has expired, running a full sync.')
+            store = self._full_sync()
+
+        self.store = store
+        self._save(store)
+        return store
+
+    def iter_records(self) -> Iterator[dict[str, Any]]:
+        """Yield the stored message records, newest first."""
+        yield from self.store.get('messages', {}).values()
+
+    def _full_sync(self) -> dict[str, Any]:
+        # Take the history ID before listing so no message slips between the two
+        synced_at = int(time.time())
+        history_id = get_executor('gmail').execute(
+            self.service.users().getProfile(userId='me'),
+        )['historyId']
+        fetched = iter_messages(self.service, self.query, record=_dated_record)
+        messages, received = _sorted_messages(fetched)
+        return {
+            'history_id': history_id,
+            'synced_at': synced_at,
+            'query': self.query,
+            'messages': messages,
+            'received': received,
+        }
+
+    def _apply_history(self, store: dict[str, Any]) -> bool:
+        """Apply the history since the stored ID, False if it has expired."""
+        # Messages to fetch, in history order, and messages to drop
+        added: dict[str, None] = {}
+        removed: set[str] = set()
+        page_token = None
+        record_count = 0
+        synced_at = int(time.time())
+
+        while True:
+            try:
+                response = get_executor('gmail').execute(
+                    self.service.users().history().list(
+                        userId='me',
+                        startHistoryId=store['history_id'],
+                        historyTypes=HISTORY_TYPES,
+                        maxResults=HISTORY_PAGE_SIZE,
+                        pageToken=page_token,
+                    ),
+                )
+            except Exception as error:
+                if error_status(error) == 404:
+                    return False
+                raise
+
+            for record in response.get('history', []):
+                record_count += 1
+                for change in record.get('messagesAdded', []):
+                    _restore(change['message']['id'], added, removed)
+                for change in record.get('labelsRemoved', []):
+                    if HIDDEN_LABELS & set(change.get('labelIds', [])):
+                        _restore(change['message']['id'], added, removed)
+                for change in record.get('labelsAdded', []):
+                    if HIDDEN_LABELS & set(change.get('labelIds', [])):
+                        _remove(change['message']['id'], added, removed)
+                for change in record.get('messagesDeleted', []):
+                    _remove(change['message']['id'], added, removed)
+
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
+
+        messages, received = store['messages'], store['received']
+        for message_id in removed:
+            messages.pop(message_id, None)
+            received.pop(message_id, None)
+        new_records = self._matching_records(
+            [message_id for message_id in added if message_id not in messages],
+            store.get('synced_at', 0) - SYNC_TIME_MARGIN,
+        )
+        # Restored and imported mail keeps its date, so merge rather than prepend
+        store['messages'], store['received'] = _sorted_messages([
+            *((received[message_id], record) for message_id, record in messages.items()),
+            *new_records,
+        ])
+        store['history_id'] = response['historyId']
+        store['synced_at'] = synced_at
+        logging.info(
+            f'Applied {record_count} history records, '
+            f'{len(new_records)} new and {len(removed)} removed messages.')
+        return True
+
+    def _matching_records(
+        self, message_ids: list[str], since: int,
+    ) -> list[tuple[int, dict[str, Any]]]:
+        """
+        Return the internalDate and record of the messages matching the query.
+
+        Messages received after `since`, in epoch seconds, are checked with a
+        single listing, older ones with a listing of the second they were
+        received in, so a restored old message does not re-list years of mail.
+        """
+        if not message_ids:
+            return []
+        fetched = get_messages_metadata(
+            self.service, message_ids, record=_dated_record, missing_ok=True)
+        if not fetched:
+            return []
+
+        # The history has no query, so list the matching messages received
+        # when the new ones were and keep the new ones among them
+        matching: set[str] = set()
+        received = [internal_date // 1000 for internal_date, _ in fetched]
+        recent = [seconds for seconds in received if seconds >= since]
+        if recent:
+            matching.update(iter_message_ids(
+                self.service, self._search(f'after:{min(recent) - 1}')))
+        for seconds in sorted({seconds for seconds in received if seconds < since}):
+            matching.update(iter_message_ids(
+                self.service, self._search(f'after:{seconds - 1} before:{seconds + 1}')))
+        return [
+            (internal_date, record) for internal_date, record in fetched
+            if record['Message ID'] in matching
+        ]
+
+    def _search(self, terms: str) -> str:
+        return f'({self.query}) {terms}' if self.query else terms
+
+    def _load(self) -> dict[str, Any] | None:
+        if not os.path.exists(self.store_path):
+            return None
+        try:
+            with open(self.store_path, encoding='utf-8') as store_file:
+                store: dict[str, Any] = json.load(store_file)
+            return store
+        except (OSError, ValueError) as error:
+            logging.warning(
+                f'Ignoring unreadable message store {self.store_path}: {error}')
+            return None
+
+    def _save(self, store: dict[str, Any]) -> None:
+        temp_path = f'{self.store_path}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as store_file:
+            json.dump(store, store_file)
+        os.replace(temp_path, self.store_path)
+
+
+def _dated_record(message: dict[str, Any]) -> tuple[int, dict[str, Any]]:
+    return int(message.get('internalDate', 0)), message_record(message)
+
+
+def _sorted_messages(
+    dated_records: Iterable[tuple[int, dict[str, Any]]],
+) -> tuple[dict[str, dict[str, Any]], dict[str, int]]:
+    """Return the records and internalDates by message ID, newest first."""
+    ordered = sorted(
+        dated_records,
+        key=lambda item: (item[0], item[1]['Message ID']),
+        reverse=True,
+    )
+    return (
+        {record['Message ID']: record for _, record in ordered},
+        {record['Message ID']: internal_date for internal_date, record in ordered},
+    )
+
+
+def _restore(message_id: str, added: dict[str, None], removed: set[str]) -> None:
+    removed.discard(message_id)
+    added[message_id] = None
+
+
+def _remove(message_id: str, added: dict[str, None], removed: set[str]) -> None:
+    added.pop(message_id, None)
+    removed.add(message_id)
@@ -0,0 +1,263 @@
+import json
+import logging
+import os
+from collections.abc import Iterator, Mapping
+from typing import Any
+
+from drive_listing import get_files_multi_parent
+from request_executor import error_location, error_reason, error_status, get_executor
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+CHANGES_PAGE_SIZE = 1000
+CHANGE_FIELDS = (
+    'nextPageToken, newStartPageToken, '
+    'changes(fileId, removed, '
+    'file(id, name, mimeType, parents, trashed, createdTime))'
+)
+LISTING_FIELDS = (
+    'nextPageToken, files(id, name, mimeType, parents, createdTime)'
+)
+# changes.list statuses for a page token Drive no longer accepts, a 400
+# only counts when it is about the page token
+EXPIRED_TOKEN_STATUSES = {404, 410}
+
+
+class IncrementalStatusTracker:
+    """
+    Keep a local snapshot of the stage/batch/application folder tree
+    up to date with the Drive Changes API.
+
+    The first sync crawls every stage folder and stores the tree together
+    with a changes.getStartPageToken cursor. Later syncs only read the
+    changes.list deltas since that cursor and apply adds, moves, renames
+    and trashes to the snapshot, so their cost scales with churn rather
+    than with the number of customers. A sync whose cursor Drive no longer
+    accepts falls back to a full crawl.
+
+    The service only needs files().list, changes().getStartPageToken and
+    changes().list, so a fake Drive service replaying change pages can
+    stand in for the real one.
+    """
+
+    def __init__(
+        self,
+        service: Any,
+        stages: Mapping[str, str],
+        snapshot_path: str,
+    ) -> None:
+        """
+        Args:
+            service: Google Drive API service instance.
+            stages: Mapping of stage folder ID to its application status.
+                Two stage folders may share a status.
+            snapshot_path: Path of the JSON file holding the snapshot.
+        """
+        self.service = service
+        self.stages = dict(stages)
+        self.snapshot_path = snapshot_path
+        self.snapshot: dict[str, Any] = {}
+
+    def sync(self) -> dict[str, Any]:
+        """
+        Bring the snapshot up to date and persist it.
+
+        Returns:
+            The synced snapshot.
+        """
+        snapshot = self._load()
+        if snapshot is None or snapshot.get('stages') != self.stages:
+            logging.info('No usable snapshot found, running a full crawl.')
+            snapshot = self._full_crawl()
+        elif not self._apply_changes(snapshot):
+            logging.info('The stored page token has expired, running a full crawl.')
+            snapshot = self._full_crawl()
+
+        self.snapshot = snapshot
+        self._save(snapshot)
+        return snapshot
+
+    def iter_batches(
+        self,
+    ) -> Iterator[tuple[str, dict[str, Any], list[dict[str, Any]]]]:
+        """
+        Yield (status, batch folder, application files) from the snapshot.
+
+        Stages follow the configured order, batches are ordered by creation
+        time and files by name, so results are stable between runs.
+        """
+        batches = self.snapshot.get('batches', {})
+        files_by_batch: dict[str, list[dict[str, Any]]] = {}
+        for file in self.snapshot.get('files', {}).values():
+            if file['parent'] in batches:
+                files_by_batch.setdefault(file['parent'], []).append(file)
+
+        for stage_id, status in self.stages.items():
+            stage_batches = sorted(
+                (batch for batch in batches.values()
+                 if batch['parent'] == stage_id),
+                key=lambda batch: (
+                    batch.get('createdTime', ''), batch['name'], batch['id']),
+            )
+            for batch in stage_batches:
+                files = sorted(
+                    files_by_batch.get(batch['id'], []),
+                    key=lambda file: (file['name'], file['id']),
+                )
+                yield status, batch, files
+
+    def _full_crawl(self) -> dict[str, Any]:
+        # Take the cursor before listing so no change slips between the two
+        start_page_token = get_executor('drive').execute(
+            self.service.changes().getStartPageToken(),
+        )['startPageToken']
+        snapshot: dict[str, Any] = {
+            'start_page_token': start_page_token,
+            'stages': self.stages,
+            'batches': {},
+            'files': {},
+        }
+
+        stage_ids = set(self.stages)
+        children_by_stage = get_files_multi_parent(
+            self.service, list(stage_ids), fields=LISTING_FIELDS)
+        for stage_id, children in children_by_stage.items():
+            for child in children:
+                if child.get('mimeType') == FOLDER_MIME_TYPE:
+                    snapshot['batches'][child['id']] = _batch_entry(
+                        child, stage_id)
+
+        self._refresh_batch_files(snapshot, list(snapshot['batches']))
+        return snapshot
+
+    def _apply_changes(self, snapshot: dict[str, Any]) -> bool:
+        """Apply the changes since the stored cursor, False if it has expired."""
+        stage_ids = set(self.stages)
+        batches = snapshot['batches']
+        files = snapshot['files']
+        new_batch_ids = []
+        page_token = snapshot['start_page_token']
+        change_count = 0
+
+        while page_token is not None:
+            try:
+                response = get_executor('drive').execute(
+                    self.service.changes()
+                    .list(
+                        pageToken=page_token,
+                        spaces='drive',
+                        includeRemoved=True,
+                        pageSize=CHANGES_PAGE_SIZE,
+                        fields=CHANGE_FIELDS,
+                    ),
+                )
+            except Exception as error:
+                if _is_expired_token(error):
+                    return False
+                raise
+
+            for change in response.get('changes', []):
+                change_count += 1
+                file_id = change['fileId']
+                file = change.get('file')
+
+                if change.get('removed') or not file or file.get('trashed'):
+                    batches.pop(file_id, None)
+                    files.pop(file_id, None)
+                    continue
+
+                parents = file.get('parents', [])
+                stage_parent = next(
+                    (p for p in parents if p in stage_ids), None)
+                batch_parent = next(
+                    (p for p in parents if p in batches), None)
+
+                if (stage_parent is not None
+                        and file.get('mimeType') == FOLDER_MIME_TYPE):
+                    files.pop(file_id, None)
+                    if file_id not in batches:
+                        new_batch_ids.append(file_id)
+                    batches[file_id] = _batch_entry(file, stage_parent)
+                elif batch_parent is not None:
+                    batches.pop(file_id, None)
+                    files[file_id] = _file_entry(file, batch_parent)
+                else:
+                    # Moved out of the tracked tree, or never part of it
+                    batches.pop(file_id, None)
+                    files.pop(file_id, None)
+
+            if 'newStartPageToken' in response:
+                snapshot['start_page_token'] = response['newStartPageToken']
+            page_token = response.get('nextPageToken')
+
+        # Folders that entered a stage may already hold files whose own
+        # changes were skipped because their parent was unknown at the time
+        self._refresh_batch_files(
+            snapshot, [b for b in new_batch_ids if b in batches])
+        logging.info(
+            f'Applied {change_count} changes, '
+            f'{len(new_batch_ids)} new batch folders.')
+        return True
+
+    def _refresh_batch_files(
+        self,
+        snapshot: dict[str, Any],
+        batch_ids: list[str],
+    ) -> None:
+        if not batch_ids:
+            return
+        files = snapshot['files']
+        refreshed = set(batch_ids)
+        for file_id in [
+                file_id for file_id, file in files.items()
+                if file['parent'] in refreshed]:
+            del files[file_id]
+
+        children_by_batch = get_files_multi_parent(
+            self.service, batch_ids, fields=LISTING_FIELDS)
+        for batch_id, children in children_by_batch.items():
+            for child in children:
+                files[child['id']] = _file_entry(child, batch_id)
+
+    def _load(self) -> dict[str, Any] | None:
+        if not os.path.exists(self.snapshot_path):
+            return None
+        try:
+            with open(self.snapshot_path, encoding='utf-8') as snapshot_file:
+                snapshot: dict[str, Any] = json.load(snapshot_file)
+            return snapshot
+        except (OSError, ValueError) as error:
+            logging.warning(
+                f'Ignoring unreadable snapshot {self.snapshot_path}: {error}')
+            return None
+
+    def _save(self, snapshot: dict[str, Any]) -> None:
+        temp_path = f'{self.snapshot_path}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as snapshot_file:
+            json.dump(snapshot, snapshot_file)
+        os.replace(temp_path, self.snapshot_path)
+
+
+def _batch_entry(folder: dict[str, Any], stage_id: str) -> dict[str, Any]:
+    return {
+        'id': folder['id'],
+        'name': folder.get('name', 'Unknown'),
+        'createdTime': folder.get('createdTime', ''),
+        'parent': stage_id,
+    }
+
+
+def _file_entry(file: dict[str, Any], batch_id: str) -> dict[str, Any]:
+    return {
+        'id': file['id'],
+        'name': file.get('name', ''),
+        'parent': batch_id,
+    }
+
+
+def _is_expired_token(error: Exception) -> bool:
+    status = error_status(error)
+    if status in EXPIRED_TOKEN_STATUSES:
+        return True
+    return status == 400 and (
+        error_reason(error) == 'invalidPageToken'
+        or error_location(error) == 'pageToken')
@@ -1,41 +1,199 @@
-import pandas as pd
-import google.auth
-from googleapiclient.discovery import build
+import argparse
+import itertools
+import logging
+import os
+import time
+from api_metrics import ApiMetrics
+from google_clients import build_service
+from request_executor import error_status, get_executor, is_retryable
 
-def list_messages(service, query, max_results=10):
+# Gmail rejects batch envelopes with more than 100 sub-requests
+BATCH_LIMIT = 100
+# Above about 50 sub-requests per envelope Gmail starts rate limiting them
+DEFAULT_BATCH_SIZE = 50
+# messages.list returns at most 500 messages per page
+LIST_PAGE_SIZE = 500
+# Headers requested with format='metadata', with the value used when missing
+METADATA_HEADERS = {
+    'Subject': 'No Subject',
+    'From': 'Unknown Sender',
+    'Date': 'Unknown Date',
+}
+MESSAGE_COLUMNS = ['Message ID', 'Subject', 'Sender', 'Date', 'Snippet']
+# Messages between two export progress logs
+EXPORT_LOG_INTERVAL = 10000
 
-    try:
-        results = service.users().messages().list(
+
+def message_record(message):
+    """
+    Turns a messages.get response into the row list_messages outputs, reading the headers in one pass.
+    :param message: Message resource in metadata or full format.
+    :return: Dictionary with the message ID, subject, sender, date and snippet.
+    """
+    values = {}
+    for header in message.get('payload', {}).get('headers', []):
+        # The first occurrence of a repeated header wins
+        if header['name'] in METADATA_HEADERS:
+            values.setdefault(header['name'], header['value'])
+    return {
+        'Message ID': message['id'],
+        'Subject': values.get('Subject', METADATA_HEADERS['Subject']),
+        'Sender': values.get('From', METADATA_HEADERS['From']),
+        'Date': values.get('Date', METADATA_HEADERS['Date']),
+        'Snippet': message.get('snippet', 'No Snippet')
+    }
+
+
+def get_messages_metadata(service, message_ids, batch_size=DEFAULT_BATCH_SIZE, record=message_record, missing_ok=False):
+    """
+    Fetches the Subject, From and Date headers of many messages using Gmail batch requests.
+
+    Every message becomes one messages.get sub-request in metadata format, so bodies and attachments
+    are never downloaded. Up to `batch_size` sub-requests share a single HTTP round-trip, and
+    sub-requests that fail with a retryable status are re-queued with backoff. Sub-requests that
+    still fail afterwards raise.
+    :param service: Gmail API service instance.
+    :param message_ids: Iterable of message IDs.
+    :param batch_size: Maximum number of sub-requests per batch envelope, at most BATCH_LIMIT.
+    :param record: Function turning each messages.get response into the record returned for it.
+    :param missing_ok: Whether to leave out messages deleted since they were listed instead of raising.
+    :return: List of message records, see message_record, in the order of message_ids.
+    """
+    executor = get_executor('gmail')
+    batch_size = min(batch_size, BATCH_LIMIT)
+    message_ids = list(message_ids)
+    records = [None] * len(message_ids)
+    # Each pending entry is (position, attempts)
+    pending = [(position, 0) for position in range(len(message_ids))]
+    failures = []
+
+    while pending:
+        envelope, pending = pending[:batch_size], pending[batch_size:]
+        retry_attempts = []
+
+        def handle_response(request_id, response, exception, envelope=envelope, retry_attempts=retry_attempts):
+            position, attempts = envelope[int(request_id)]
+            executor.record(exception)
+
+            if exception is not None:
+                if is_retryable(exception) and attempts < executor.max_retries:
+                    pending.append((position, attempts + 1))
+                    retry_attempts.append(attempts)
+                elif missing_ok and error_status(exception) == 404:
+                    logging.info(f"Message {message_ids[position]} was deleted, skipping it")
+                else:
+                    logging.error(f"Error fetching message {message_ids[position]}: {exception}")
+                    failures.append(exception)
+                return
+
+            records[position] = record(response)
+
+        batch = service.new_batch_http_request(callback=handle_response)
+        for index, (position, _) in enumerate(envelope):
+            batch.add(
+                service.users().messages().get(
+                    userId='me',
+                    id=message_ids[position],
+                    format='metadata',
+                    metadataHeaders=list(METADATA_HEADERS)
+                ),
+                request_id=str(index)
+            )
+        executor.execute_batch(batch, len(envelope))
+
+        if failures:
+            raise failures[0]
+        if retry_attempts:
+            time.sleep(executor.backoff_delay(max(retry_attempts)))
+
+    if missing_ok:
+        return [message for message in records if message is not None]
+    return records
+
+
+def iter_message_ids(service, query, max_results=None, page_size=LIST_PAGE_SIZE):
+    """
+    Yields the IDs of the messages matching a query, newest first, following nextPageToken.
+    :param service: Gmail API service instance.
+    :param query: Gmail search query, e.g. "from:idealista".
+    :param max_results: Maximum number of IDs, all matching messages when None.
+    :param page_size: Messages requested per messages.list page.
+    :return: Generator of message IDs, one page requested at a time.
+    """
+    page_size = min(page_size, LIST_PAGE_SIZE)
+    remaining = max_results
+    page_token = None
+    while remaining is None or remaining > 0:
+        results = get_executor('gmail').execute(service.users().messages().list(
             userId='me',
             q=query,
-            maxResults=max_results
-        ).execute()
-
+            maxResults=page_size if remaining is None else min(page_size, remaining),
+            pageToken=page_token
+        ))
         messages = results.get('messages', [])
-        if not messages:
+        if remaining is not None:
+            messages = messages[:remaining]
+            remaining -= len(messages)
+        for message in messages:
+            yield message['id']
+
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            break
+
+
+def iter_messages(service, query, max_results=None, batch_size=DEFAULT_BATCH_SIZE, record=message_record):
+    """
+    Yields the records of the messages matching a query as they are fetched.
+
+    Records are fetched one batch request of `batch_size` messages at a time, so the first ones are
+    yielded after two round-trips and memory does not grow with the size of the mailbox. Messages
+    deleted between the listing and the fetch are left out.
+    :param service: Gmail API service instance.
+    :param query: Gmail search query, e.g. "from:idealista".
+    :param max_results: Maximum number of messages, all matching messages when None.
+    :param batch_size: Maximum number of messages per batch envelope.
+    :param record: Function turning each messages.get response into the record yielded for it.
+    :return: Generator of message records, see message_record, newest first.
+    """
+    message_ids = iter_message_ids(service, query, max_results)
+    while chunk := list(itertools.islice(message_ids, min(batch_size, BATCH_LIMIT))):
+        # A message deleted after its page was listed is skipped, not fatal to the listing
+        yield from get_messages_metadata(service, chunk, batch_size, record=record, missing_ok=True)
+
+
+def export_messages(service, query, output_path, max_results=None):
+    """
+    Streams the records of the messages matching a query into a CSV, JSONL or Parquet file.
+    :param service: Gmail API service instance.
+    :param query: Gmail search query, e.g. "from:idealista".
+    :param output_path: Output file, its extension picks the format, see record_sinks.open_sink.
+    :param max_results: Maximum number of messages, all matching messages when None.
+    :return: Number of messages written.
+    """
+    from record_sinks import open_sink
+
+    with open_sink(output_path, MESSAGE_COLUMNS) as sink:
+        for record in iter_messages(service, query, max_results):
+            sink.write(record)
+            if sink.count % EXPORT_LOG_INTERVAL == 0:
+                logging.info(f"Exported {sink.count} messages to {output_path}")
+    logging.info(f"Exported {sink.count} messages to {output_path}")
+    return sink.count
+
+
+def list_messages(service, query, max_results=10):
+
+    try:
+        data = list(iter_messages(service, query, max_results))
+        if not data:
             print("No messages found.")
             return []
-        
-        data = []
-        for message in messages:
-            msg = service.users().messages().get(userId='me', id=message['id']).execute()
-            payload = msg.get('payload', {})
-            headers = payload.get('headers', [])
-
-            subject = next((h['value'] for h in headers if h['name'] == 'Subject'), 'No Subject')
-            sender = next((h['value'] for h in headers if h['name'] == 'From'), 'Unknown Sender')
-            date = next((h['value'] for h in headers if h['name'] == 'Date'), 'Unknown Date')
-            snippet = msg.get('snippet', 'No Snippet')
-
-            data.append({
-                'Message ID': message['id'],
-                'Subject': subject,
-                'Sender': sender,
-                'Date': date,
-                'Snippet': snippet
-            })
-        
-        df = pd.DataFrame(data)
+
+        # pandas takes most of the import time, only load it when needed
+        import pandas as pd
+
+        df = pd.DataFrame(data, columns=MESSAGE_COLUMNS)
         print(df)
         return df     
     
@@ -43,12 +201,27 @@ def list_messages(service, query, max_results=10):
         print(f"An error ocurred: {e}")
         return []
 
+def list_messages_incremental(service, query, store_path):
+    """
+    Returns the records of the messages matching a query from a local store kept in sync with the Gmail History API.
+    :param service: Gmail API service instance.
+    :param query: Gmail search query, e.g. "from:idealista".
+    :param store_path: Path of the JSON file holding the message store.
+    :return: List of message records, newest first.
+    """
+    # Imported here, incremental_gmail_sync reuses the fetch functions of this module
+    from incremental_gmail_sync import IncrementalMessageSync
+
+    message_sync = IncrementalMessageSync(service, query, store_path)
+    message_sync.sync()
+    return list(message_sync.iter_records())
+
 def get_message_details(service, message_id):
-    message = service.users().messages().get(
+    message = get_executor('gmail').execute(service.users().messages().get(
         userId='me',
         id=message_id,
         format='full'
-    ).execute()
+    ))
 
     payload = message['payload']
     headers = payload['headers']
@@ -62,8 +235,35 @@ def get_message_details(service, message_id):
     print(message['snippet'])
 
 if __name__ == "__main__":
-    creds, _ = google.auth.default()
-    gmail_service = build("gmail", "v1", credentials=creds)
-    drive_service = build("drive", "v3", credentials=creds)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="List or export the Gmail messages matching a query.")
+    parser.add_argument("--query", default="from:idealista", help="Gmail search query.")
+    parser.add_argument("--max-results", type=int,
+                        help="Maximum number of messages, 50 when listing and all when exporting by default.")
+    parser.add_argument("--output", help="Stream the messages into this .csv, .jsonl or .parquet file.")
+    # Set GMAIL_SYNC_PATH to only fetch the messages added since the previous run
+    parser.add_argument("--sync-store", default=os.environ.get("GMAIL_SYNC_PATH"),
+                        help="JSON file keeping the messages between runs, synced with the Gmail history.")
+    args = parser.parse_args()
+
+    metrics = ApiMetrics.from_env()
+    gmail_service = build_service("gmail", "v1", metrics=metrics)
+    drive_service = build_service("drive", "v3", metrics=metrics)
+
+    if args.sync_store:
+        from record_sinks import open_sink
+
+        records = list_messages_incremental(gmail_service, args.query, args.sync_store)
+        if args.max_results is not None:
+            records = records[:args.max_results]
+        if args.output:
+            with open_sink(args.output, MESSAGE_COLUMNS) as sink:
+                sink.write_many(records)
+        else:
+            import pandas as pd
 
-    df = list_messages(gmail_service, query="from:idealista", max_results=50)
\ No newline at end of file
+            print(pd.DataFrame(records[:args.max_results or 50], columns=MESSAGE_COLUMNS))
+    elif args.output:
+        export_messages(gmail_service, args.query, args.output, args.max_results)
+    else:
+        df = list_messages(gmail_service, query=args.query, max_results=args.max_results or 50)
@@ -0,0 +1,124 @@
+import heapq
+import math
+from collections.abc import Iterable, Mapping
+from typing import Any
+
+from customer_names import fuzzy_key, name_ngrams
+
+DEFAULT_MIN_SCORE = 0.6
+DEFAULT_LIMIT = 5
+NGRAM_SIZE = 3
+
+
+class NameIndex:
+    """
+    Inverted index of customer names by character trigram.
+
+    Names are compared by their fuzzy_key, so accents, punctuation, case,
+    spacing and word order do not matter, and scored by the Dice
+    coefficient of their trigram sets. A search only reads the postings of
+    the rarest trigrams of the query: a name sharing none of them cannot
+    reach the score of the limit-th best match found so far (prefix
+    filtering), so the cost depends on how many names look alike rather
+    than on the size of the index.
+    """
+
+    def __init__(
+        self,
+        entries: Iterable[Mapping[str, Any]] = (),
+        name_field: str = 'customer',
+    ) -> None:
+        """
+        Args:
+            entries: Entries to index, e.g. from get_application_statuses.
+            name_field: Entry field holding the customer name.
+        """
+        self.name_field = name_field
+        self._entries: list[Mapping[str, Any]] = []
+        self._grams: list[frozenset[str]] = []
+        self._postings: dict[str, list[int]] = {}
+        self._by_key: dict[str, list[int]] = {}
+        for entry in entries:
+            self.add(entry)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, entry: Mapping[str, Any]) -> None:
+        """Index one entry under its name."""
+        key = fuzzy_key(str(entry.get(self.name_field) or ''))
+        if not key:
+            return
+        entry_id = len(self._entries)
+        grams = name_ngrams(key, NGRAM_SIZE)
+        self._entries.append(entry)
+        self._grams.append(grams)
+        self._by_key.setdefault(key, []).append(entry_id)
+        for gram in grams:
+            self._postings.setdefault(gram, []).append(entry_id)
+
+    def search(
+        self,
+        name: str,
+        limit: int = DEFAULT_LIMIT,
+        min_score: float = DEFAULT_MIN_SCORE,
+    ) -> list[tuple[float, Mapping[str, Any]]]:
+        """
+        Return the entries whose name is most similar to name.
+
+        Args:
+            name: Name to look up.
+            limit: Maximum number of matches.
+            min_score: Lowest score returned, between 0 and 1. Lower
+                values read more postings.
+
+        Returns:
+            (score, entry) pairs, best first. Names with the same
+            fuzzy_key score 1.0.
+        """
+        key = fuzzy_key(name)
+        if not key or limit < 1:
+            return []
+        if not 0 < min_score <= 1:
+            raise ValueError('min_score must be in (0, 1].')
+        grams = name_ngrams(key, NGRAM_SIZE)
+        size = len(grams)
+        rarest = sorted(grams, key=lambda gram: len(self._postings.get(gram, ())))
+
+        # Best matches so far as (score, -entry_id), worst first. Once there
+        # are limit of them, the worst score is the bar for the others
+        best: list[tuple[float, int]] = []
+        threshold = min_score
+        seen: set[int] = set()
+
+        def consider(entry_ids: Iterable[int]) -> None:
+            nonlocal threshold
+            for entry_id in entry_ids:
+                if entry_id in seen:
+                    continue
+                seen.add(entry_id)
+                other = self._grams[entry_id]
+                score = 2 * len(grams & other) / (size + len(other))
+                if score < threshold:
+                    continue
+                heapq.heappush(best, (score, -entry_id))
+                if len(best) > limit:
+                    heapq.heappop(best)
+                if len(best) == limit:
+                    threshold = max(threshold, best[0][0])
+
+        consider(self._by_key.get(key, ()))
+        for position, gram in enumerate(rarest):
+            # A name of b trigrams sharing o with the query scores
+            # 2o / (size + b), and o <= b, so reaching the threshold takes
+            # o >= min_overlap: such a name has one of the size -
+            # min_overlap + 1 rarest trigrams
+            min_overlap = math.ceil(threshold * size / (2 - threshold) - 1e-9)
+            if position > size - min_overlap:
+                break
+            consider(self._postings.get(gram, ()))
+
+        return [
+            (score, self._entries[-negative_id])
+            for score, negative_id in sorted(best, key=lambda match: (-match[0], -match[1]))
+        ]
@@ -0,0 +1,11 @@
+import os
+
+# Tasks queued per worker, so results stream out instead of piling up
+TASKS_PER_WORKER = 4
+
+
+def available_cores() -> int:
+    """Return the number of cores this process may run on."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
@@ -1,38 +1,70 @@
 import io
+import itertools
+import os
+from collections.abc import Iterator, Mapping, Sequence
 from typing import Any, BinaryIO
 
-import google.auth
-import googleapiclient
-from googleapiclient.discovery import build  # type: ignore
-from openpyxl import load_workbook
+import googleapiclient.errors
+
+from api_metrics import ApiMetrics
+from google_clients import build_service, get_credentials
+from request_executor import get_executor
+from workbook_cache import WorkbookCache
+
+CACHE_DIR_ENV = 'CUSTOMER_CACHE_DIR'
+REVISION_FIELDS = 'md5Checksum, modifiedTime'
+
+
+def get_file_revision(drive_service: Any, file_id: str) -> dict[str, Any]:
+    """Return the md5Checksum and modifiedTime of a Drive file."""
+    revision: dict[str, Any] = get_executor('drive').execute(
+        drive_service.files().get(fileId=file_id, fields=REVISION_FIELDS))
+    return revision
 
 
 def download_excel_file(
     drive_service: Any,
     file_id: str,
+    cache: WorkbookCache | None = None,
+    revision: Mapping[str, Any] | None = None,
 ) -> BinaryIO | None:
     """Download an Excel file from Google Drive.
 
     Args:
         drive_service (Any): The Google Drive service object.
         file_id (str): The ID of the file to download.
+        cache (WorkbookCache | None): Cache serving the file while it is
+            unchanged in Drive.
+        revision (Mapping[str, Any] | None): The current revision of the
+            file from get_file_revision, fetched when None and using a cache.
 
     Returns:
         Optional[BinaryIO]: A binary file-like object
         containing the file's content.
     """
+    from googleapiclient.http import MediaIoBaseDownload
+
     try:
+        if cache is not None:
+            if revision is None:
+                revision = get_file_revision(drive_service, file_id)
+            content = cache.workbook(file_id, revision)
+            if content is not None:
+                return io.BytesIO(content)
+
         request = drive_service.files().get_media(fileId=file_id)
         file_buffer = io.BytesIO()
-        downloader = googleapiclient.http.MediaIoBaseDownload(
+        downloader = MediaIoBaseDownload(
             file_buffer,
             request)
 
         done = False
         while not done:
-            status, done = downloader.next_chunk()
-            print(f'Download {int(status.progress() * 100)}% complete.')
+            status, done = get_executor('drive').call(downloader.next_chunk)
+        print(f'Download {int(status.progress() * 100)}% complete.')
 
+        if cache is not None and revision is not None:
+            cache.put_workbook(file_id, revision, file_buffer.getvalue())
         file_buffer.seek(0)
         return file_buffer
 
@@ -43,6 +75,110 @@ def download_excel_file(
     return None
 
 
+EXPECTED_COLUMNS = [
+    '#',
+    'CIF',
+    'Fullname',
+    'ID_No.',
+    'Emboss_Name',
+    'CASA_Account_No',
+    'CARDNUMBER',
+    'ISS_DATE',
+]
+# The first row holds the title of the export, the second the header
+HEADER_ROW = 2
+DEFAULT_BATCH_SIZE = 10_000
+# Stored with cached records, so changing the parsing invalidates them
+PARSER_VERSION = '1:' + ','.join(EXPECTED_COLUMNS)
+
+
+def _validate_header(header: Sequence[Any]) -> None:
+    for index, expected_column in enumerate(EXPECTED_COLUMNS):
+        if index >= len(header) or header[index] != expected_column:
+            raise ValueError(
+                f'Invalid Excel format.'
+                f'Expected column {expected_column} in position {index + 1} '
+                f"but got {header[index] if index < len(header) else 'None'}.",
+            )
+
+    ignored_columns = list(header[len(EXPECTED_COLUMNS):])
+    if ignored_columns:
+        print(f'Warning: Ignored extra columns: {ignored_columns}')
+
+
+def iter_customer_information(
+    file_content: BinaryIO,
+) -> Iterator[dict[str, Any]]:
+    """
+    Stream the customer information of the first sheet of the Excel file.
+
+    The workbook is opened read-only, so rows are parsed as they are
+    consumed and memory does not grow with the sheet. The header is
+    validated before the first record is yielded.
+
+    Args:
+        file_content (BinaryIO): The binary content of the Excel file,
+            kept open until the generator is exhausted.
+
+    Yields:
+        dict[str, Any]: The customer information of each row with a
+        full name and an ID number.
+
+    Raises:
+        ValueError: If the Excel format does not match the expected structure.
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_content, read_only=True)
+    try:
+        sheet = workbook.active
+        if sheet is None:
+            raise ValueError(
+                'The workbook does not contain any active sheet.')
+
+        rows = sheet.iter_rows(min_row=HEADER_ROW, values_only=True)
+        _validate_header(next(rows, ()))
+
+        # Get indices of mandatory columns in EXPECTED_COLUMNS
+        fullname_idx, id_no_idx = map(
+            EXPECTED_COLUMNS.index, ['Fullname', 'ID_No.'])
+        column_count = len(EXPECTED_COLUMNS)
+        for row in rows:
+            # Read-only rows end at their last stored cell
+            row = row[:column_count] + (None,) * (column_count - len(row))
+            if not any(row):
+                continue
+            if row[fullname_idx] and row[id_no_idx]:
+                yield dict(zip(EXPECTED_COLUMNS, row, strict=True))
+    finally:
+        workbook.close()
+
+
+def iter_customer_batches(
+    file_content: BinaryIO,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Iterator[Any]:
+    """
+    Stream the customer information as DataFrames of up to batch_size rows.
+
+    Args:
+        file_content (BinaryIO): The binary content of the Excel file.
+        batch_size (int): Maximum number of customers per DataFrame.
+
+    Yields:
+        pandas.DataFrame: Customers with one column per expected column;
+        to_numpy() gives the NumPy array of a batch.
+
+    Raises:
+        ValueError: If the Excel format does not match the expected structure.
+    """
+    import pandas as pd
+
+    records = iter_customer_information(file_content)
+    while batch := list(itertools.islice(records, batch_size)):
+        yield pd.DataFrame.from_records(batch, columns=EXPECTED_COLUMNS)
+
+
 def retrieve_customer_information(
     file_content: BinaryIO,
 ) -> list[dict[str, Any]]:
@@ -59,58 +195,48 @@ def retrieve_customer_information(
     Raises:
         ValueError: If the Excel format does not match the expected structure.
     """
+    return list(iter_customer_information(file_content))
 
-    workbook = load_workbook(file_content)
-    sheet = workbook.active
-    if sheet is None:
-        raise ValueError(
-            'The workbook does not contain any active sheet.')
-
-    expected_columns = [
-        '#',
-        'CIF',
-        'Fullname',
-        'ID_No.',
-        'Emboss_Name',
-        'CASA_Account_No',
-        'CARDNUMBER',
-        'ISS_DATE',
-    ]
-
-    header = [cell.value for cell in next(
-        sheet.iter_rows(min_row=2, max_row=2))]
-
-    for index, expected_column in enumerate(expected_columns):
-        if index >= len(header) or header[index] != expected_column:
-            raise ValueError(
-                f'Invalid Excel format.'
-                f'Expected column {expected_column} in position {index + 1} '
-                f"but got {header[index] if index < len(header) else 'None'}.",
-            )
 
-    ignored_columns = header[len(expected_columns):]
-    if ignored_columns:
-        print(f'Warning: Ignored extra columns: {ignored_columns}')
+def load_customer_information(
+    drive_service: Any,
+    file_id: str,
+    cache: WorkbookCache | None = None,
+) -> list[dict[str, Any]] | None:
+    """
+    Download and parse a customer workbook, reusing cached records.
 
-    customer_data = []
+    With a cache, the revision of the file is checked first: records
+    parsed from the same revision are returned without downloading or
+    parsing, and a workbook stored at that revision is parsed without
+    downloading.
 
-    # Get indices of mandatory columns in expected_columns
-    fullname_idx, id_no_idx = map(
-        expected_columns.index, ['Fullname', 'ID_No.'])
-    for row in sheet.iter_rows(
-        min_row=3,
-        max_col=len(expected_columns),
-        values_only=True,
-    ):
-        if not any(row):
-            continue
-        if row[fullname_idx] and row[id_no_idx]:
-            customer_data.append(dict(zip(
-                expected_columns,
-                row,
-                strict=True)))
+    Args:
+        drive_service (Any): The Google Drive service object.
+        file_id (str): The ID of the workbook.
+        cache (WorkbookCache | None): Cache of workbooks and records.
 
-    return customer_data
+    Returns:
+        list[dict[str, Any]] | None: The customer information, or None if
+        the download failed.
+
+    Raises:
+        ValueError: If the Excel format does not match the expected structure.
+    """
+    revision = None
+    if cache is not None:
+        revision = get_file_revision(drive_service, file_id)
+        records = cache.records(file_id, revision, PARSER_VERSION)
+        if records is not None:
+            return records
+
+    file_content = download_excel_file(drive_service, file_id, cache, revision)
+    if file_content is None:
+        return None
+    records = retrieve_customer_information(file_content)
+    if cache is not None and revision is not None:
+        cache.put_records(file_id, revision, PARSER_VERSION, records)
+    return records
 
 
 def main() -> None:
@@ -118,22 +244,27 @@ def main() -> None:
     scopes = ['https://www.googleapis.com/auth/drive']
     try:
         # Authenticate and build the Drive service
-        credentials, _ = google.auth.default(scopes=scopes)
-        drive_service = build('drive', 'v3', credentials=credentials)
+        credentials = get_credentials(scopes)
+        drive_service = build_service(
+            'drive', 'v3', credentials, ApiMetrics.from_env())
+        cache_dir = os.environ.get(CACHE_DIR_ENV)
+        cache = WorkbookCache(cache_dir) if cache_dir else None
 
         file_id = '1qXV6uoHz0fTQCKmEFiutuYXu4_g_UDIl'
-        file_content = download_excel_file(drive_service, file_id)
-
-        if file_content:
-            try:
-                customer_data = retrieve_customer_information(file_content)
+        try:
+            customer_data = load_customer_information(
+                drive_service, file_id, cache)
+        except ValueError as error:
+            print(error)
+        else:
+            if customer_data is None:
+                print('File download failed.')
+            else:
                 print('Customer Information:')
                 for record in customer_data:
                     print(record)
-            except ValueError as error:
-                print(error)
-        else:
-            print('File download failed.')
+        if cache is not None:
+            cache.log_stats()
 
     except Exception as error:
         print(f'Error initializing Drive service: {error}')
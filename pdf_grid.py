@@ -0,0 +1,210 @@
+import functools
+from collections.abc import Callable, Iterable, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+# Strings kept by the width and text operator caches, since columns
+# repeat values
+TEXT_CACHE_SIZE = 65536
+
+
+@dataclass(frozen=True)
+class GridStyle:
+    """
+    Look of a grid of text cells, the same as the platypus TableStyle
+    GRID, FONT and first-row BACKGROUND commands with default paddings.
+    """
+
+    font: str = 'Helvetica'
+    font_size: float = 8
+    # TableStyle FONT sets the leading to 1.2 times the font size
+    leading: float = 9.6
+    left_padding: float = 6
+    right_padding: float = 6
+    bottom_padding: float = 3
+    line_width: float = 0.25
+    line_color: tuple[float, float, float] = (0, 0, 0)
+    # reportlab.lib.colors.lightgrey
+    header_background: tuple[float, float, float] | None = (
+        0.827451, 0.827451, 0.827451)
+
+
+def cell_text(value: Any) -> str:
+    """Return the text a cell is printed with, empty for None."""
+    return '' if value is None else str(value)
+
+
+@functools.lru_cache(maxsize=TEXT_CACHE_SIZE)
+def text_width(text: str, font: str, font_size: float) -> float:
+    """Return the width of text in points, cached since columns repeat values."""
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    return float(stringWidth(text, font, font_size))
+
+
+def column_widths(
+    rows: Iterable[Sequence[Any]],
+    table_width: float,
+    style: GridStyle = GridStyle(),
+) -> list[float]:
+    """
+    Share table_width between the columns in proportion to their content.
+
+    Args:
+        rows: Sample rows, usually the header and the first page.
+        table_width: Total width of the grid.
+        style: Font and paddings the cells are drawn with.
+
+    Returns:
+        Width of each column, adding up to table_width.
+    """
+    natural: list[float] = []
+    for row in rows:
+        if len(row) > len(natural):
+            natural.extend([0.0] * (len(row) - len(natural)))
+        for column, value in enumerate(row):
+            width = max(
+                (text_width(line, style.font, style.font_size)
+                 for line in cell_text(value).split('\n')),
+                default=0.0,
+            )
+            natural[column] = max(natural[column], width)
+    if not natural:
+        return []
+
+    padding = style.left_padding + style.right_padding
+    natural = [width + padding for width in natural]
+    scale = table_width / sum(natural)
+    return [width * scale for width in natural]
+
+
+class GridRenderer:
+    """
+    Draws pages of rows as a fixed-height grid straight onto a canvas.
+
+    Every page of a grid has the same columns and row height, so the
+    positions are computed once. Cells are written into a single text
+    object and the rules drawn as one path, without the per-page layout
+    of a platypus Table.
+    """
+
+    def __init__(
+        self,
+        widths: Sequence[float],
+        row_height: float,
+        style: GridStyle = GridStyle(),
+    ) -> None:
+        """
+        Args:
+            widths: Width of each column, see column_widths.
+            row_height: Height of each row.
+            style: Look of the grid.
+        """
+        self.widths = list(widths)
+        self.row_height = row_height
+        self.style = style
+        self.width = sum(self.widths)
+        self._column_offsets = [0.0]
+        for width in self.widths:
+            self._column_offsets.append(self._column_offsets[-1] + width)
+        self._shown: dict[str, str] = {}
+        self._shown_canvas: Any = None
+
+    def draw(
+        self,
+        c: Any,
+        rows: Sequence[Sequence[Any]],
+        x: float,
+        top: float,
+    ) -> float:
+        """
+        Draw rows with the top-left corner of the grid at (x, top).
+
+        Cells beyond the number of columns are ignored. As in a platypus
+        Table, text is bottom-aligned and not clipped to its cell.
+
+        Returns:
+            Height of the grid drawn.
+        """
+        from reportlab.lib.rl_accel import fp_str
+
+        if not rows:
+            return 0.0
+        style = self.style
+
+        c.saveState()
+        if style.header_background is not None:
+            c.setFillColorRGB(*style.header_background)
+            c.rect(x, top - self.row_height, self.width, self.row_height,
+                   stroke=0, fill=1)
+
+        c.setFillColorRGB(0, 0, 0)
+        text = c.beginText()
+        text.setFont(style.font, style.font_size, style.leading)
+        ops, format_text = _text_object_internals(text)
+        show = self._text_operators(c, format_text)
+        column_x = [fp_str(x + offset + style.left_padding)
+                    for offset in self._column_offsets[:-1]]
+        baseline = style.bottom_padding + style.leading - style.font_size
+        for row_num, row in enumerate(rows):
+            row_bottom = top - (row_num + 1) * self.row_height
+            row_y = fp_str(row_bottom + baseline)
+            for cell_x, value in zip(column_x, row):
+                if value is None or value == '':
+                    continue
+                value = str(value)
+                if '\n' not in value:
+                    ops.append(f'1 0 0 1 {cell_x} {row_y} Tm {show(value)}')
+                    continue
+                # Lines go down from the one that keeps the last line on
+                # the baseline, as Table._drawCell does for VALIGN BOTTOM
+                lines = value.split('\n')
+                y = row_bottom + baseline + (len(lines) - 1) * style.leading
+                for line in lines:
+                    ops.append(f'1 0 0 1 {cell_x} {fp_str(y)} Tm {show(line)}')
+                    y -= style.leading
+        c.drawText(text)
+
+        c.setLineWidth(style.line_width)
+        c.setStrokeColorRGB(*style.line_color)
+        c.grid(
+            [x + offset for offset in self._column_offsets],
+            [top - row_num * self.row_height for row_num in range(len(rows) + 1)],
+        )
+        c.restoreState()
+        return self.row_height * len(rows)
+
+    def _text_operators(
+        self,
+        c: Any,
+        format_text: Callable[[str], str],
+    ) -> Callable[[str], str]:
+        """Return a function formatting the show-text operator of a string."""
+        # Operators name fonts by their resource in the document, so they
+        # are only reused on the same canvas
+        if self._shown_canvas is not c or len(self._shown) > TEXT_CACHE_SIZE:
+            self._shown = {}
+            self._shown_canvas = c
+        cache = self._shown
+
+        def show(value: str) -> str:
+            operator = cache.get(value)
+            if operator is None:
+                operator = cache[value] = format_text(value)
+            return operator
+
+        return show
+
+
+def _text_object_internals(text: Any) -> tuple[list[str], Callable[[str], str]]:
+    """
+    Return the operator list of a reportlab PDFTextObject and its function
+    encoding a string as a show-text operator.
+
+    Both are private to reportlab (PDFTextObject._code and _formatText),
+    and this is the only place the grid reaches into them. The public
+    textOut measures every string to advance a cursor the grid does not
+    use, which made up most of the drawing time. Writing the operators
+    directly keeps the same encoding and font subsetting.
+    """
+    return text._code, text._formatText
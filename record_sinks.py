@@ -0,0 +1,167 @@
+import csv
+import json
+import os
+from abc import ABC, abstractmethod
+from collections.abc import Iterable, Mapping, Sequence
+from typing import Any
+
+# Records written per Parquet row group, the only ones held in memory
+PARQUET_ROW_GROUP_SIZE = 10_000
+
+
+class RecordSink(ABC):
+    """
+    Writes records to a file as they arrive, without holding them in memory.
+
+    Sinks are context managers; the file is complete once the sink is
+    closed.
+    """
+
+    def __init__(self, path: str, fieldnames: Sequence[str] | None = None) -> None:
+        """
+        Args:
+            path: Output file, replaced if it exists.
+            fieldnames: Columns to write, in order. By default, the keys of
+                the first record.
+        """
+        self.path = path
+        self.fieldnames = list(fieldnames) if fieldnames is not None else None
+        self.count = 0
+
+    def write(self, record: Mapping[str, Any]) -> None:
+        """Append one record."""
+        if self.fieldnames is None:
+            self.fieldnames = list(record)
+        self._write(record)
+        self.count += 1
+
+    def write_many(self, records: Iterable[Mapping[str, Any]]) -> int:
+        """Append every record and return how many were written."""
+        written = 0
+        for record in records:
+            self.write(record)
+            written += 1
+        return written
+
+    @abstractmethod
+    def _write(self, record: Mapping[str, Any]) -> None:
+        """Write one record, self.fieldnames is set."""
+
+    @abstractmethod
+    def close(self) -> None:
+        """Finish the file."""
+
+    def __enter__(self) -> 'RecordSink':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+class CsvSink(RecordSink):
+    """Writes records as CSV rows, after a header row of the field names."""
+
+    def __init__(self, path: str, fieldnames: Sequence[str] | None = None) -> None:
+        super().__init__(path, fieldnames)
+        self._file = open(path, 'w', newline='', encoding='utf-8')
+        self._writer: csv.DictWriter[str] | None = None
+        if self.fieldnames is not None:
+            # The header is written even if no record follows
+            self._start()
+
+    def _start(self) -> 'csv.DictWriter[str]':
+        self._writer = csv.DictWriter(
+            self._file, self.fieldnames or [], extrasaction='ignore')
+        self._writer.writeheader()
+        return self._writer
+
+    def _write(self, record: Mapping[str, Any]) -> None:
+        (self._writer or self._start()).writerow(record)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class JsonlSink(RecordSink):
+    """Writes records as JSON objects, one per line."""
+
+    def __init__(self, path: str, fieldnames: Sequence[str] | None = None) -> None:
+        super().__init__(path, fieldnames)
+        self._file = open(path, 'w', encoding='utf-8')
+
+    def _write(self, record: Mapping[str, Any]) -> None:
+        row = {name: record.get(name) for name in self.fieldnames or []}
+        self._file.write(json.dumps(row, ensure_ascii=False, default=str) + '\n')
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ParquetSink(RecordSink):
+    """
+    Writes records to a Parquet file, one row group every
+    PARQUET_ROW_GROUP_SIZE records. Requires pyarrow.
+
+    Every column is a nullable string, built once from the field names,
+    so a column that is empty in one row group still has the same type
+    as in the others, and an empty export keeps its columns.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        fieldnames: Sequence[str] | None = None,
+        row_group_size: int = PARQUET_ROW_GROUP_SIZE,
+    ) -> None:
+        super().__init__(path, fieldnames)
+        self.row_group_size = row_group_size
+        self._rows: list[dict[str, Any]] = []
+        self._writer: Any = None
+        self._schema: Any = None
+
+    def _write(self, record: Mapping[str, Any]) -> None:
+        self._rows.append({
+            name: None if record.get(name) is None else str(record[name])
+            for name in self.fieldnames or []
+        })
+        if len(self._rows) >= self.row_group_size:
+            self._flush()
+
+    def _flush(self) -> None:
+        # pyarrow is only needed by this sink, so it is imported here
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self._writer is None:
+            self._schema = pa.schema(
+                [pa.field(name, pa.string()) for name in self.fieldnames or []])
+            self._writer = pq.ParquetWriter(self.path, self._schema)
+        self._writer.write_table(pa.Table.from_pylist(self._rows, schema=self._schema))
+        self._rows = []
+
+    def close(self) -> None:
+        if self._rows or self._writer is None:
+            self._flush()
+        self._writer.close()
+
+
+SINKS: dict[str, type[RecordSink]] = {
+    '.csv': CsvSink,
+    '.jsonl': JsonlSink,
+    '.ndjson': JsonlSink,
+    '.parquet': ParquetSink,
+}
+
+
+def open_sink(path: str, fieldnames: Sequence[str] | None = None) -> RecordSink:
+    """
+    Open the sink matching the extension of path.
+
+    Raises:
+        ValueError: If the extension is not one of SINKS.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in SINKS:
+        raise ValueError(
+            f"Unsupported output {path!r}, expected one of {', '.join(SINKS)}")
+    return SINKS[extension](path, fieldnames)
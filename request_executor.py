@@ -0,0 +1,303 @@
+import json
+import logging
+import random
+import threading
+import time
+from collections.abc import Callable
+from typing import Any, TypeVar
+
+from googleapiclient.errors import HttpError
+
+T = TypeVar('T')
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+# 403 is only retryable when Google reports it as a quota error
+RATE_LIMIT_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded'}
+
+# Starting rate, ceiling and burst size per API, in requests per second
+DEFAULT_LIMITS = {
+    'drive': {'rate': 50.0, 'max_rate': 200.0, 'capacity': 100.0},
+    'gmail': {'rate': 20.0, 'max_rate': 50.0, 'capacity': 100.0},
+}
+
+
+def error_status(error: Exception) -> int | None:
+    """Return the HTTP status code of an API error, if any."""
+    resp = getattr(error, 'resp', None)
+    status = getattr(resp, 'status', None)
+    return int(status) if status is not None else None
+
+
+def _error_body(error: Exception) -> dict[str, Any] | None:
+    content = getattr(error, 'content', None)
+    if not content:
+        return None
+    try:
+        if isinstance(content, bytes):
+            content = content.decode('utf-8')
+        body: dict[str, Any] = json.loads(content)['error']
+        return body if isinstance(body, dict) else None
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+def _first_error(error: Exception) -> dict[str, Any]:
+    body = _error_body(error) or {}
+    errors = body.get('errors') or [{}]
+    return errors[0] if isinstance(errors[0], dict) else {}
+
+
+def error_reason(error: Exception) -> str | None:
+    """Return the reason of the first error in an API error body, if any."""
+    reason = _first_error(error).get('reason') or (_error_body(error) or {}).get('status')
+    return str(reason) if reason else None
+
+
+def error_location(error: Exception) -> str | None:
+    """Return the parameter the first error in an API error body is about, if any."""
+    location = _first_error(error).get('location')
+    return str(location) if location else None
+
+
+def is_quota_error(error: Exception) -> bool:
+    """Whether the error means the caller is going faster than the quota."""
+    if not isinstance(error, HttpError):
+        return False
+    status = error_status(error)
+    return status == 429 or (
+        status == 403 and error_reason(error) in RATE_LIMIT_REASONS)
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether the request that raised the error can be retried as is."""
+    if isinstance(error, HttpError):
+        return (error_status(error) in RETRYABLE_STATUS_CODES
+                or is_quota_error(error))
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket whose rate adapts to quota errors (AIMD).
+
+    Every success raises the rate additively up to max_rate, every quota
+    error cuts it multiplicatively down to min_rate. The clock and sleep
+    functions are injectable so the limiter can run on a fake clock.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float | None = None,
+        min_rate: float = 1.0,
+        max_rate: float | None = None,
+        increase: float = 0.5,
+        decrease_factor: float = 0.5,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        """
+        Args:
+            rate: Initial rate in tokens per second.
+            capacity: Maximum burst size, defaults to one second of rate.
+            min_rate: Lower bound for the adapted rate.
+            max_rate: Upper bound for the adapted rate, defaults to rate.
+            increase: Tokens per second added after each success.
+            decrease_factor: Factor applied to the rate on a quota error.
+            clock: Monotonic clock returning seconds.
+            sleep: Function used to wait for tokens.
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self.min_rate = min_rate
+        self.max_rate = max_rate if max_rate is not None else rate
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.capacity
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """
+        Take tokens from the bucket, waiting until they are available.
+
+        Args:
+            tokens: Number of tokens to take, capped at the capacity.
+
+        Returns:
+            Seconds spent waiting.
+        """
+        tokens = min(tokens, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                # Tolerate float rounding, or a sleep too short to move
+                # the clock would never satisfy the request
+                if self._tokens >= tokens - 1e-9:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            # Sleep without the lock, so other callers and the rate
+            # updates are not blocked for the whole wait
+            self._sleep(delay)
+            waited += delay
+
+    def on_success(self) -> None:
+        """Additively increase the rate after a successful request."""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_quota_error(self) -> None:
+        """Multiplicatively decrease the rate after a quota error."""
+        with self._lock:
+            self._refill()
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+            self._tokens = min(self._tokens, self.rate)
+
+    def _refill(self) -> None:
+        now = self._clock()
+        elapsed = max(0.0, now - self._updated_at)
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated_at = now
+
+
+class RequestExecutor:
+    """
+    Execute Google API requests through a rate limiter, retrying retryable
+    errors with exponential backoff and full jitter.
+
+    Errors that are not retryable, or still failing after max_retries,
+    are raised to the caller instead of being swallowed.
+    """
+
+    def __init__(
+        self,
+        limiter: TokenBucket | None = None,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 64.0,
+        sleep: Callable[[float], None] = time.sleep,
+        jitter: Callable[[], float] = random.random,
+    ) -> None:
+        """
+        Args:
+            limiter: Token bucket shared by every request, if any.
+            max_retries: Retries allowed after the first attempt.
+            base_delay: Backoff delay of the first retry, in seconds.
+            max_delay: Upper bound for a single backoff delay.
+            sleep: Function used to wait between attempts.
+            jitter: Function returning a float in [0, 1).
+        """
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._sleep = sleep
+        self._jitter = jitter
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Return the jittered delay before retry number attempt (from 0)."""
+        ceiling = min(self.max_delay, self.base_delay * 2 ** attempt)
+        return self._jitter() * ceiling
+
+    def record(self, error: Exception | None) -> None:
+        """Feed the outcome of a request executed elsewhere to the limiter."""
+        if self.limiter is None:
+            return
+        if error is None:
+            self.limiter.on_success()
+        elif is_quota_error(error):
+            self.limiter.on_quota_error()
+
+    def call(self, function: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """
+        Call function with retries and rate limiting.
+
+        Args:
+            function: Callable performing one API round-trip.
+
+        Returns:
+            Whatever function returns.
+
+        Raises:
+            HttpError: If the error is not retryable or retries ran out.
+        """
+        return self._run(lambda: function(*args, **kwargs), 1.0)
+
+    def execute(self, request: Any, tokens: float = 1.0) -> Any:
+        """
+        Execute an API request object with retries and rate limiting.
+
+        Args:
+            request: Request object exposing execute().
+            tokens: Quota cost, e.g. the sub-request count of a batch.
+        """
+        return self._run(request.execute, tokens)
+
+    def execute_batch(self, batch: Any, size: int) -> Any:
+        """
+        Execute a batch request with retries and rate limiting.
+
+        Only envelope errors are fed to the limiter: the batch callback
+        records the outcome of every sub-request, so a successful envelope
+        is not counted on top of them.
+
+        Args:
+            batch: BatchHttpRequest whose callback calls record.
+            size: Number of sub-requests, the quota cost of the batch.
+        """
+        return self._run(batch.execute, size, record_success=False)
+
+    def _run(self, function: Callable[[], T], tokens: float, record_success: bool = True) -> T:
+        attempt = 0
+        while True:
+            if self.limiter is not None:
+                self.limiter.acquire(tokens)
+            try:
+                result = function()
+            except Exception as error:
+                self.record(error)
+                if not is_retryable(error) or attempt >= self.max_retries:
+                    raise
+                delay = self.backoff_delay(attempt)
+                logging.warning(
+                    f'Retryable error ({error_status(error)}, '
+                    f'{error_reason(error)}), retry {attempt + 1}/'
+                    f'{self.max_retries} in {delay:.2f}s: {error}')
+                self._sleep(delay)
+                attempt += 1
+            else:
+                if record_success:
+                    self.record(None)
+                return result
+
+
+_executors: dict[str, RequestExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(api: str) -> RequestExecutor:
+    """
+    Return the executor shared by every caller of the given API.
+
+    Args:
+        api: API name, e.g. 'drive' or 'gmail'.
+    """
+    with _executors_lock:
+        if api not in _executors:
+            limits = DEFAULT_LIMITS.get(api, DEFAULT_LIMITS['drive'])
+            _executors[api] = RequestExecutor(TokenBucket(
+                rate=limits['rate'],
+                capacity=limits['capacity'],
+                max_rate=limits['max_rate'],
+            ))
+        return _executors[api]
+
+
+def set_executor(api: str, executor: RequestExecutor) -> None:
+    """Replace the shared executor of an API, e.g. with a fake clock."""
+    with _executors_lock:
+        _executors[api] = executor
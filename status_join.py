@@ -0,0 +1,98 @@
+from collections.abc import Iterable, Mapping
+from typing import Any
+
+from customer_names import normalize_name
+from name_index import DEFAULT_LIMIT, DEFAULT_MIN_SCORE, NameIndex
+
+NAME_FIELD = 'Fullname'
+
+
+def index_statuses(
+    statuses: Iterable[Mapping[str, Any]],
+) -> dict[str, Mapping[str, Any]]:
+    """
+    Index status entries by normalized customer name.
+
+    When two entries share a name, the one with the latest batch_date
+    wins, as in the trackers; without dates, the first one is kept.
+    """
+    index: dict[str, Mapping[str, Any]] = {}
+    for entry in statuses:
+        key = normalize_name(str(entry.get('customer') or ''))
+        if not key:
+            continue
+        current = index.get(key)
+        if current is None or (
+                entry.get('batch_date') and current.get('batch_date')
+                and entry['batch_date'] > current['batch_date']):
+            index[key] = entry
+    return index
+
+
+def join_customer_statuses(
+    records: Iterable[Mapping[str, Any]],
+    statuses: Iterable[Mapping[str, Any]],
+    name_field: str = NAME_FIELD,
+    fuzzy: bool = False,
+    min_score: float = DEFAULT_MIN_SCORE,
+    limit: int = DEFAULT_LIMIT,
+) -> dict[str, list[Any]]:
+    """
+    Match customer records to their application status by name.
+
+    The statuses are indexed once and every record is looked up in the
+    index, so the join is linear in the size of both sides. With fuzzy,
+    records without an exact match are looked up in a NameIndex of the
+    statuses, which tolerates typos, accents and word order.
+
+    Args:
+        records: Rows of parse_customer_information, e.g. from
+            iter_customer_information.
+        statuses: Entries of get_application_statuses.
+        name_field: Record field holding the customer name.
+        fuzzy: Whether to look up records without an exact match.
+        min_score: Lowest fuzzy score accepted, between 0 and 1.
+        limit: Maximum number of fuzzy matches per record.
+
+    Returns:
+        'matched': (record, status entry) pairs, in records order.
+        'fuzzy_matched': (record, [(score, status entry), ...]) of the
+            records matched by fuzzy, best match first.
+        'unmatched_records': Records without a status.
+        'unmatched_statuses': Status entries no record matched, exactly
+            or as best fuzzy match, in the order of statuses.
+    """
+    index = index_statuses(statuses)
+    fuzzy_index: NameIndex | None = None
+    matched: list[tuple[Mapping[str, Any], Mapping[str, Any]]] = []
+    fuzzy_matched: list[tuple[Mapping[str, Any], list[Any]]] = []
+    unmatched_records: list[Mapping[str, Any]] = []
+    matched_keys: set[str] = set()
+    for record in records:
+        name = str(record.get(name_field) or '')
+        key = normalize_name(name)
+        entry = index.get(key) if key else None
+        if entry is not None:
+            matched.append((record, entry))
+            matched_keys.add(key)
+            continue
+
+        if fuzzy:
+            if fuzzy_index is None:
+                fuzzy_index = NameIndex(index.values())
+            candidates = fuzzy_index.search(name, limit, min_score)
+            if candidates:
+                fuzzy_matched.append((record, candidates))
+                matched_keys.add(
+                    normalize_name(str(candidates[0][1].get('customer') or '')))
+                continue
+        unmatched_records.append(record)
+
+    return {
+        'matched': matched,
+        'fuzzy_matched': fuzzy_matched,
+        'unmatched_records': unmatched_records,
+        'unmatched_statuses': [
+            entry for key, entry in index.items() if key not in matched_keys
+        ],
+    }
@@ -0,0 +1,264 @@
+import bisect
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+from flask import Flask, abort, jsonify, request
+
+from api_metrics import ApiMetrics
+from customer_names import normalize_name
+from folder_listing_cache import FolderListingCache
+from google_clients import build_service, get_credentials
+from track_drive_folder_statuses import (
+    DEFAULT_MAX_WORKERS,
+    get_application_statuses_concurrent,
+)
+
+DEFAULT_REFRESH_INTERVAL = 15 * 60
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+class StatusStore:
+    """
+    In-memory customer -> status index refreshed on a background thread.
+
+    Every refresh builds a new index and swaps it in with a single
+    assignment, so lookups never block on a crawl and always see a
+    consistent snapshot. A failed refresh keeps serving the previous one.
+    """
+
+    def __init__(
+        self,
+        fetch_statuses: Callable[[], list[dict[str, Any]]],
+        refresh_interval: float = DEFAULT_REFRESH_INTERVAL,
+    ) -> None:
+        """
+        Args:
+            fetch_statuses: Function returning the output of
+                get_application_statuses.
+            refresh_interval: Seconds between background refreshes.
+        """
+        self.fetch_statuses = fetch_statuses
+        self.refresh_interval = refresh_interval
+        self.last_refresh: float | None = None
+        self.last_error: str | None = None
+        self._index: dict[str, Any] = _build_index([])
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def refresh(self) -> None:
+        """Crawl Drive and swap in a fresh index."""
+        with self._refresh_lock:
+            self._refresh()
+
+    def trigger_refresh(self) -> bool:
+        """
+        Start a refresh on a new thread unless one is already running.
+
+        Returns:
+            Whether a refresh was started.
+        """
+        if not self._refresh_lock.acquire(blocking=False):
+            return False
+
+        def run() -> None:
+            try:
+                self._refresh()
+            finally:
+                self._refresh_lock.release()
+
+        threading.Thread(target=run, name='status-refresh-now', daemon=True).start()
+        return True
+
+    def _refresh(self) -> None:
+        start_time = time.time()
+        try:
+            statuses = self.fetch_statuses()
+        except Exception as error:
+            logging.error(f'Status refresh failed: {error}', exc_info=True)
+            self.last_error = str(error)
+            return
+        self._index = _build_index(statuses)
+        self.last_refresh = time.time()
+        self.last_error = None
+        logging.info(
+            f'Refreshed {len(statuses)} statuses in '
+            f'{self.last_refresh - start_time:.1f}s.')
+
+    def start(self) -> None:
+        """Load the index once, then keep refreshing it in the background."""
+        self.refresh()
+        self._thread = threading.Thread(
+            target=self._refresh_loop, name='status-refresh', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background refresh and wait for a running one."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        # A refresh started by trigger_refresh holds the lock until it ends
+        with self._refresh_lock:
+            pass
+
+    def get(self, customer: str) -> dict[str, Any] | None:
+        """Return the status entry of one customer, if known."""
+        entry: dict[str, Any] | None = self._index['by_name'].get(
+            normalize_name(customer))
+        return entry
+
+    def search(
+        self,
+        prefix: str = '',
+        status: str | None = None,
+        limit: int = DEFAULT_LIMIT,
+    ) -> list[dict[str, Any]]:
+        """
+        Return entries whose customer name starts with prefix.
+
+        Args:
+            prefix: Customer name prefix, empty for every customer.
+            status: Only return entries with this status.
+            limit: Maximum number of entries.
+        """
+        index = self._index
+        names = index['names_by_status'].get(status.lower(), []) \
+            if status else index['names']
+        prefix = normalize_name(prefix)
+        results: list[dict[str, Any]] = []
+        position = bisect.bisect_left(names, prefix)
+        while position < len(names) and len(results) < limit:
+            name = names[position]
+            if not name.startswith(prefix):
+                break
+            results.append(index['by_name'][name])
+            position += 1
+        return results
+
+    def health(self) -> dict[str, Any]:
+        """Return the freshness of the index."""
+        return {
+            'customers': len(self._index['by_name']),
+            'last_refresh': self.last_refresh,
+            'last_error': self.last_error,
+        }
+
+    def _refresh_loop(self) -> None:
+        while not self._stop.wait(self.refresh_interval):
+            self.refresh()
+
+
+def _build_index(statuses: list[dict[str, Any]]) -> dict[str, Any]:
+    by_name = {}
+    for entry in statuses:
+        entry = dict(entry)
+        if hasattr(entry.get('batch_date'), 'isoformat'):
+            entry['batch_date'] = entry['batch_date'].isoformat()
+        by_name[normalize_name(entry['customer'])] = entry
+
+    names = sorted(by_name)
+    names_by_status: dict[str, list[str]] = {}
+    for name in names:
+        names_by_status.setdefault(
+            str(by_name[name]['status']).lower(), []).append(name)
+
+    return {
+        'by_name': by_name,
+        'names': names,
+        'names_by_status': names_by_status,
+    }
+
+
+def create_app(store: StatusStore) -> Flask:
+    """
+    Build the Flask app serving lookups from the store.
+
+    Args:
+        store: Started StatusStore.
+    """
+    app = Flask(__name__)
+
+    @app.get('/health')
+    def health() -> Any:
+        return jsonify(store.health())
+
+    @app.get('/customers/<path:customer>')
+    def get_customer(customer: str) -> Any:
+        entry = store.get(customer)
+        if entry is None:
+            abort(404, description=f'Unknown customer {customer}.')
+        return jsonify(entry)
+
+    @app.get('/customers')
+    def search_customers() -> Any:
+        limit = min(
+            request.args.get('limit', DEFAULT_LIMIT, type=int), MAX_LIMIT)
+        return jsonify(store.search(
+            prefix=request.args.get('prefix', ''),
+            status=request.args.get('status'),
+            limit=limit,
+        ))
+
+    @app.post('/refresh')
+    def refresh() -> Any:
+        # At most one crawl runs at a time, however many refreshes are posted
+        if not store.trigger_refresh():
+            return jsonify({
+                'refreshing': False,
+                'error': 'A refresh is already running.',
+            }), 409
+        return jsonify({'refreshing': True}), 202
+
+    return app
+
+
+def main() -> None:
+    """Start the status service on STATUS_SERVICE_PORT."""
+    creds = get_credentials()
+    metrics = ApiMetrics.from_env()
+    folder_ids = [
+        '1U7p8_7PFjBCVUPwEiDJhmkjMQ7DmJv__',
+        '1Fct5I9sXVklIx1KB-gVKnbmiN-657E74',
+        '1L70ZQBvWzarM0SH23upvqzKm0MhFjbJO',
+    ]
+    cache_path = os.environ.get('FOLDER_CACHE_PATH')
+    cache = FolderListingCache(cache_path) if cache_path else None
+    max_workers = int(os.environ.get(
+        'STATUS_MAX_WORKERS', DEFAULT_MAX_WORKERS))
+
+    def fetch_statuses() -> list[dict[str, Any]]:
+        statuses: list[dict[str, Any]] = get_application_statuses_concurrent(
+            lambda: build_service('drive', 'v3', creds, metrics),
+            folder_ids,
+            max_workers,
+            cache,
+        )
+        return statuses
+
+    store = StatusStore(
+        fetch_statuses,
+        refresh_interval=float(os.environ.get(
+            'STATUS_REFRESH_INTERVAL', DEFAULT_REFRESH_INTERVAL)),
+    )
+    store.start()
+    app = create_app(store)
+    try:
+        app.run(
+            host=os.environ.get('STATUS_SERVICE_HOST', '127.0.0.1'),
+            port=int(os.environ.get('STATUS_SERVICE_PORT', '8080')),
+        )
+    finally:
+        # Let a running crawl finish before the cache it uses is closed
+        store.stop()
+        if cache is not None:
+            cache.log_stats()
+            cache.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+import pytest
+
+from form_templates import TEMPLATE_NAMES
+from request_executor import RequestExecutor, set_executor
+
+
+@pytest.fixture(autouse=True)
+def unlimited_executors():
+    """The fake services have no quota, so only keep the retry policy."""
+    for api in ('drive', 'gmail'):
+        set_executor(api, RequestExecutor(limiter=None))
+
+
+class CountingLimiter:
+    """Limiter recording the outcomes the executor feeds it."""
+
+    def __init__(self):
+        self.successes = 0
+        self.quota_errors = 0
+
+    def acquire(self, tokens=1.0):
+        pass
+
+    def on_success(self):
+        self.successes += 1
+
+    def on_quota_error(self):
+        self.quota_errors += 1
+
+
+@pytest.fixture
+def counting_limiter():
+    """Install an executor that counts outcomes and retries twice without waiting."""
+    def install(api):
+        limiter = CountingLimiter()
+        set_executor(api, RequestExecutor(limiter, max_retries=2, base_delay=0.0))
+        return limiter
+    return install
+
+
+def write_template(path, pages=2):
+    """Write a blank template PDF with a title on every page."""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    c = canvas.Canvas(str(path), pagesize=A4)
+    for page in range(pages):
+        c.drawString(72, A4[1] - 72, f'Template page {page + 1}')
+        c.showPage()
+    c.save()
+
+
+@pytest.fixture
+def template_dir(tmp_path):
+    """Directory holding a template PDF for every form type."""
+    directory = tmp_path / 'templates'
+    directory.mkdir()
+    for name in TEMPLATE_NAMES.values():
+        write_template(directory / f'{name}.pdf')
+    return directory
@@ -0,0 +1,80 @@
+import io
+
+import pytest
+from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaInMemoryUpload, MediaIoBaseDownload
+
+from api_metrics import ApiMetrics, instrument
+from benchmarks.fake_google import FOLDER_MIME_TYPE, FakeDriveService
+
+
+@pytest.fixture
+def drive():
+    drive = FakeDriveService()
+    folder_id = drive.add_file('batch', 'root', FOLDER_MIME_TYPE)
+    drive.add_file('John Doe.pdf', folder_id, content=b'%PDF-1.4 john')
+    return drive
+
+
+def test_requests_are_counted_per_method_and_status(drive):
+    metrics = ApiMetrics()
+    service = instrument(drive, metrics)
+
+    service.files().list(q="'root' in parents").execute()
+    service.files().list(q="'root' in parents").execute()
+    with pytest.raises(HttpError):
+        service.files().get(fileId='missing').execute()
+
+    methods = metrics.summary()['methods']
+    assert methods['files.list']['count'] == 2
+    assert methods['files.list']['response_bytes'] > 0
+    assert methods['files.list']['latency_s']['mean'] is not None
+    assert methods['files.get']['errors'] == {'404': 1}
+    assert 'google_api_errors_total{method="files.get",code="404"} 1' in metrics.to_prometheus()
+
+
+def test_batch_sub_requests_are_counted_under_their_method(drive):
+    metrics = ApiMetrics()
+    service = instrument(drive, metrics)
+    responses = {}
+
+    batch = service.new_batch_http_request(
+        callback=lambda request_id, response, error: responses.update({request_id: error}))
+    batch.add(service.files().list(q="'root' in parents"))
+    batch.add(service.files().get(fileId='missing'))
+    batch.execute()
+
+    methods = metrics.summary()['methods']
+    assert sorted(methods) == ['batch', 'files.get', 'files.list']
+    assert methods['batch']['count'] == 1
+    # Sub-requests share the envelope's latency
+    assert methods['files.list']['latency_s']['max'] == 0
+    assert methods['files.get']['errors'] == {'404': 1}
+    # The caller's callback still sees every sub-request, under the usual ids
+    assert responses['1'] is None and responses['2'] is not None
+
+
+def test_uploads_and_downloads_are_timed_per_chunk(drive):
+    metrics = ApiMetrics()
+    service = instrument(drive, metrics)
+
+    media = MediaInMemoryUpload(b'x' * (600 * 1024), chunksize=256 * 1024, resumable=True)
+    request = service.files().create(body={'name': 'big.pdf', 'parents': ['root']}, media_body=media)
+    response = None
+    while response is None:
+        _, response = request.next_chunk()
+
+    download = MediaIoBaseDownload(
+        io.BytesIO(), service.files().get_media(fileId=response['id']), chunksize=256 * 1024)
+    done = False
+    while not done:
+        _, done = download.next_chunk()
+
+    methods = metrics.summary()['methods']
+    assert methods['files.create']['count'] == 3
+    assert methods['files.get_media']['count'] == 3
+    assert methods['files.get_media']['response_bytes'] == 600 * 1024
+
+
+def test_instrument_without_metrics_returns_the_service(drive):
+    assert instrument(drive, None) is drive
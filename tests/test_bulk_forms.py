@@ -0,0 +1,24 @@
+import os
+
+from bulk_forms import generate_forms_bulk
+
+RECORDS = [
+    {'Fullname': 'John Doe', 'CASA_Account_No': '0123', 'ID_No.': 'AA000001'},
+    {'Fullname': 'Maria Garcia', 'CASA_Account_No': '0456', 'ID_No.': 'AA000002'},
+]
+
+
+def test_summary_lists_only_the_forms_of_this_run(tmp_path, template_dir):
+    output = tmp_path / 'forms'
+    output.mkdir()
+    stale = output / '00000-OLD_CUSTOMER-Closing-Bank-Account.pdf'
+    stale.write_bytes(b'%PDF-1.4 stale')
+
+    summary = generate_forms_bulk(
+        RECORDS, str(output), str(template_dir), max_workers=1)
+
+    assert summary['customers'] == 2
+    assert summary['failures'] == []
+    assert len(summary['paths']) == summary['forms'] == 4
+    assert str(stale) not in summary['paths']
+    assert all(os.path.exists(path) for path in summary['paths'])
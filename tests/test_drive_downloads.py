@@ -0,0 +1,67 @@
+import hashlib
+import os
+
+import pytest
+
+from benchmarks.fake_google import FakeDriveService
+from drive_downloads import ContentCache, DownloadManager
+
+
+def md5(content):
+    return hashlib.md5(content).hexdigest()
+
+
+def test_cache_evicts_the_least_recently_used_by_mtime(tmp_path):
+    cache = ContentCache(str(tmp_path), max_bytes=25)
+    for index, name in enumerate(['a', 'b']):
+        cache.put(name, name.encode() * 10)
+        os.utime(tmp_path / name, (1000 + index, 1000 + index))
+
+    # Reading a makes b the least recently used
+    assert cache.get('a') == b'a' * 10
+    cache.put('c', b'c' * 10)
+
+    assert sorted(os.listdir(tmp_path)) == ['a', 'c']
+    assert cache.get('b') is None
+    assert cache.stats()['evictions'] == 1
+    # A new instance picks up the entries left on disk
+    assert ContentCache(str(tmp_path)).stats()['entries'] == 2
+
+
+@pytest.fixture
+def drive():
+    drive = FakeDriveService()
+    drive.add_file('passport.jpg', 'root', content=b'front page', file_id='passport')
+    return drive
+
+
+def test_unchanged_files_are_served_from_the_cache(tmp_path, drive):
+    downloads = DownloadManager(lambda: drive, ContentCache(str(tmp_path)))
+
+    assert downloads.download_file('passport') == b'front page'
+    assert downloads.download(['passport'], {'passport': md5(b'front page')}) == {
+        'passport': b'front page'}
+
+    assert drive.backend.calls['drive.files.get_media'] == 1
+    assert drive.backend.calls['drive.files.get'] == 1
+
+
+def test_changed_files_are_downloaded_again(tmp_path, drive):
+    downloads = DownloadManager(lambda: drive, ContentCache(str(tmp_path)))
+    downloads.download_file('passport')
+
+    drive.media['passport'] = b'new front page'
+    drive.metadata['passport']['md5Checksum'] = md5(b'new front page')
+
+    assert downloads.download_file('passport') == b'new front page'
+    assert drive.backend.calls['drive.files.get_media'] == 2
+
+
+def test_checksum_mismatch_raises_and_is_not_cached(tmp_path, drive):
+    cache = ContentCache(str(tmp_path))
+    downloads = DownloadManager(lambda: drive, cache)
+
+    with pytest.raises(ValueError):
+        downloads.download_file('passport', md5(b'something else'))
+
+    assert cache.stats()['entries'] == 0
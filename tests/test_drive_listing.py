@@ -0,0 +1,52 @@
+from benchmarks.fake_google import FOLDER_MIME_TYPE, FakeDriveService
+from drive_listing import build_parent_queries, get_files, get_files_multi_parent
+
+
+def test_parent_queries_stay_under_the_length_limit():
+    parent_ids = [f'folder-{index:04d}' for index in range(200)]
+
+    queries = build_parent_queries(parent_ids + parent_ids[:10], max_query_length=500)
+
+    assert [parent_id for chunk, _ in queries for parent_id in chunk] == parent_ids
+    assert all(len(query) <= 500 for _, query in queries)
+    assert len(queries) > 1
+    for chunk, query in queries:
+        assert query == '(' + ' or '.join(
+            f"'{parent_id}' in parents" for parent_id in chunk) + ') and trashed=false'
+
+
+def test_parent_queries_respect_max_parents_per_query():
+    parent_ids = [f'folder-{index}' for index in range(10)]
+
+    queries = build_parent_queries(parent_ids, max_parents_per_query=3)
+
+    assert [chunk for chunk, _ in queries] == [
+        parent_ids[0:3], parent_ids[3:6], parent_ids[6:9], parent_ids[9:]]
+
+
+def test_multi_parent_listing_matches_one_query_per_folder():
+    drive = FakeDriveService()
+    folder_ids = [
+        drive.add_file(f'batch {index}', 'root', FOLDER_MIME_TYPE)
+        for index in range(30)
+    ]
+    for index, folder_id in enumerate(folder_ids):
+        for file in range(index % 4):
+            drive.add_file(f'Customer {index}-{file}.pdf', folder_id)
+    # A file in two listed folders, and one also in a folder that is not listed
+    shared = drive.add_file('Shared.pdf', folder_ids[1])
+    drive.add_parent(shared, folder_ids[25])
+    elsewhere = drive.add_file('Elsewhere.pdf', folder_ids[2])
+    drive.add_parent(elsewhere, 'root')
+    drive.trash_file(drive.add_file('Trashed.pdf', folder_ids[3]))
+    fields = 'nextPageToken, files(id, name, parents)'
+
+    files_by_parent = get_files_multi_parent(
+        drive, folder_ids, fields, max_query_length=300)
+    # One request per chunk, every chunk fits in a page
+    assert drive.backend.calls['drive.files.list'] == len(
+        build_parent_queries(folder_ids, max_query_length=300)) > 1
+
+    assert files_by_parent == {
+        folder_id: get_files(drive, folder_id, fields) for folder_id in folder_ids
+    }
@@ -0,0 +1,57 @@
+import pytest
+
+from benchmarks.fake_google import FOLDER_MIME_TYPE, FakeDriveService
+from drive_uploads import UploadManager
+
+
+def write_forms(directory, count):
+    paths = []
+    for index in range(count):
+        path = directory / f'form-{index}.pdf'
+        path.write_bytes(f'%PDF-1.4 form {index}'.encode())
+        paths.append(str(path))
+    return paths
+
+
+def test_shared_listing_is_read_once_and_kept_up_to_date(tmp_path):
+    drive = FakeDriveService()
+    folder_id = drive.add_file('forms', 'root', FOLDER_MIME_TYPE)
+    paths = write_forms(tmp_path, 4)
+
+    with UploadManager(lambda: drive, max_workers=2) as uploads:
+        existing = uploads.list_folder(folder_id)
+        first = uploads.upload(folder_id, paths[:2], progress=None, existing=existing)
+        second = uploads.upload(folder_id, paths, progress=None, existing=existing)
+
+    assert first['uploaded'] == 2
+    assert (second['uploaded'], second['skipped']) == (2, 2)
+    assert drive.backend.calls['drive.files.list'] == 1
+    assert sorted(existing) == [f'form-{index}.pdf' for index in range(4)]
+
+
+def test_failed_uploads_are_reported(tmp_path):
+    drive = FakeDriveService()
+    folder_id = drive.add_file('forms', 'root', FOLDER_MIME_TYPE)
+    paths = write_forms(tmp_path, 1) + [str(tmp_path / 'missing.pdf')]
+
+    with UploadManager(lambda: drive) as uploads:
+        summary = uploads.upload(folder_id, paths, progress=None)
+
+    assert (summary['uploaded'], summary['failed']) == (1, 1)
+    assert summary['failures'][0]['path'] == paths[1]
+
+
+def test_paths_sharing_a_name_are_rejected(tmp_path):
+    drive = FakeDriveService()
+    folder_id = drive.add_file('forms', 'root', FOLDER_MIME_TYPE)
+    (tmp_path / 'other').mkdir()
+    paths = write_forms(tmp_path, 1) + write_forms(tmp_path / 'other', 1)
+
+    with UploadManager(lambda: drive) as uploads:
+        with pytest.raises(ValueError):
+            uploads.upload(folder_id, paths, progress=None)
+        # The same path twice is uploaded once
+        summary = uploads.upload(folder_id, paths[:1] * 2, progress=None)
+
+    assert (summary['total'], summary['uploaded']) == (1, 1)
+    assert drive.backend.calls['drive.files.create'] == 1
@@ -0,0 +1,65 @@
+import sqlite3
+
+from folder_listing_cache import FolderListingCache
+
+CHILDREN = [{'id': 'file', 'name': 'John Doe.pdf'}]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def accessed_at(path, folder_id):
+    with sqlite3.connect(path) as connection:
+        return connection.execute(
+            'SELECT accessed_at FROM listings WHERE folder_id = ?', (folder_id,),
+        ).fetchone()[0]
+
+
+def test_hits_write_their_access_time_once_per_flush(tmp_path):
+    path = str(tmp_path / 'listings.db')
+    clock = FakeClock()
+    cache = FolderListingCache(path, clock=clock)
+    cache.put('batch', '2024-01-01T00:00:00Z', CHILDREN)
+
+    clock.now += 10
+    assert cache.get('batch', '2024-01-01T00:00:00Z') == CHILDREN
+    assert accessed_at(path, 'batch') == 1000.0
+    cache.flush()
+    assert accessed_at(path, 'batch') == 1010.0
+
+    assert cache.get('batch', '2024-02-01T00:00:00Z') is None
+    assert cache.stats()['hits'] == 1 and cache.stats()['stale'] == 1
+    cache.close()
+
+
+def test_put_evicts_once_the_interval_has_passed():
+    clock = FakeClock()
+    cache = FolderListingCache(
+        ':memory:', max_entries=2, max_age_seconds=500,
+        evict_interval_seconds=100, clock=clock)
+    for index in range(3):
+        clock.now += 1
+        cache.put(f'batch-{index}', 'modified', CHILDREN)
+    assert cache.stats()['entries'] == 3
+
+    # batch-0 is read last, so batch-1 is the least recently used
+    clock.now += 1
+    cache.get('batch-0', 'modified')
+    clock.now += 100
+    cache.put('batch-3', 'modified', CHILDREN)
+
+    assert cache.stats()['evictions'] == 2
+    assert cache.get('batch-0', 'modified') == CHILDREN
+    assert cache.get('batch-1', 'modified') is None
+    assert cache.get('batch-3', 'modified') == CHILDREN
+
+    # Entries past max_age_seconds go at the next eviction
+    clock.now += 1000
+    cache.put('batch-4', 'modified', CHILDREN)
+    assert cache.stats()['entries'] == 1
+    cache.close()
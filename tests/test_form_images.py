@@ -0,0 +1,34 @@
+import io
+
+import pytest
+from PIL import Image
+
+from form_images import downsample_image
+
+
+def encode(size, format, mode='RGB'):
+    buffer = io.BytesIO()
+    Image.new(mode, size, (200, 40, 40) if mode == 'RGB' else (200, 40, 40, 128)).save(
+        buffer, format=format)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize('format, mode', [('JPEG', 'RGB'), ('PNG', 'RGBA')])
+def test_large_images_are_scaled_to_the_printed_size(format, mode):
+    # 2 inches at 150 dpi is 300 pixels wide
+    jpeg, width, height = downsample_image(encode((3000, 2000), format, mode), 144)
+
+    assert (width, height) == (300, 200)
+    with Image.open(io.BytesIO(jpeg)) as img:
+        assert (img.format, img.mode, img.size) == ('JPEG', 'RGB', (300, 200))
+
+
+def test_small_images_are_not_scaled_up(tmp_path):
+    path = tmp_path / 'small.png'
+    path.write_bytes(encode((100, 50), 'PNG'))
+
+    jpeg, width, height = downsample_image(str(path), 144)
+
+    assert (width, height) == (100, 50)
+    with Image.open(io.BytesIO(jpeg)) as img:
+        assert (img.format, img.size) == ('JPEG', (100, 50))
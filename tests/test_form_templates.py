@@ -0,0 +1,20 @@
+import io
+
+from PyPDF2 import PdfReader
+
+from form_templates import load_template
+
+
+def test_fill_stamps_the_values_over_the_template(template_dir):
+    path = template_dir / 'Closing-Bank-Account.pdf'
+    output = io.BytesIO()
+
+    load_template(str(path), 'closing_account').fill(
+        {'account_name': 'John Doe', 'account_number': 'ES12 3456'}, output)
+
+    reader = PdfReader(io.BytesIO(output.getvalue()))
+    assert len(reader.pages) == 2
+    text = reader.pages[0].extract_text()
+    assert 'Template page 1' in text
+    assert 'JOHN DOE' in text
+    assert 'ES12 3456' in text
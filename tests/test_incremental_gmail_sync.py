@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+
+from benchmarks.fake_google import FakeGmailService, build_mailbox
+from incremental_gmail_sync import IncrementalMessageSync
+from list_gmail_messages import iter_messages
+
+QUERY = 'from:idealista'
+
+
+def sync(gmail, store_path):
+    syncer = IncrementalMessageSync(gmail, QUERY, str(store_path))
+    syncer.sync()
+    return list(syncer.iter_records())
+
+
+def record_searches(gmail, monkeypatch):
+    queries = []
+    search = gmail.search
+
+    def recording_search(q):
+        queries.append(q)
+        return search(q)
+    monkeypatch.setattr(gmail, 'search', recording_search)
+    return queries
+
+
+def test_full_sync_matches_a_fresh_listing(tmp_path):
+    gmail = FakeGmailService()
+    build_mailbox(gmail, messages=200)
+
+    records = sync(gmail, tmp_path / 'messages.json')
+
+    assert records == list(iter_messages(gmail, QUERY))
+    assert gmail.backend.calls['gmail.users.history.list'] == 0
+
+
+def test_history_sync_applies_adds_and_deletes(tmp_path, monkeypatch):
+    gmail = FakeGmailService()
+    build_mailbox(gmail, messages=200)
+    store_path = tmp_path / 'messages.json'
+    stored = sync(gmail, store_path)
+
+    now = datetime.now()
+    gmail.add_message('alerts@idealista.com', 'New flat', now)
+    gmail.add_message('news@example.com', 'Newsletter', now)
+    gmail.delete_message(stored[0]['Message ID'])
+    gmail.delete_message(stored[-1]['Message ID'])
+    gmail.backend.reset()
+    queries = record_searches(gmail, monkeypatch)
+
+    records = sync(gmail, store_path)
+
+    # Only the new mail is listed to check it against the query
+    assert len(queries) == 1 and 'after:' in queries[0]
+    assert gmail.backend.calls['gmail.users.getProfile'] == 0
+    assert records == list(iter_messages(gmail, QUERY))
+    assert records[0]['Subject'] == 'New flat'
+
+
+def test_old_added_message_is_checked_without_relisting(tmp_path, monkeypatch):
+    gmail = FakeGmailService()
+    build_mailbox(gmail, messages=200)
+    store_path = tmp_path / 'messages.json'
+    sync(gmail, store_path)
+
+    # Imported or restored mail keeps the date it was first received
+    received = datetime(2024, 1, 1) + timedelta(minutes=30, seconds=30)
+    gmail.add_message('alerts@idealista.com', 'Old flat', received)
+    gmail.add_message('bank@example.com', 'Old statement', received)
+    queries = record_searches(gmail, monkeypatch)
+
+    records = sync(gmail, store_path)
+
+    seconds = int(received.timestamp())
+    assert queries == [f'({QUERY}) after:{seconds - 1} before:{seconds + 1}']
+    assert len(gmail.search(queries[0])) == 1
+    assert records == list(iter_messages(gmail, QUERY))
+    # The message lands at its date among the stored mail, not on top
+    dates = [int(gmail.messages[record['Message ID']]['internalDate']) for record in records]
+    position = [record['Subject'] for record in records].index('Old flat')
+    assert 0 < position < len(records) - 1
+    assert dates == sorted(dates, reverse=True)
+
+
+def test_expired_history_falls_back_to_a_full_sync(tmp_path):
+    gmail = FakeGmailService()
+    build_mailbox(gmail, messages=200)
+    store_path = tmp_path / 'messages.json'
+    stored = sync(gmail, store_path)
+
+    gmail.delete_message(stored[0]['Message ID'])
+    gmail.add_message('alerts@idealista.com', 'New flat', datetime.now())
+    gmail.expire_history()
+    gmail.backend.reset()
+
+    records = sync(gmail, store_path)
+
+    assert records == list(iter_messages(gmail, QUERY))
+    assert gmail.backend.calls['gmail.users.getProfile'] == 1
+    # The next sync reads the history again from the new ID
+    gmail.add_message('alerts@idealista.com', 'Newer flat', datetime.now())
+    assert sync(gmail, store_path)[0]['Subject'] == 'Newer flat'
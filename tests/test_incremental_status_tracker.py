@@ -0,0 +1,147 @@
+import json
+from datetime import datetime
+
+import pytest
+from googleapiclient.errors import HttpError
+
+import incremental_status_tracker
+from benchmarks.fake_google import FOLDER_MIME_TYPE, FakeDriveService
+from incremental_status_tracker import IncrementalStatusTracker
+from track_drive_folder_statuses import get_application_statuses_incremental
+
+
+def build_tree(drive):
+    received = drive.add_file('Application received', 'root', FOLDER_MIME_TYPE)
+    processed = drive.add_file('Application processed', 'root', FOLDER_MIME_TYPE)
+    batch = drive.add_file(
+        '2024-01-01 batch', received, FOLDER_MIME_TYPE,
+        created_time=datetime(2024, 1, 1))
+    john = drive.add_file('John Doe.pdf', batch)
+    maria = drive.add_file('Maria Garcia.pdf', batch)
+    return {'received': received, 'processed': processed, 'batch': batch,
+            'john': john, 'maria': maria}
+
+
+def snapshot_files(tracker):
+    return {
+        status: {batch['name']: [file['name'] for file in files]}
+        for status, batch, files in tracker.iter_batches()
+    }
+
+
+def test_cold_start_crawls_the_tree(tmp_path):
+    drive = FakeDriveService()
+    ids = build_tree(drive)
+    stages = {ids['received']: 'received', ids['processed']: 'processed'}
+
+    tracker = IncrementalStatusTracker(drive, stages, str(tmp_path / 'snapshot.json'))
+    snapshot = tracker.sync()
+
+    assert snapshot['start_page_token'] == str(len(drive.change_log))
+    assert snapshot_files(tracker) == {
+        'received': {'2024-01-01 batch': ['John Doe.pdf', 'Maria Garcia.pdf']},
+    }
+    assert drive.backend.calls['drive.changes.list'] == 0
+
+
+def test_incremental_sync_applies_add_move_trash_and_delete(tmp_path):
+    drive = FakeDriveService()
+    ids = build_tree(drive)
+    stages = {ids['received']: 'received', ids['processed']: 'processed'}
+    snapshot_path = str(tmp_path / 'snapshot.json')
+    IncrementalStatusTracker(drive, stages, snapshot_path).sync()
+
+    new_batch = drive.add_file(
+        '2024-02-01 batch', ids['processed'], FOLDER_MIME_TYPE,
+        created_time=datetime(2024, 2, 1))
+    drive.add_file('Wei Zhang.pdf', new_batch)
+    drive.move_file(ids['john'], new_batch)
+    drive.trash_file(ids['maria'])
+    stray = drive.add_file('Omar Farah.pdf', ids['batch'])
+    drive.delete_file(stray)
+    drive.backend.reset()
+
+    tracker = IncrementalStatusTracker(drive, stages, snapshot_path)
+    tracker.sync()
+
+    assert snapshot_files(tracker) == {
+        'received': {'2024-01-01 batch': []},
+        'processed': {'2024-02-01 batch': ['John Doe.pdf', 'Wei Zhang.pdf']},
+    }
+    assert drive.backend.calls['drive.changes.list'] == 1
+    assert tracker.snapshot['start_page_token'] == str(len(drive.change_log))
+
+
+def test_expired_page_token_falls_back_to_a_full_crawl(tmp_path):
+    drive = FakeDriveService()
+    ids = build_tree(drive)
+    stages = {ids['received']: 'received', ids['processed']: 'processed'}
+    snapshot_path = str(tmp_path / 'snapshot.json')
+    IncrementalStatusTracker(drive, stages, snapshot_path).sync()
+
+    drive.add_file('Wei Zhang.pdf', ids['batch'])
+    drive.expire_changes()
+
+    tracker = IncrementalStatusTracker(drive, stages, snapshot_path)
+    tracker.sync()
+
+    assert snapshot_files(tracker) == {
+        'received': {
+            '2024-01-01 batch': ['John Doe.pdf', 'Maria Garcia.pdf', 'Wei Zhang.pdf'],
+        },
+    }
+    assert tracker.snapshot['start_page_token'] == str(len(drive.change_log))
+
+
+def test_invalid_page_token_falls_back_to_a_full_crawl(tmp_path):
+    drive = FakeDriveService()
+    ids = build_tree(drive)
+    stages = {ids['received']: 'received'}
+    snapshot_path = str(tmp_path / 'snapshot.json')
+    snapshot = IncrementalStatusTracker(drive, stages, snapshot_path).sync()
+    snapshot['start_page_token'] = 'not-a-token'
+    with open(snapshot_path, 'w', encoding='utf-8') as snapshot_file:
+        json.dump(snapshot, snapshot_file)
+
+    tracker = IncrementalStatusTracker(drive, stages, snapshot_path)
+    tracker.sync()
+
+    assert tracker.snapshot['start_page_token'] == str(len(drive.change_log))
+
+
+def test_malformed_changes_request_raises(tmp_path, monkeypatch):
+    drive = FakeDriveService()
+    ids = build_tree(drive)
+    stages = {ids['received']: 'received'}
+    snapshot_path = str(tmp_path / 'snapshot.json')
+    IncrementalStatusTracker(drive, stages, snapshot_path).sync()
+    monkeypatch.setattr(incremental_status_tracker, 'CHANGES_PAGE_SIZE', 5000)
+
+    with pytest.raises(HttpError):
+        IncrementalStatusTracker(drive, stages, snapshot_path).sync()
+    assert drive.backend.calls['drive.changes.getStartPageToken'] == 1
+
+
+def test_stage_folders_sharing_a_status_are_both_tracked(tmp_path):
+    drive = FakeDriveService()
+    ids = build_tree(drive)
+    archive = drive.add_file('Archive processed', 'root', FOLDER_MIME_TYPE)
+    batch = drive.add_file(
+        '2023-06-01 batch', archive, FOLDER_MIME_TYPE,
+        created_time=datetime(2023, 6, 1))
+    drive.add_file('Kenji Tanaka.pdf', batch)
+    processed_batch = drive.add_file(
+        '2024-03-01 batch', ids['processed'], FOLDER_MIME_TYPE,
+        created_time=datetime(2024, 3, 1))
+    drive.add_file('Ahmed Khan.pdf', processed_batch)
+
+    statuses = get_application_statuses_incremental(
+        drive, [ids['received'], ids['processed'], archive],
+        str(tmp_path / 'snapshot.json'))
+
+    assert {entry['customer']: entry['status'] for entry in statuses} == {
+        'john doe': 'received',
+        'maria garcia': 'received',
+        'kenji tanaka': 'processed',
+        'ahmed khan': 'processed',
+    }
@@ -0,0 +1,68 @@
+import pytest
+from googleapiclient.errors import HttpError
+
+from benchmarks.fake_google import FakeGmailService, build_mailbox
+from list_gmail_messages import get_messages_metadata, message_record
+
+
+@pytest.fixture
+def limiter(counting_limiter):
+    return counting_limiter('gmail')
+
+
+@pytest.fixture
+def gmail():
+    gmail = FakeGmailService()
+    build_mailbox(gmail, messages=120)
+    return gmail
+
+
+def subjects(gmail, message_ids):
+    return [message_record(gmail.messages[message_id])['Subject'] for message_id in message_ids]
+
+
+@pytest.mark.parametrize('batch_size, envelopes', [(None, 3), (30, 4), (500, 2)])
+def test_messages_are_split_into_envelopes(gmail, limiter, batch_size, envelopes):
+    message_ids = gmail.search('')
+    kwargs = {} if batch_size is None else {'batch_size': batch_size}
+
+    records = get_messages_metadata(gmail, message_ids, **kwargs)
+
+    assert [record['Subject'] for record in records] == subjects(gmail, message_ids)
+    assert gmail.backend.calls['batch'] == envelopes
+    # One success per message, none for the envelopes
+    assert limiter.successes == 120
+
+
+def test_rate_limited_messages_are_fetched_again(gmail, limiter):
+    message_ids = gmail.search('')
+    gmail.backend.fail('gmail.users.messages.get', times=2)
+
+    records = get_messages_metadata(gmail, message_ids)
+
+    assert [record['Subject'] for record in records] == subjects(gmail, message_ids)
+    assert gmail.backend.calls['gmail.users.messages.get'] == 122
+    assert (limiter.successes, limiter.quota_errors) == (120, 2)
+
+
+def test_deleted_messages_are_skipped_only_when_missing_ok(gmail, limiter):
+    message_ids = gmail.search('')
+    gmail.delete_message(message_ids[10])
+
+    records = get_messages_metadata(gmail, message_ids, missing_ok=True)
+
+    assert [record['Message ID'] for record in records] == \
+        message_ids[:10] + message_ids[11:]
+    with pytest.raises(HttpError) as error:
+        get_messages_metadata(gmail, message_ids)
+    assert error.value.resp.status == 404
+
+
+def test_message_failing_past_the_retries_raises(gmail, limiter):
+    gmail.backend.fail('gmail.users.messages.get', times=3, status=503, reason='backendError')
+
+    with pytest.raises(HttpError) as error:
+        get_messages_metadata(gmail, gmail.search('')[:1])
+
+    assert error.value.resp.status == 503
+    assert gmail.backend.calls['gmail.users.messages.get'] == 3
@@ -0,0 +1,51 @@
+import random
+
+import pytest
+
+from benchmarks.fake_google import customer_names
+from customer_names import fuzzy_key, name_ngrams
+from name_index import NGRAM_SIZE, NameIndex
+
+
+def misspell(name, rng):
+    """Drop, swap or replace a couple of letters of name."""
+    letters = list(name)
+    for _ in range(rng.randint(0, 2)):
+        position = rng.randrange(len(letters))
+        edit = rng.choice(['drop', 'replace', 'swap'])
+        if edit == 'drop' and len(letters) > 3:
+            del letters[position]
+        elif edit == 'replace':
+            letters[position] = rng.choice('abcdefghijklmnopqrstuvwxyz ')
+        elif position + 1 < len(letters):
+            letters[position], letters[position + 1] = letters[position + 1], letters[position]
+    return ''.join(letters)
+
+
+def brute_force(entries, name, limit, min_score):
+    grams = name_ngrams(fuzzy_key(name), NGRAM_SIZE)
+    scored = []
+    for entry_id, entry in enumerate(entries):
+        key = fuzzy_key(entry['customer'])
+        if not key:
+            continue
+        other = name_ngrams(key, NGRAM_SIZE)
+        score = 2 * len(grams & other) / (len(grams) + len(other))
+        if score >= min_score:
+            scored.append((score, entry_id))
+    scored.sort(key=lambda match: (-match[0], match[1]))
+    return [(score, entries[entry_id]) for score, entry_id in scored[:limit]]
+
+
+@pytest.mark.parametrize('min_score', [0.3, 0.5, 0.6, 0.8, 1.0])
+@pytest.mark.parametrize('limit', [1, 5])
+def test_search_matches_a_brute_force_scan(min_score, limit):
+    rng = random.Random(7)
+    names = customer_names(500, seed=3)
+    entries = [{'customer': misspell(name, rng)} for name in names]
+    index = NameIndex(entries)
+
+    for name in rng.sample(names, 60):
+        query = misspell(name, rng)
+        assert index.search(query, limit=limit, min_score=min_score) == \
+            brute_force(entries, query, limit, min_score), query
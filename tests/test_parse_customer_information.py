@@ -0,0 +1,96 @@
+import io
+from datetime import datetime
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook, load_workbook
+
+from benchmarks.run_benchmarks import customer_workbook
+from parse_customer_information import (
+    EXPECTED_COLUMNS,
+    iter_customer_batches,
+    iter_customer_information,
+)
+
+
+def edge_case_workbook() -> bytes:
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(['Customer export'])
+    sheet.append([*EXPECTED_COLUMNS, 'Notes'])
+    sheet.append([1, 'CIF1', 'Customer One', 'AA1', 'ONE', '0121', '41111',
+                  datetime(2020, 1, 1), 'extra cell'])
+    sheet.append([])
+    sheet.append([2, 'CIF2', 'Missing Id', None, 'TWO'])
+    sheet.append([3, 'CIF3', 'Short Row', 'AA3'])
+    sheet.append([None, None, None, None, None, None, None, None, 'only notes'])
+    sheet.append([4, 'CIF4', 'Customer Four', 'AA4', 'FOUR', '0124', '41114',
+                  datetime(2020, 1, 4)])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def full_load_records(content: bytes) -> list[dict]:
+    """Parse the way the fully loaded workbook was parsed before streaming."""
+    sheet = load_workbook(io.BytesIO(content)).active
+    records = []
+    for row in sheet.iter_rows(
+            min_row=3, max_col=len(EXPECTED_COLUMNS), values_only=True):
+        if not any(row):
+            continue
+        record = dict(zip(EXPECTED_COLUMNS, row))
+        if record['Fullname'] and record['ID_No.']:
+            records.append(record)
+    return records
+
+
+@pytest.mark.parametrize('content', [
+    pytest.param(customer_workbook(25), id='generated'),
+    pytest.param(edge_case_workbook(), id='edge-cases'),
+])
+def test_streaming_matches_full_load(content):
+    records = list(iter_customer_information(io.BytesIO(content)))
+
+    assert records == full_load_records(content)
+    assert records
+
+
+def test_streaming_pads_short_rows_and_drops_extra_columns():
+    records = list(iter_customer_information(io.BytesIO(edge_case_workbook())))
+
+    assert [record['CIF'] for record in records] == ['CIF1', 'CIF3', 'CIF4']
+    assert all(list(record) == EXPECTED_COLUMNS for record in records)
+    assert records[1]['ISS_DATE'] is None
+
+
+@pytest.mark.parametrize(('rows', 'batch_size', 'sizes'), [
+    (7, 3, [3, 3, 1]),
+    (6, 3, [3, 3]),
+    (2, 5, [2]),
+    (0, 3, []),
+])
+def test_batches_split_records_at_batch_size(rows, batch_size, sizes):
+    content = customer_workbook(rows)
+
+    batches = list(iter_customer_batches(io.BytesIO(content), batch_size))
+
+    assert [len(batch) for batch in batches] == sizes
+    assert all(list(batch.columns) == EXPECTED_COLUMNS for batch in batches)
+    if batches:
+        expected = pd.DataFrame.from_records(
+            full_load_records(content), columns=EXPECTED_COLUMNS)
+        pd.testing.assert_frame_equal(
+            pd.concat(batches, ignore_index=True), expected)
+
+
+def test_invalid_header_raises_before_any_record():
+    workbook = Workbook()
+    workbook.active.append(['Customer export'])
+    workbook.active.append(['#', 'Fullname'])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+
+    with pytest.raises(ValueError, match='Expected column CIF'):
+        next(iter_customer_information(buffer))
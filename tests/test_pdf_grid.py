@@ -0,0 +1,29 @@
+import pytest
+from PyPDF2 import PdfReader
+
+from convert_xlsx_to_pdf_pass import rows_to_paginated_pdf
+from pdf_grid import column_widths
+
+ROWS = [['Name', 'Account', 'Balance']] + [
+    [f'Customer {index}', f'ES{index:08d}', f'{index * 10.5:.2f}']
+    for index in range(120)
+]
+
+
+def test_column_widths_follow_the_content_and_fill_the_table():
+    widths = column_widths(ROWS, 500.0)
+
+    assert sum(widths) == pytest.approx(500.0)
+    assert widths[0] > widths[2]
+
+
+@pytest.mark.parametrize('renderer', ['grid', 'platypus'])
+def test_both_renderers_print_every_row(tmp_path, renderer):
+    path = tmp_path / f'{renderer}.pdf'
+
+    rows_to_paginated_pdf(ROWS, str(path), renderer=renderer)
+
+    text = '\n'.join(page.extract_text() for page in PdfReader(str(path)).pages)
+    assert 'Customer 0' in text
+    assert 'Customer 119' in text
+    assert 'ES00000119' in text
@@ -0,0 +1,123 @@
+import csv
+import json
+
+import pytest
+
+from benchmarks.fake_google import FakeGmailService, build_mailbox
+from list_gmail_messages import MESSAGE_COLUMNS, export_messages, iter_messages
+from record_sinks import CsvSink, ParquetSink, RecordSink, open_sink
+
+RECORDS = [
+    {'Message ID': str(index), 'Subject': f'Subject {index}', 'Extra': 'ignored'}
+    for index in range(25)
+]
+
+
+def read_rows(path):
+    if path.suffix == '.csv':
+        with open(path, newline='', encoding='utf-8') as csv_file:
+            return list(csv.DictReader(csv_file))
+    if path.suffix == '.jsonl':
+        with open(path, encoding='utf-8') as jsonl_file:
+            return [json.loads(line) for line in jsonl_file]
+    import pyarrow.parquet as pq
+    return pq.read_table(path).to_pylist()
+
+
+@pytest.mark.parametrize('extension', ['.csv', '.jsonl', '.parquet'])
+def test_sinks_write_the_chosen_columns(tmp_path, extension):
+    path = tmp_path / f'records{extension}'
+    with open_sink(str(path), ['Message ID', 'Subject']) as sink:
+        assert sink.write_many(RECORDS) == 25
+
+    assert read_rows(path) == [
+        {'Message ID': record['Message ID'], 'Subject': record['Subject']}
+        for record in RECORDS
+    ]
+
+
+def test_parquet_sink_writes_row_groups(tmp_path):
+    import pyarrow.parquet as pq
+
+    path = tmp_path / 'records.parquet'
+    with ParquetSink(str(path), row_group_size=10) as sink:
+        sink.write_many(RECORDS)
+
+    parquet_file = pq.ParquetFile(path)
+    assert parquet_file.metadata.num_row_groups == 3
+    assert parquet_file.read().column_names == ['Message ID', 'Subject', 'Extra']
+
+
+def test_parquet_columns_empty_in_the_first_row_group(tmp_path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    path = tmp_path / 'records.parquet'
+    records = [{'Message ID': str(index), 'Subject': None} for index in range(10)]
+    records += [{'Message ID': '10', 'Subject': 'Late subject'}, {'Message ID': 11}]
+    with ParquetSink(str(path), ['Message ID', 'Subject'], row_group_size=10) as sink:
+        sink.write_many(records)
+
+    table = pq.read_table(path)
+    assert table.schema == pa.schema([('Message ID', pa.string()), ('Subject', pa.string())])
+    assert table.column('Subject').to_pylist()[9:] == [None, 'Late subject', None]
+    assert table.column('Message ID').to_pylist()[-1] == '11'
+
+
+@pytest.mark.parametrize('extension', ['.csv', '.jsonl', '.parquet'])
+def test_empty_export_keeps_its_columns(tmp_path, extension):
+    path = tmp_path / f'records{extension}'
+    with open_sink(str(path), MESSAGE_COLUMNS):
+        pass
+
+    if extension == '.parquet':
+        import pyarrow.parquet as pq
+        assert pq.read_table(path).column_names == MESSAGE_COLUMNS
+    elif extension == '.csv':
+        assert path.read_text(encoding='utf-8').splitlines() == [','.join(MESSAGE_COLUMNS)]
+    else:
+        assert read_rows(path) == []
+
+
+def test_fieldnames_default_to_the_first_record(tmp_path):
+    path = tmp_path / 'records.csv'
+    with CsvSink(str(path)) as sink:
+        sink.write_many(RECORDS[:2])
+
+    assert read_rows(path)[0] == RECORDS[0]
+
+
+def test_unknown_extension_and_abstract_base(tmp_path):
+    with pytest.raises(ValueError):
+        open_sink(str(tmp_path / 'records.xlsx'))
+    with pytest.raises(TypeError):
+        RecordSink(str(tmp_path / 'records.csv'))  # type: ignore[abstract]
+
+
+@pytest.mark.parametrize('extension', ['.csv', '.jsonl', '.parquet'])
+def test_export_messages(tmp_path, extension):
+    gmail = FakeGmailService()
+    build_mailbox(gmail, messages=120)
+    path = tmp_path / f'messages{extension}'
+
+    written = export_messages(gmail, 'from:idealista', str(path))
+
+    rows = read_rows(path)
+    assert written == len(rows) > 0
+    assert [row['Message ID'] for row in rows] == gmail.search('from:idealista')
+    assert list(rows[0]) == MESSAGE_COLUMNS
+
+
+def test_iter_messages_skips_messages_deleted_while_listing():
+    gmail = FakeGmailService()
+    build_mailbox(gmail, messages=30)
+    listed = gmail.search('')
+
+    messages = iter_messages(gmail, '', batch_size=10)
+    first = next(messages)
+    # The listing page is already read, the second batch is not fetched yet
+    gmail.delete_message(listed[15])
+    records = [first, *messages]
+
+    assert [record['Message ID'] for record in records] == [
+        message_id for message_id in listed if message_id != listed[15]]
@@ -0,0 +1,117 @@
+import json
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from request_executor import RequestExecutor, TokenBucket
+
+
+class FakeClock:
+    """Clock whose time only moves when the limiter sleeps."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def http_error(status, reason):
+    content = json.dumps(
+        {'error': {'code': status, 'errors': [{'reason': reason}]}}).encode('utf-8')
+    return HttpError(httplib2.Response({'status': status}), content)
+
+
+def make_bucket(clock, **kwargs):
+    kwargs.setdefault('rate', 10.0)
+    kwargs.setdefault('max_rate', 20.0)
+    return TokenBucket(clock=clock, sleep=clock.sleep, **kwargs)
+
+
+def test_acquire_waits_for_tokens_on_the_clock():
+    clock = FakeClock()
+    bucket = make_bucket(clock, capacity=10.0)
+
+    assert bucket.acquire(10) == 0.0
+    assert bucket.acquire(5) == pytest.approx(0.5)
+    assert clock.now == pytest.approx(0.5)
+
+
+def test_acquire_sleeps_without_holding_the_lock():
+    clock = FakeClock()
+    bucket = make_bucket(clock, capacity=1.0)
+    bucket.acquire(1)
+
+    def sleep(seconds):
+        # Another caller could update the rate while this one waits
+        assert bucket._lock.acquire(blocking=False)
+        bucket._lock.release()
+        clock.sleep(seconds)
+
+    bucket._sleep = sleep
+    bucket.acquire(1)
+    assert clock.sleeps
+
+
+@pytest.mark.parametrize('error', [
+    http_error(429, 'rateLimitExceeded'),
+    http_error(403, 'userRateLimitExceeded'),
+])
+def test_quota_errors_halve_the_rate(error):
+    clock = FakeClock()
+    bucket = make_bucket(clock, min_rate=2.0)
+    executor = RequestExecutor(bucket, sleep=clock.sleep)
+
+    executor.record(error)
+    assert bucket.rate == 5.0
+    executor.record(error)
+    executor.record(error)
+    assert bucket.rate == 2.0
+
+
+def test_other_errors_leave_the_rate_alone():
+    clock = FakeClock()
+    bucket = make_bucket(clock)
+    executor = RequestExecutor(bucket, sleep=clock.sleep)
+
+    executor.record(http_error(403, 'forbidden'))
+    executor.record(http_error(500, 'backendError'))
+    assert bucket.rate == 10.0
+
+
+def test_successes_recover_the_rate_up_to_max_rate():
+    clock = FakeClock()
+    bucket = make_bucket(clock, increase=1.0)
+    executor = RequestExecutor(bucket, sleep=clock.sleep)
+    executor.record(http_error(429, 'rateLimitExceeded'))
+
+    for expected in (6.0, 7.0, 8.0):
+        executor.record(None)
+        assert bucket.rate == expected
+    for _ in range(20):
+        executor.record(None)
+    assert bucket.rate == 20.0
+
+
+def test_execute_retries_quota_errors_and_adapts_the_rate():
+    clock = FakeClock()
+    bucket = make_bucket(clock, increase=1.0)
+    executor = RequestExecutor(bucket, sleep=clock.sleep, jitter=lambda: 1.0)
+    outcomes = [http_error(429, 'rateLimitExceeded'), {'ok': True}]
+
+    def call():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert executor.call(call) == {'ok': True}
+    # Halved to 5 by the 429, then one success
+    assert bucket.rate == 6.0
+    assert 1.0 in clock.sleeps
@@ -0,0 +1,47 @@
+from datetime import datetime
+
+import pytest
+
+from status_join import join_customer_statuses
+
+JOHN = {'customer': 'john doe', 'status': 'received', 'batch_date': datetime(2024, 1, 1)}
+JOHN_LATER = {'customer': 'John  Doe', 'status': 'processed', 'batch_date': datetime(2024, 3, 1)}
+MARIA = {'customer': 'maría garcía', 'status': 'processed', 'batch_date': datetime(2024, 2, 1)}
+WEI = {'customer': 'wei zhang', 'status': 'received', 'batch_date': datetime(2024, 2, 1)}
+
+
+def names(rows, field='Fullname'):
+    return [row[field] for row in rows]
+
+
+@pytest.mark.parametrize('records, statuses, fuzzy, expected', [
+    # Matched by normalized name, the latest batch of a customer wins
+    ([{'Fullname': 'JOHN DOE'}], [JOHN, JOHN_LATER], False,
+     {'matched': [('JOHN DOE', 'processed')], 'fuzzy_matched': [],
+      'unmatched_records': [], 'unmatched_statuses': []}),
+    # A customer with no status and a status with no customer
+    ([{'Fullname': 'John Doe'}, {'Fullname': 'Kenji Tanaka'}], [JOHN, WEI], False,
+     {'matched': [('John Doe', 'received')], 'fuzzy_matched': [],
+      'unmatched_records': ['Kenji Tanaka'], 'unmatched_statuses': ['wei zhang']}),
+    # Accents and a typo only match with fuzzy
+    ([{'Fullname': 'Maria Garcia'}, {'Fullname': ''}], [MARIA], False,
+     {'matched': [], 'fuzzy_matched': [],
+      'unmatched_records': ['Maria Garcia', ''], 'unmatched_statuses': ['maría garcía']}),
+    ([{'Fullname': 'Garcia, Marja'}, {'Fullname': ''}], [MARIA, WEI], True,
+     {'matched': [], 'fuzzy_matched': [('Garcia, Marja', 'maría garcía')],
+      'unmatched_records': [''], 'unmatched_statuses': ['wei zhang']}),
+    ([], [], True,
+     {'matched': [], 'fuzzy_matched': [], 'unmatched_records': [], 'unmatched_statuses': []}),
+])
+def test_join_customer_statuses(records, statuses, fuzzy, expected):
+    result = join_customer_statuses(records, statuses, fuzzy=fuzzy)
+
+    assert {
+        'matched': [
+            (record['Fullname'], entry['status']) for record, entry in result['matched']],
+        'fuzzy_matched': [
+            (record['Fullname'], candidates[0][1]['customer'])
+            for record, candidates in result['fuzzy_matched']],
+        'unmatched_records': names(result['unmatched_records']),
+        'unmatched_statuses': names(result['unmatched_statuses'], 'customer'),
+    } == expected
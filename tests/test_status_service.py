@@ -0,0 +1,49 @@
+import threading
+
+from status_service import StatusStore, create_app
+
+STATUSES = [
+    {'customer': 'John Doe', 'status': 'processed', 'batch_date': None},
+    {'customer': 'Maria Garcia', 'status': 'received', 'batch_date': None},
+]
+
+
+def test_lookups_are_served_from_the_index():
+    store = StatusStore(lambda: STATUSES)
+    store.refresh()
+    client = create_app(store).test_client()
+
+    assert client.get('/customers/JOHN%20DOE').get_json()['status'] == 'processed'
+    assert client.get('/customers/nobody').status_code == 404
+    assert [entry['customer'] for entry in
+            client.get('/customers?status=received').get_json()] == ['Maria Garcia']
+
+
+def test_refresh_runs_at_most_one_crawl_at_a_time():
+    release = threading.Event()
+    started = threading.Event()
+    crawls = []
+
+    def fetch_statuses():
+        crawls.append(1)
+        started.set()
+        release.wait(5)
+        return STATUSES
+
+    store = StatusStore(fetch_statuses)
+    client = create_app(store).test_client()
+
+    first = client.post('/refresh')
+    assert first.status_code == 202
+    assert started.wait(5)
+    for _ in range(5):
+        response = client.post('/refresh')
+        assert response.status_code == 409
+        assert response.get_json()['refreshing'] is False
+
+    release.set()
+    # Once the running crawl is done, the next refresh can start
+    store.refresh()
+    assert len(crawls) == 2
+    assert store.get('maria garcia') is not None
+    assert client.post('/refresh').status_code == 202
@@ -0,0 +1,45 @@
+import pytest
+from googleapiclient.errors import HttpError
+
+from benchmarks.fake_google import FOLDER_MIME_TYPE, FakeDriveService, build_status_tree
+from track_drive_folder_statuses import (
+    _stage_status,
+    get_application_statuses,
+    get_application_statuses_concurrent,
+)
+
+
+def test_stage_status_is_the_last_word_of_the_folder_name():
+    drive = FakeDriveService()
+    folder_id = drive.add_file('Application Processed', 'root', FOLDER_MIME_TYPE)
+
+    assert _stage_status(drive, folder_id) == 'processed'
+
+
+def test_stage_folder_with_a_blank_name_is_skipped():
+    drive = FakeDriveService()
+    folder_id = drive.add_file('   ', 'root', FOLDER_MIME_TYPE)
+
+    assert _stage_status(drive, folder_id) is None
+
+
+def test_concurrent_statuses_match_the_sequential_ones():
+    drive = FakeDriveService()
+    stage_ids, _ = build_status_tree(drive, stages=3, batches=40, pdfs=12)
+
+    sequential = get_application_statuses(drive, stage_ids)
+    concurrent = get_application_statuses_concurrent(lambda: drive, stage_ids, max_workers=4)
+
+    assert len(sequential) > 0
+    assert concurrent == sequential
+
+
+def test_concurrent_statuses_raise_when_a_worker_fails():
+    drive = FakeDriveService()
+    stage_ids, _ = build_status_tree(drive, stages=3, batches=40, pdfs=12)
+    # Not retryable, so the listing of one chunk fails for good
+    drive.backend.fail('drive.files.list', status=403, reason='forbidden')
+
+    with pytest.raises(HttpError) as error:
+        get_application_statuses_concurrent(lambda: drive, stage_ids, max_workers=4)
+    assert error.value.resp.status == 403
@@ -0,0 +1,64 @@
+import pytest
+from googleapiclient.errors import HttpError
+
+import track_drive_folder_statuses_batch_request as batch_request
+from benchmarks.fake_google import FOLDER_MIME_TYPE, FakeDriveService
+from drive_listing import get_files
+
+
+@pytest.fixture
+def limiter(counting_limiter):
+    return counting_limiter('drive')
+
+
+@pytest.fixture
+def folders(monkeypatch):
+    # Two files per page, so most folders take several sub-requests
+    monkeypatch.setattr(batch_request, 'LIST_PAGE_SIZE', 2)
+    drive = FakeDriveService()
+    folder_ids = []
+    for index, size in enumerate([0, 1, 2, 5, 3, 7]):
+        folder_id = drive.add_file(f'batch {index}', 'root', FOLDER_MIME_TYPE)
+        for file in range(size):
+            drive.add_file(f'Customer {index}-{file}.pdf', folder_id)
+        folder_ids.append(folder_id)
+    return drive, folder_ids
+
+
+def sequential_listing(drive, folder_ids):
+    return {folder_id: get_files(drive, folder_id) for folder_id in folder_ids}
+
+
+def test_batched_listing_matches_get_files(folders, limiter):
+    drive, folder_ids = folders
+
+    children = batch_request.list_children_batched(drive, folder_ids, batch_size=3)
+    successes = limiter.successes
+
+    assert children == sequential_listing(drive, folder_ids)
+    # One page for each of the 6 folders, then the re-queued later pages
+    assert successes == 6 + 2 + 1 + 3
+    assert drive.backend.calls['batch'] == 5
+    # One success per sub-request, none for the envelopes
+    assert limiter.successes == successes + len(folder_ids)
+
+
+def test_retried_sub_request_is_listed_once(folders, limiter):
+    drive, folder_ids = folders
+    drive.backend.fail('drive.files.list')
+
+    children = batch_request.list_children_batched(drive, folder_ids, batch_size=3)
+
+    assert (limiter.successes, limiter.quota_errors) == (12, 1)
+    assert children == sequential_listing(drive, folder_ids)
+
+
+def test_sub_request_failing_past_the_retries_raises(folders, limiter):
+    drive, folder_ids = folders
+    drive.backend.fail('drive.files.list', times=3, status=503, reason='backendError')
+
+    with pytest.raises(HttpError) as error:
+        batch_request.list_children_batched(drive, folder_ids[:1])
+
+    assert error.value.resp.status == 503
+    assert drive.backend.calls['drive.files.list'] == 3
@@ -0,0 +1,93 @@
+import os
+import pickle
+import stat
+
+import pytest
+
+import parse_customer_information
+from benchmarks.fake_google import FakeDriveService
+from benchmarks.run_benchmarks import customer_workbook
+from parse_customer_information import PARSER_VERSION, load_customer_information
+from workbook_cache import WorkbookCache
+
+
+def count_parses(monkeypatch):
+    parses = []
+    parse = parse_customer_information.retrieve_customer_information
+
+    def counting_parse(file_content):
+        parses.append(1)
+        return parse(file_content)
+
+    monkeypatch.setattr(
+        parse_customer_information, 'retrieve_customer_information', counting_parse)
+    return parses
+
+
+def test_unchanged_workbook_skips_download_and_parse(tmp_path, monkeypatch):
+    drive = FakeDriveService()
+    file_id = drive.add_file('customers.xlsx', 'root', content=customer_workbook(20))
+    cache = WorkbookCache(str(tmp_path / 'cache'))
+    parses = count_parses(monkeypatch)
+
+    first = load_customer_information(drive, file_id, cache)
+    second = load_customer_information(drive, file_id, cache)
+
+    assert len(first) == 20
+    assert second == first
+    assert drive.backend.calls['drive.files.get_media'] == 1
+    assert len(parses) == 1
+    assert cache.stats()['record_hits'] == 1
+
+
+def test_changed_revision_is_downloaded_and_parsed_again(tmp_path, monkeypatch):
+    drive = FakeDriveService()
+    file_id = drive.add_file('customers.xlsx', 'root', content=customer_workbook(20))
+    cache = WorkbookCache(str(tmp_path / 'cache'))
+    parses = count_parses(monkeypatch)
+    load_customer_information(drive, file_id, cache)
+
+    drive.update_file(file_id, {}, content=customer_workbook(25))
+    records = load_customer_information(drive, file_id, cache)
+
+    assert len(records) == 25
+    assert drive.backend.calls['drive.files.get_media'] == 2
+    assert len(parses) == 2
+
+
+@pytest.mark.parametrize('content', [
+    b'\x80\x04\x95garbage',
+    pickle.dumps(['not', 'a', 'dict']),
+])
+def test_unreadable_records_are_a_miss(tmp_path, content):
+    cache = WorkbookCache(str(tmp_path))
+    metadata = {'md5Checksum': 'abc'}
+    cache.put_records('file', metadata, PARSER_VERSION, [{'Fullname': 'John Doe'}])
+    with open(tmp_path / 'file.records', 'wb') as records_file:
+        records_file.write(content)
+
+    assert cache.records('file', metadata, PARSER_VERSION) is None
+    assert cache.stats()['record_misses'] == 1
+
+
+def test_existing_directory_is_restricted_to_owner(tmp_path):
+    path = tmp_path / 'cache'
+    path.mkdir(mode=0o777)
+    os.chmod(path, 0o777)
+
+    WorkbookCache(str(path))
+
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o700
+
+
+@pytest.mark.parametrize('shared', ['directory', 'file'])
+def test_records_writable_by_others_are_not_loaded(tmp_path, shared):
+    cache = WorkbookCache(str(tmp_path))
+    metadata = {'md5Checksum': 'abc'}
+    cache.put_records('file', metadata, PARSER_VERSION, [{'Fullname': 'John Doe'}])
+    assert cache.records('file', metadata, PARSER_VERSION) is not None
+
+    os.chmod(tmp_path if shared == 'directory' else tmp_path / 'file.records', 0o777)
+
+    assert cache.records('file', metadata, PARSER_VERSION) is None
+    assert cache.stats()['record_misses'] == 1
@@ -1,10 +1,22 @@
 import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from collections import OrderedDict
 import time
-import google.auth
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from api_metrics import ApiMetrics
+from customer_names import normalize_name
+from drive_listing import (
+    DEFAULT_MAX_WORKERS,
+    get_files_multi_parent,
+    get_files_multi_parent_concurrent,
+    thread_service,
+)
+from folder_listing_cache import FolderListingCache
+from google_clients import build_service, get_credentials
+from incremental_status_tracker import IncrementalStatusTracker
+from request_executor import get_executor
 
 
 # Set Logging for error management
@@ -12,88 +24,96 @@ logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(
 logging.getLogger("googleapiclient").setLevel(logging.ERROR)
 
 
-def get_files(service, parent_id, fields="nextPageToken, files(id, name)"):
-    """Fetch files in batches from parent folder ID"""
-    files = []
-    try:
-        page_token = None
-        while True:
-            try:
-                response = (
-                    service.files()
-                    .list(
-                        q=f"'{parent_id}' in parents and trashed=false",
-                        spaces="drive",
-                        fields=fields,
-                        pageToken=page_token,
-                    )
-                    .execute()
-                )
-                files.extend(response.get("files", []))
-                page_token = response.get("nextPageToken", None)
-                if page_token is None:
-                    break
-            except HttpError as error:
-                logging.error(f"Error fetching files from parent ID {parent_id}: {error}")
-                break
-    except Exception as e:
-        logging.critical(f"Unexpected error is get_files: {e}", exc_info=True)
-        raise e  
-    return files
+def _merge_applications(application_statuses, status, batch, applications):
+    """Merge the applications of one batch into the statuses map, latest batch wins"""
+    for application in applications:
+        try:
+            application_name = application["name"].split(".pdf")[0].strip().lower()
+            key = normalize_name(application_name)
+            batch_date = datetime.strptime(batch.get("name", "").split(" ")[0], "%Y-%m-%d")
+
+            if key in application_statuses:
+                existing_date = application_statuses[key]["batch_date"]
+
+                if batch_date > existing_date:
+                    application_statuses[key] = {
+                        "customer": application_name,
+                        "file_id": application.get("id"),
+                        "status": status,
+                        "batch": batch.get("name", "Unknown"),
+                        "batch_date": batch_date
+                    }
+
+            else:
+                application_statuses[key] = {
+                    "customer": application_name,
+                    "file_id": application.get("id"),
+                    "status": status,
+                    "batch": batch.get("name", "Unknown"),
+                    "batch_date": batch_date
+                }
+        except ValueError as e:
+            logging.warning(f"Error parsing batch date for batch {batch}: {e}")
+        except KeyError as e:
+            logging.warning(f"Missing expected data for application {application}: {e}")
+
+
+def _stage_status(service, folder_id):
+    """Derive the stage status from the last word of the stage folder name"""
+    try: 
+        folder_metadata = get_executor("drive").execute(service.files().get(fileId=folder_id, fields="name"))
+        folder_name = folder_metadata.get("name", "Unknown")
+        return folder_name.split()[-1].lower()
+    except (KeyError, IndexError) as e:
+        logging.warning(f"Error while parsing folder data for ID {folder_id}: {e!r}")
+        return None
+
+
+def _collect_statuses(stages, batches_by_stage, applications_by_batch):
+    """Merge the listed batches in stage and listing order, latest batch wins"""
+    application_statuses = OrderedDict()
+    for folder_id, status in stages:
+        for batch in batches_by_stage[folder_id]:
+            applications = applications_by_batch.get(batch.get("id", ""), [])
+            _merge_applications(application_statuses, status, batch, applications)
+    return application_statuses
+
+
+# Batch folders carry their modifiedTime so unchanged ones can be served from the listing cache
+BATCH_FIELDS = "nextPageToken, files(id, name, parents, modifiedTime)"
+
 
+def _modified_times(batches_by_stage):
+    """Map every listed batch folder ID to its modifiedTime"""
+    return {
+        batch.get("id", ""): batch.get("modifiedTime")
+        for batches in batches_by_stage.values()
+        for batch in batches
+    }
 
-def get_application_statuses(service, folder_ids):
-    """Get application statuses across multiple folders"""
+
+def get_application_statuses(service, folder_ids, cache=None):
+    """Get application statuses across multiple folders, reusing cached listings of unchanged batches"""
     application_statuses = OrderedDict()
     
     try:
+        stages = []
         for folder_id in folder_ids:
-            try: 
-                folder_metadata = service.files().get(fileId=folder_id, fields="name").execute()
-                folder_name = folder_metadata.get("name", "Unknown")
-                status = folder_name.split()[-1].lower()
-            except KeyError as e:
-                logging.warning(f"KeyError while parsing folder data for ID {folder_id}: {e}")
-                continue
-            
-            batches = get_files(service, folder_id) or []
-            for batch in batches:
-                try : 
-                    applications = get_files(service, batch.get("id", "")) or []
-                except KeyError as error:
-                    logging.error(f"KeyError fetching applications from batch {batch}: {error}")
-                    continue
-
-                for application in applications:
-                    try:
-                        application_name = application["name"].split(".pdf")[0].strip().lower()
-                        batch_date = datetime.strptime(batch.get("name", "").split(" ")[0], "%Y-%m-%d")
-
-                        if application_name in application_statuses:
-                            existing_date = application_statuses[application_name]["batch_date"]
-
-                            if batch_date > existing_date:
-                                application_statuses[application_name] = {
-                                    "file_id": application.get("id"),
-                                    "status": status,
-                                    "batch": batch.get("name", "Unknown"),
-                                    "batch_date": batch_date
-                                }
-
-                        else:
-                            application_statuses[application_name] = {
-                                "customer": application_name,
-                                "file_id": application.get("id"),
-                                "status": status,
-                                "batch": batch.get("name", "Unknown"),
-                                "batch_date": batch_date
-                            }
-                    except ValueError as e:
-                        logging.warning(f"Error parsing batch date for batch {batch}: {e}")
-                    except KeyError as e:
-                        logging.warning(f"Missing expected data for application {application}: {e}")               
+            status = _stage_status(service, folder_id)
+            if status is not None:
+                stages.append((folder_id, status))
+
+        # One OR-ed listing for all stage folders, then one per chunk of batch folders
+        batches_by_stage = get_files_multi_parent(service, [folder_id for folder_id, _ in stages], BATCH_FIELDS)
+        modified_times = _modified_times(batches_by_stage)
+        applications_by_batch = get_files_multi_parent(
+            service, list(modified_times), cache=cache, modified_times=modified_times
+        )
+
+        application_statuses = _collect_statuses(stages, batches_by_stage, applications_by_batch)
     except HttpError as error:
-        logging.error(f"Error fetching folder metadata for ID {folder_id}: {error}")
+        logging.error(f"Error fetching application statuses: {error}")
+        raise
     except Exception as e:
         logging.critical(f"Unexpected error in get_application_statuses: {e}", exc_info=True)
         raise e                    
@@ -101,10 +121,70 @@ def get_application_statuses(service, folder_ids):
     return [entry for entry in application_statuses.values()]
 
 
+def get_application_statuses_concurrent(service_factory, folder_ids, max_workers=DEFAULT_MAX_WORKERS, cache=None):
+    """Get application statuses across multiple folders with up to max_workers requests in flight.
+
+    service_factory builds a new Drive service, each worker thread gets its own instance.
+    The output is identical to get_application_statuses.
+    """
+    application_statuses = OrderedDict()
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            statuses = executor.map(
+                lambda folder_id: _stage_status(thread_service(service_factory), folder_id),
+                folder_ids
+            )
+            stages = [(folder_id, status) for folder_id, status in zip(folder_ids, statuses) if status is not None]
+
+            batches_by_stage = get_files_multi_parent_concurrent(
+                executor, service_factory, [folder_id for folder_id, _ in stages], max_workers, BATCH_FIELDS
+            )
+            modified_times = _modified_times(batches_by_stage)
+            applications_by_batch = get_files_multi_parent_concurrent(
+                executor,
+                service_factory,
+                list(modified_times),
+                max_workers,
+                cache=cache,
+                modified_times=modified_times
+            )
+
+        application_statuses = _collect_statuses(stages, batches_by_stage, applications_by_batch)
+    except HttpError as error:
+        logging.error(f"Error fetching application statuses: {error}")
+        raise
+    except Exception as e:
+        logging.critical(f"Unexpected error in get_application_statuses_concurrent: {e}", exc_info=True)
+        raise e
+
+    return [entry for entry in application_statuses.values()]
+
+
+def get_application_statuses_incremental(service, folder_ids, snapshot_path):
+    """Get application statuses from a local snapshot kept in sync with the Drive Changes API"""
+    application_statuses = OrderedDict()
+    stages = OrderedDict()
+    for folder_id in folder_ids:
+        status = _stage_status(service, folder_id)
+        if status is not None:
+            # Keyed by folder, two stage folders ending in the same word are both tracked
+            stages[folder_id] = status
+
+    tracker = IncrementalStatusTracker(service, stages, snapshot_path)
+    tracker.sync()
+    for status, batch, applications in tracker.iter_batches():
+        _merge_applications(application_statuses, status, batch, applications)
+
+    return [entry for entry in application_statuses.values()]
+
+
 def main():
 
-    creds, _ = google.auth.default()
-    drive_service = build("drive", "v3", credentials=creds)
+    creds = get_credentials()
+    # Set API_METRICS_PATH to write per-method call metrics at exit
+    metrics = ApiMetrics.from_env()
+    drive_service = build_service("drive", "v3", creds, metrics)
 
     folder_ids = [
         "1U7p8_7PFjBCVUPwEiDJhmkjMQ7DmJv__",
@@ -112,7 +192,21 @@ def main():
         "1L70ZQBvWzarM0SH23upvqzKm0MhFjbJO"
     ]
 
-    statuses = get_application_statuses(drive_service, folder_ids)
+    # Set STATUS_SNAPSHOT_PATH to only read Drive changes since the previous run
+    snapshot_path = os.environ.get("STATUS_SNAPSHOT_PATH")
+    if snapshot_path:
+        statuses = get_application_statuses_incremental(drive_service, folder_ids, snapshot_path)
+    else:
+        # Set FOLDER_CACHE_PATH to reuse listings of batch folders that did not change
+        cache_path = os.environ.get("FOLDER_CACHE_PATH")
+        cache = FolderListingCache(cache_path) if cache_path else None
+        max_workers = int(os.environ.get("STATUS_MAX_WORKERS", DEFAULT_MAX_WORKERS))
+        statuses = get_application_statuses_concurrent(
+            lambda: build_service("drive", "v3", creds, metrics), folder_ids, max_workers, cache
+        )
+        if cache is not None:
+            cache.log_stats()
+            cache.close()
 
     if statuses:
         for entry in statuses:
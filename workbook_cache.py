@@ -0,0 +1,175 @@
+import json
+import logging
+import os
+import pickle
+import stat
+import threading
+from collections.abc import Mapping
+from typing import Any
+
+
+def revision_key(metadata: Mapping[str, Any]) -> str | None:
+    """
+    Return what identifies the content of a Drive file: its md5Checksum,
+    or its modifiedTime for files without one.
+    """
+    if metadata.get('md5Checksum'):
+        return f"md5:{metadata['md5Checksum']}"
+    if metadata.get('modifiedTime'):
+        return f"modified:{metadata['modifiedTime']}"
+    return None
+
+
+def _writable_by_others(path_or_fd: str | int) -> bool:
+    return bool(os.stat(path_or_fd).st_mode & (stat.S_IWGRP | stat.S_IWOTH))
+
+
+class WorkbookCache:
+    """
+    Directory of downloaded workbooks and the records parsed from them.
+
+    A workbook is served from disk for as long as Drive reports the
+    revision it was downloaded at, see revision_key. Records are stored
+    with the revision and the parser version they were produced by, so an
+    unchanged workbook skips both the download and the parse. Only the
+    latest revision of each file is kept.
+
+    Records are pickled, so the directory is restricted to its owner and
+    records are not loaded while it or the records file is writable by
+    group or others.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Args:
+            path: Cache directory, created if missing.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._stats = {
+            'workbook_hits': 0,
+            'workbook_misses': 0,
+            'record_hits': 0,
+            'record_misses': 0,
+        }
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        # makedirs leaves the mode of an existing directory alone
+        os.chmod(path, 0o700)
+
+    def _entry_path(self, file_id: str, suffix: str) -> str:
+        return os.path.join(self.path, f'{file_id}{suffix}')
+
+    def _write(self, path: str, content: bytes) -> None:
+        temp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as cache_file:
+            cache_file.write(content)
+        os.replace(temp_path, path)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def workbook(self, file_id: str, metadata: Mapping[str, Any]) -> bytes | None:
+        """
+        Return the stored workbook if it is still the current revision.
+
+        Args:
+            file_id: ID of the Drive file.
+            metadata: Current md5Checksum and modifiedTime of the file.
+        """
+        revision = revision_key(metadata)
+        try:
+            with open(self._entry_path(file_id, '.json')) as revision_file:
+                stored = json.load(revision_file)
+            if revision is None or stored.get('revision') != revision:
+                raise LookupError(file_id)
+            with open(self._entry_path(file_id, '.xlsx'), 'rb') as workbook_file:
+                content = workbook_file.read()
+        except (OSError, ValueError, LookupError):
+            self._count('workbook_misses')
+            return None
+        self._count('workbook_hits')
+        return content
+
+    def put_workbook(
+        self,
+        file_id: str,
+        metadata: Mapping[str, Any],
+        content: bytes,
+    ) -> None:
+        """Store the workbook downloaded at the revision in metadata."""
+        revision = revision_key(metadata)
+        if revision is None:
+            return
+        # The revision is written last, so an interrupted write is a miss
+        self._write(self._entry_path(file_id, '.xlsx'), content)
+        self._write(
+            self._entry_path(file_id, '.json'),
+            json.dumps({'revision': revision}).encode('utf-8'),
+        )
+
+    def records(
+        self,
+        file_id: str,
+        metadata: Mapping[str, Any],
+        parser_version: str,
+    ) -> list[dict[str, Any]] | None:
+        """
+        Return the stored records if they were parsed from the current
+        revision by the same parser version.
+        """
+        revision = revision_key(metadata)
+        path = self._entry_path(file_id, '.records')
+        try:
+            with open(path, 'rb') as records_file:
+                if (_writable_by_others(self.path)
+                        or _writable_by_others(records_file.fileno())):
+                    logging.warning(
+                        f'Ignoring cached records {path}: '
+                        'writable by group or others')
+                    raise LookupError(file_id)
+                stored = pickle.load(records_file)
+            if (revision is None
+                    or stored['revision'] != revision
+                    or stored['parser_version'] != parser_version):
+                raise LookupError(file_id)
+        except (OSError, LookupError):
+            self._count('record_misses')
+            return None
+        except Exception as error:
+            # A truncated or corrupted pickle can raise almost anything
+            logging.warning(f'Ignoring unreadable cached records {path}: {error!r}')
+            self._count('record_misses')
+            return None
+        self._count('record_hits')
+        records: list[dict[str, Any]] = stored['records']
+        return records
+
+    def put_records(
+        self,
+        file_id: str,
+        metadata: Mapping[str, Any],
+        parser_version: str,
+        records: list[dict[str, Any]],
+    ) -> None:
+        """Store the records parsed from the revision in metadata."""
+        revision = revision_key(metadata)
+        if revision is None:
+            return
+        self._write(
+            self._entry_path(file_id, '.records'),
+            pickle.dumps({
+                'revision': revision,
+                'parser_version': parser_version,
+                'records': records,
+            }),
+        )
+
+    def stats(self) -> dict[str, int]:
+        """Return the hit and miss counts."""
+        with self._lock:
+            return dict(self._stats)
+
+    def log_stats(self) -> None:
+        """Log the hit and miss counts."""
+        logging.info(f'Workbook cache: {self.stats()}')